@@ -0,0 +1,77 @@
+import os
+import threading
+import click
+from flask import current_app as app
+from app.dao.referenciales_agendamiento.cita.ReservaCupoDao import ReservaCupoDao
+
+# Segundos entre barridos de reservas de cupo vencidas
+INTERVALO_BARRIDO = float(os.environ.get('RESERVAS_BARRIDO_INTERVALO', 15))
+LOTE_BARRIDO = 500
+
+
+class BarredorReservas(threading.Thread):
+    """
+    Hilo que libera las reservas de cupo vencidas.
+    Corre uno por proceso; cada barrido toma un advisory lock, así que si
+    otro worker está barriendo en ese momento este saltea la vuelta.
+    """
+
+    def __init__(self, app_flask, intervalo=INTERVALO_BARRIDO):
+        super().__init__(name='barredor-reservas-cupo', daemon=True)
+        self.app = app_flask
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+
+    def detener(self):
+        self._detener.set()
+
+    def run(self):
+        dao = ReservaCupoDao()
+        while not self._detener.wait(self.intervalo):
+            with self.app.app_context():
+                try:
+                    # Lotes seguidos mientras haya atraso
+                    while dao.barrerReservasVencidas(LOTE_BARRIDO) >= LOTE_BARRIDO:
+                        pass
+                except Exception as e:
+                    self.app.logger.error(f"Error en el barredor de reservas: {str(e)}")
+
+
+_barredor = None
+_barredor_pid = None
+_barredor_lock = threading.Lock()
+
+
+def asegurar_barredor():
+    """Arranca el barredor en el proceso actual si todavía no corre (también tras un fork)"""
+    global _barredor, _barredor_pid
+    pid = os.getpid()
+    if _barredor_pid == pid:
+        return
+    with _barredor_lock:
+        if _barredor_pid == pid:
+            return
+        _barredor = BarredorReservas(app._get_current_object())
+        _barredor.start()
+        _barredor_pid = pid
+
+
+def registrar_comandos(app_flask):
+    """
+    Arranca el barredor en cada worker con su primer request (de cualquier
+    endpoint) y registra el comando de consola: flask barrer-reservas
+    """
+    app_flask.before_request(asegurar_barredor)
+
+    @app_flask.cli.command('barrer-reservas')
+    @click.option('--lote', default=LOTE_BARRIDO, type=int, help='Reservas por lote')
+    def barrer_reservas(lote):
+        """Libera ahora las reservas de cupo vencidas (para cron o tras un reinicio)."""
+        dao = ReservaCupoDao()
+        total = 0
+        while True:
+            liberadas = dao.barrerReservasVencidas(lote)
+            total += liberadas
+            if liberadas < lote:
+                break
+        click.echo(f"Reservas vencidas liberadas: {total}")
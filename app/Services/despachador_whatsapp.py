@@ -0,0 +1,186 @@
+"""
+Despachador persistente de WhatsApp.
+
+Los endpoints de avisos ya no abren un navegador por pedido: encolan el
+envío en envios_whatsapp (sql/011) y responden enseguida. Este proceso,
+uno solo por base (advisory lock LOCK_DESPACHADOR), mantiene abierta la
+sesión de WhatsApp Web y procesa la cola en orden:
+  - tipo 'aviso': envía un aviso puntual
+  - tipo 'pendientes': envía los avisos de WhatsApp pendientes
+Se despierta con NOTIFY en el canal CANAL_ENVIOS y, por si se perdiera un
+aviso, revisa la cola cada `intervalo` segundos. En cada vuelta también
+reintenta los avisos fallidos cuyo proximo_intento_en ya pasó (sql/014).
+
+Los avisos puntuales se toman antes que las corridas de pendientes, y
+pendientes y reintentos se procesan de a un lote de `lote` avisos: entre
+lote y lote se vuelve a mirar la cola, así un clic espera como mucho un
+lote chico y no la corrida entera.
+
+Se ejecuta con: flask despachador-whatsapp
+"""
+
+import os
+import select
+import time
+
+import click
+import psycopg2
+from flask import current_app as app
+
+from app.conexion.Conexion import Conexion
+from app.dao.referenciales_agendamiento.avisosRecordatorios.EnvioWhatsappDao import (
+    EnvioWhatsappDao, CANAL_ENVIOS, LOCK_DESPACHADOR
+)
+from app.Services.whatsapp_service import AvisoRecordatorioService
+
+INTERVALO_REVISION = int(os.environ.get('WHATSAPP_DESPACHADOR_INTERVALO', 30))
+
+# Avisos por lote de pendientes o reintentos entre revisiones de la cola
+LOTE_DESPACHADOR = int(os.environ.get('WHATSAPP_DESPACHADOR_LOTE', 1))
+
+# Minutos sin envíos tras los cuales se cierra el navegador (0 = nunca)
+MINUTOS_INACTIVIDAD = int(os.environ.get('WHATSAPP_DESPACHADOR_INACTIVIDAD', 0))
+
+
+class DespachadorWhatsApp:
+
+    def __init__(self, intervalo=INTERVALO_REVISION, minutos_inactividad=MINUTOS_INACTIVIDAD,
+                 lote=LOTE_DESPACHADOR):
+        self.intervalo = intervalo
+        self.minutos_inactividad = minutos_inactividad
+        self.lote = lote
+        self.dao = EnvioWhatsappDao()
+        self.servicio = AvisoRecordatorioService()
+        self.con = None
+        self.ultimo_envio = time.monotonic()
+
+    def conectar(self):
+        """
+        Abre la conexión dedicada (fuera del pool) que guarda el lock y escucha
+        el canal. Retorna False si ya hay otro despachador corriendo.
+        """
+        self.con = psycopg2.connect(
+            dbname=Conexion.dbname, user=Conexion.user, password=Conexion.password,
+            host=Conexion.host, port=Conexion.port
+        )
+        self.con.set_session(autocommit=True)
+        cur = self.con.cursor()
+        try:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (LOCK_DESPACHADOR,))
+            if not cur.fetchone()[0]:
+                return False
+            cur.execute(f"LISTEN {CANAL_ENVIOS}")
+            return True
+        finally:
+            cur.close()
+
+    def procesar(self, envio):
+        """
+        Ejecuta un envío de la cola y retorna (exito, resultado).
+        exito None: la corrida de pendientes procesó un lote y quedan más.
+        """
+        if envio['tipo'] == 'aviso':
+            if not self.servicio.transporte.conectar():
+                return False, 'No se pudo conectar a WhatsApp Web'
+            if self.servicio.enviar_aviso(envio['id_aviso']):
+                return True, 'Mensaje enviado'
+            return False, 'No se pudo enviar el aviso'
+
+        if envio['tipo'] == 'pendientes':
+            resumen = self.servicio.procesar_avisos_pendientes(self.lote, max_lotes=1)
+            if resumen['quedan']:
+                return None, f"{resumen['procesados']} avisos procesados, quedan más"
+            return True, 'Avisos pendientes procesados'
+
+        return False, f"Tipo de envío desconocido: {envio['tipo']}"
+
+    def vaciar_cola(self):
+        """Procesa envíos hasta que la cola quede vacía"""
+        while True:
+            envio = self.dao.tomarSiguienteEnvio()
+            if envio is None:
+                return
+            app.logger.info(f"📤 Procesando envío de WhatsApp #{envio['id_envio']} ({envio['tipo']})")
+            try:
+                exito, resultado = self.procesar(envio)
+            except Exception as e:
+                app.logger.error(f"❌ Error en envío de WhatsApp #{envio['id_envio']}: {str(e)}")
+                exito, resultado = False, str(e)
+            if exito is None:
+                # Vuelve a la cola: los avisos puntuales que llegaron mientras tanto van antes
+                self.dao.devolverACola(envio['id_envio'], resultado)
+            else:
+                self.dao.terminarEnvio(envio['id_envio'], exito, resultado)
+            self.ultimo_envio = time.monotonic()
+
+    def reintentar_vencidos(self):
+        """
+        Reenvía un lote de avisos reprogramados tras un fallo que ya llegaron a su
+        próximo intento. Retorna True si quedan más para la vuelta siguiente.
+        """
+        try:
+            resumen = self.servicio.procesar_avisos_pendientes(self.lote, solo_reintentos=True, max_lotes=1)
+        except Exception as e:
+            app.logger.error(f"❌ Error al reintentar avisos de WhatsApp: {str(e)}")
+            return False
+        if resumen['procesados']:
+            app.logger.info(
+                f"🔁 Reintentos de WhatsApp: {resumen['exitosos']} enviados, "
+                f"{resumen['reprogramados']} reprogramados, {resumen['fallidos']} descartados"
+            )
+            self.ultimo_envio = time.monotonic()
+        return resumen['quedan']
+
+    def esperar_aviso(self):
+        """Espera un NOTIFY o el intervalo de revisión y descarta los avisos recibidos"""
+        if select.select([self.con], [], [], self.intervalo) != ([], [], []):
+            self.con.poll()
+            # Solo interesa que llegó algo: la cola se lee entera igual
+            self.con.notifies.clear()
+
+    def cerrar_si_inactivo(self):
+        if not self.minutos_inactividad or not self.servicio.transporte.sesion_activa():
+            return
+        if time.monotonic() - self.ultimo_envio >= self.minutos_inactividad * 60:
+            app.logger.info("Cerrando el navegador de WhatsApp por inactividad")
+            self.servicio.transporte.cerrar()
+
+    def ejecutar(self):
+        if not self.conectar():
+            self.con.close()
+            raise click.ClickException('Ya hay un despachador de WhatsApp corriendo')
+
+        reencolados = self.dao.reencolarInterrumpidos()
+        if reencolados:
+            app.logger.info(f"Se reencolaron {reencolados} envíos interrumpidos")
+        app.logger.info(f"Despachador de WhatsApp escuchando el canal '{CANAL_ENVIOS}' (pid {os.getpid()})")
+
+        try:
+            while True:
+                self.vaciar_cola()
+                if self.reintentar_vencidos():
+                    # Quedan reintentos: se sigue sin esperar, revisando antes la cola
+                    continue
+                self.cerrar_si_inactivo()
+                self.esperar_aviso()
+        except KeyboardInterrupt:
+            app.logger.info("Despachador de WhatsApp detenido")
+        finally:
+            self.servicio.transporte.cerrar()
+            # Al cerrar la conexión se libera el advisory lock
+            self.con.close()
+
+
+def registrar_comandos(app_flask):
+    """Registra el comando de consola: flask despachador-whatsapp"""
+
+    @app_flask.cli.command('despachador-whatsapp')
+    @click.option('--intervalo', default=INTERVALO_REVISION, type=int,
+                  help='Segundos entre revisiones de la cola sin avisos')
+    @click.option('--inactividad', default=MINUTOS_INACTIVIDAD, type=int,
+                  help='Minutos sin envíos para cerrar el navegador (0 = nunca)')
+    @click.option('--lote', default=LOTE_DESPACHADOR, type=int,
+                  help='Avisos por lote de pendientes o reintentos entre revisiones de la cola')
+    def despachador_whatsapp(intervalo, inactividad, lote):
+        """Procesa la cola de envíos de WhatsApp con una sesión persistente."""
+        DespachadorWhatsApp(intervalo, inactividad, max(1, lote)).ejecutar()
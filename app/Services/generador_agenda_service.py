@@ -0,0 +1,139 @@
+import json
+from datetime import datetime
+import click
+from flask import current_app as app
+from app.dao.referenciales_agendamiento.agenda.AgendaCabeceraDao import AgendaCabeceraDao
+
+
+class GeneradorAgendaService:
+    """
+    Genera la agenda de uno o varios médicos para un rango de fechas a partir
+    de un patrón semanal (días/turnos/horas/cupos).
+    Todo lo pesado lo hace AgendaCabeceraDao.generarAgendaRecurrente en una
+    sola sentencia por médico.
+    """
+
+    MAX_DIAS_RANGO = 366
+
+    def __init__(self):
+        self.dao = AgendaCabeceraDao()
+
+    def _leer_hora(self, valor, campo):
+        for formato in ("%H:%M", "%H:%M:%S"):
+            try:
+                return datetime.strptime(str(valor), formato).time()
+            except ValueError:
+                continue
+        raise ValueError(f"{campo} debe tener formato HH:MM")
+
+    def validar(self, datos):
+        """
+        Valida y normaliza un pedido de generación.
+        Retorna el dict de parámetros para el DAO; lanza ValueError con el motivo.
+        """
+        for campo in ['id_medico', 'id_especialidad', 'id_funcionario', 'fecha_desde', 'fecha_hasta', 'patron']:
+            if campo not in datos or not datos[campo]:
+                raise ValueError(f"El campo {campo} es obligatorio")
+
+        fecha_desde = datetime.strptime(datos['fecha_desde'], "%Y-%m-%d").date()
+        fecha_hasta = datetime.strptime(datos['fecha_hasta'], "%Y-%m-%d").date()
+        if fecha_hasta < fecha_desde:
+            raise ValueError("fecha_hasta no puede ser anterior a fecha_desde")
+        if (fecha_hasta - fecha_desde).days >= self.MAX_DIAS_RANGO:
+            raise ValueError(f"El rango no puede superar {self.MAX_DIAS_RANGO} días")
+
+        if not isinstance(datos['patron'], list):
+            raise ValueError("patron debe ser una lista")
+
+        patron = []
+        for i, item in enumerate(datos['patron'], start=1):
+            for campo in ['id_dia', 'id_turno', 'hora_inicio', 'hora_fin', 'cupos']:
+                if campo not in item or item[campo] in (None, ''):
+                    raise ValueError(f"Patrón {i}: el campo {campo} es obligatorio")
+            hora_inicio = self._leer_hora(item['hora_inicio'], f"Patrón {i}: hora_inicio")
+            hora_fin = self._leer_hora(item['hora_fin'], f"Patrón {i}: hora_fin")
+            if hora_fin <= hora_inicio:
+                raise ValueError(f"Patrón {i}: hora_fin debe ser posterior a hora_inicio")
+            cupos = int(item['cupos'])
+            if cupos <= 0:
+                raise ValueError(f"Patrón {i}: cupos debe ser mayor a 0")
+            patron.append({
+                'id_dia': int(item['id_dia']),
+                'id_turno': int(item['id_turno']),
+                'hora_inicio': hora_inicio.strftime("%H:%M:%S"),
+                'hora_fin': hora_fin.strftime("%H:%M:%S"),
+                'cupos': cupos
+            })
+
+        # Los horarios del mismo día no pueden solaparse dentro del patrón
+        por_dia = {}
+        for item in patron:
+            por_dia.setdefault(item['id_dia'], []).append(item)
+        for id_dia, items in por_dia.items():
+            items.sort(key=lambda x: x['hora_inicio'])
+            for anterior, siguiente in zip(items, items[1:]):
+                if siguiente['hora_inicio'] < anterior['hora_fin']:
+                    raise ValueError(
+                        f"El patrón tiene horarios solapados el día {id_dia}: "
+                        f"{anterior['hora_inicio']}-{anterior['hora_fin']} y "
+                        f"{siguiente['hora_inicio']}-{siguiente['hora_fin']}"
+                    )
+
+        return {
+            'id_medico': int(datos['id_medico']),
+            'id_especialidad': int(datos['id_especialidad']),
+            'id_funcionario': int(datos['id_funcionario']),
+            'fecha_desde': fecha_desde,
+            'fecha_hasta': fecha_hasta,
+            'patron': patron,
+            'observaciones': datos.get('observaciones')
+        }
+
+    def generar(self, datos):
+        """Valida y genera la agenda de un médico. Lanza ValueError si el pedido es inválido."""
+        parametros = self.validar(datos)
+        return self.dao.generarAgendaRecurrente(**parametros)
+
+    def generar_lote(self, pedidos):
+        """
+        Genera la agenda de varios médicos (un pedido por médico).
+        Cada médico se genera en su propia transacción: un error no frena a los demás.
+        """
+        resultados = []
+        for pedido in pedidos:
+            id_medico = pedido.get('id_medico')
+            try:
+                resultado = self.generar(pedido)
+                if resultado is None:
+                    resultados.append({'id_medico': id_medico, 'success': False, 'error': 'Error al generar la agenda'})
+                else:
+                    resultados.append({'id_medico': id_medico, 'success': True, 'data': resultado})
+            except ValueError as ve:
+                resultados.append({'id_medico': id_medico, 'success': False, 'error': str(ve)})
+        return resultados
+
+
+def registrar_comandos(app_flask):
+    """Registra el comando de consola: flask generar-agendas pedidos.json"""
+
+    @app_flask.cli.command('generar-agendas')
+    @click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+    def generar_agendas(archivo):
+        """Genera en lote las agendas descritas en un archivo JSON (lista de pedidos)."""
+        with open(archivo, encoding='utf-8') as f:
+            pedidos = json.load(f)
+        if isinstance(pedidos, dict):
+            pedidos = [pedidos]
+
+        resultados = GeneradorAgendaService().generar_lote(pedidos)
+        for r in resultados:
+            if r['success']:
+                d = r['data']
+                click.echo(
+                    f"Médico {r['id_medico']}: {d['cabeceras_creadas']} cabeceras, "
+                    f"{d['disponibilidades_creadas']} disponibilidades, {d['detalles_creados']} detalles, "
+                    f"{len(d['omitidos'])} omitidos"
+                )
+            else:
+                click.echo(f"Médico {r['id_medico']}: ERROR - {r['error']}", err=True)
+        app.logger.info(f"Generación en lote terminada: {sum(1 for r in resultados if r['success'])}/{len(resultados)} médicos")
@@ -0,0 +1,95 @@
+from datetime import datetime
+import click
+from flask import current_app as app
+from app.dao.referenciales_agendamiento.agenda.ReconciliacionCuposDao import ReconciliacionCuposDao
+
+LOTE_PENDIENTES = 500
+MAX_DIAS_RANGO = 366
+
+
+class ReconciliadorCuposService:
+    """
+    Reconciliación de cupos de agenda_detalle:
+      - por rango de fechas: reporte de desvíos y corrección opcional
+      - incremental: solo los turnos que cambiaron desde la última corrida
+        (pensado para correr cada pocos minutos, ej. desde cron)
+    """
+
+    def __init__(self):
+        self.dao = ReconciliacionCuposDao()
+
+    def validar_rango(self, fecha_desde, fecha_hasta):
+        """Convierte y valida el rango (AAAA-MM-DD). Lanza ValueError si es inválido."""
+        desde = datetime.strptime(str(fecha_desde), "%Y-%m-%d").date()
+        hasta = datetime.strptime(str(fecha_hasta), "%Y-%m-%d").date()
+        if hasta < desde:
+            raise ValueError("fecha_hasta no puede ser anterior a fecha_desde")
+        if (hasta - desde).days > MAX_DIAS_RANGO:
+            raise ValueError(f"El rango no puede superar {MAX_DIAS_RANGO} días")
+        return desde, hasta
+
+    def reportar(self, fecha_desde, fecha_hasta):
+        return self.dao.reportarDesvios(fecha_desde, fecha_hasta)
+
+    def corregir(self, fecha_desde, fecha_hasta):
+        return self.dao.corregirDesvios(fecha_desde, fecha_hasta)
+
+    def reconciliar_pendientes(self, limite=LOTE_PENDIENTES):
+        """Procesa lotes hasta vaciar los pendientes. Retorna el total o None si un lote falló."""
+        revisados = 0
+        correcciones = []
+        while True:
+            lote = self.dao.reconciliarPendientes(limite)
+            if lote is None:
+                return None
+            revisados += lote['revisados']
+            correcciones.extend(lote['correcciones'])
+            # El límite es de marcas, no de turnos: se corta cuando quedaron menos marcas que un lote
+            if lote['marcas'] < limite:
+                return {'revisados': revisados, 'correcciones': correcciones}
+
+
+def registrar_comandos(app_flask):
+    """Registra el comando de consola: flask reconciliar-cupos"""
+
+    @app_flask.cli.command('reconciliar-cupos')
+    @click.option('--desde', help='Fecha inicial AAAA-MM-DD (sin fechas: modo incremental)')
+    @click.option('--hasta', help='Fecha final AAAA-MM-DD')
+    @click.option('--corregir', is_flag=True, help='Con rango de fechas: corrige además de reportar')
+    def reconciliar_cupos(desde, hasta, corregir):
+        """Reporta y corrige desvíos entre cupos_disponibles y las citas reales."""
+        servicio = ReconciliadorCuposService()
+
+        if not desde and not hasta:
+            resultado = servicio.reconciliar_pendientes()
+            if resultado is None:
+                raise click.ClickException('Falló la reconciliación incremental (ver log)')
+            for c in resultado['correcciones']:
+                click.echo(f"Turno {c['id_agenda_detalle']}: {c['cupos_anteriores']} -> {c['cupos_corregidos']}")
+            click.echo(f"Turnos revisados: {resultado['revisados']}, corregidos: {len(resultado['correcciones'])}")
+            return
+
+        try:
+            fecha_desde, fecha_hasta = servicio.validar_rango(desde or hasta, hasta or desde)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+
+        if corregir:
+            correcciones = servicio.corregir(fecha_desde, fecha_hasta)
+            if correcciones is None:
+                raise click.ClickException('Falló la corrección de cupos (ver log)')
+            for c in correcciones:
+                click.echo(f"Turno {c['id_agenda_detalle']}: {c['cupos_anteriores']} -> {c['cupos_corregidos']}")
+            click.echo(f"Turnos corregidos: {len(correcciones)}")
+        else:
+            desvios = servicio.reportar(fecha_desde, fecha_hasta)
+            if desvios is None:
+                raise click.ClickException('Falló el reporte de desvíos (ver log)')
+            for d in desvios:
+                click.echo(
+                    f"{d['fecha']} {d['hora_inicio']} turno {d['id_agenda_detalle']}: "
+                    f"disponibles {d['cupos_disponibles']}, esperados {d['cupos_esperados']} "
+                    f"(ocupados {d['ocupados']}, reservados {d['reservados']}, máximo {d['cupos_maximos']})"
+                )
+            click.echo(f"Turnos con desvío: {len(desvios)}")
+        app.logger.info(f"Reconciliación de cupos {fecha_desde} a {fecha_hasta} terminada")
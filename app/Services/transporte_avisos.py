@@ -0,0 +1,99 @@
+"""
+Transportes de envío de avisos.
+
+AvisoRecordatorioService no depende del navegador: envía a través de un
+TransporteAvisos. Implementaciones:
+  - WhatsAppService (whatsapp_service.py): WhatsApp Web con Selenium
+  - TransporteSimulado: en memoria, registra los mensajes y simula
+    latencia y fallos (para pruebas manuales y benchmarks)
+"""
+
+import random
+import threading
+import time
+
+
+class TransporteAvisos:
+    """Interfaz de un canal de envío de avisos"""
+
+    # Segundos de espera entre mensajes de un lote (límite de ritmo del canal)
+    pausa_entre_envios = 0
+
+    # Peor caso de un envío en segundos (incluido un fallo por timeout); el
+    # servicio lo usa para que un lote no tarde más que la toma de los avisos
+    segundos_por_envio = 1
+
+    def conectar(self):
+        """Abre la sesión del canal si no hay una activa. Retorna True si quedó lista."""
+        return True
+
+    def sesion_activa(self):
+        return True
+
+    def enviar(self, telefono, mensaje):
+        """Envía un mensaje. Retorna True si se envió."""
+        raise NotImplementedError
+
+    def enviar_lote(self, envios, al_enviar=None):
+        """
+        Envía una lista de (telefono, mensaje) en orden.
+        al_enviar(indice, enviado) se llama apenas termina cada envío, para
+        que el resultado quede guardado antes de pasar al siguiente.
+        Retorna una lista de bool con el resultado de cada envío.
+        """
+        resultados = []
+        for i, (telefono, mensaje) in enumerate(envios):
+            if i and self.pausa_entre_envios:
+                time.sleep(self.pausa_entre_envios)
+            enviado = self.enviar(telefono, mensaje)
+            resultados.append(enviado)
+            if al_enviar is not None:
+                al_enviar(i, enviado)
+        return resultados
+
+    def cerrar(self):
+        pass
+
+
+class TransporteSimulado(TransporteAvisos):
+    """
+    Transporte en memoria.
+    - latencia: segundos que tarda cada envío
+    - tasa_fallos: probabilidad (0 a 1) de que un envío falle
+    - semilla: para que los fallos sean reproducibles
+    """
+
+    def __init__(self, latencia=0.0, tasa_fallos=0.0, semilla=None):
+        if not 0 <= tasa_fallos <= 1:
+            raise ValueError("tasa_fallos debe estar entre 0 y 1")
+        self.latencia = latencia
+        self.tasa_fallos = tasa_fallos
+        self._azar = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.enviados = []  # (telefono, mensaje)
+        self.fallidos = []
+        self.conectado = False
+
+    @property
+    def segundos_por_envio(self):
+        return max(self.latencia, 0.001)
+
+    def conectar(self):
+        self.conectado = True
+        return True
+
+    def sesion_activa(self):
+        return self.conectado
+
+    def enviar(self, telefono, mensaje):
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            if self._azar.random() < self.tasa_fallos:
+                self.fallidos.append((telefono, mensaje))
+                return False
+            self.enviados.append((telefono, mensaje))
+            return True
+
+    def cerrar(self):
+        self.conectado = False
@@ -1,19 +1,34 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+try:
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+except ImportError:
+    # Sin Selenium solo se puede usar otro transporte (ej. TransporteSimulado)
+    webdriver = None
+import os
+import socket
 import time
 import urllib.parse
+import uuid
 from datetime import datetime
 from flask import current_app as app
 from app.dao.referenciales_agendamiento.avisosRecordatorios.AvisosRecordatorioDao import AvisoRecordatorioDao
+from app.Services.transporte_avisos import TransporteAvisos
 
-class WhatsAppService:
+class WhatsAppService(TransporteAvisos):
     """Servicio para enviar mensajes por WhatsApp Web"""
     
+    # WhatsApp Web bloquea la cuenta si se envía muy seguido
+    pausa_entre_envios = 3
+    
+    # Un envío fallido recorre los 7 selectores con WebDriverWait de 8 s, más
+    # las esperas de la página y el intento con Enter
+    segundos_por_envio = 80
+    
     def __init__(self):
         self.driver = None
         self.conectado = False
@@ -23,9 +38,11 @@ class WhatsAppService:
         if self.driver is not None:
             return True
         
-        try:
-            import os
+        if webdriver is None:
+            print("Selenium no esta instalado: no se puede abrir WhatsApp Web")
+            return False
         
+        try:
             options = webdriver.ChromeOptions()
         
             # Usar SIEMPRE la misma carpeta de sesión (persistente)
@@ -175,6 +192,39 @@ class WhatsAppService:
             print(f"   Error al enviar a {numero}: {str(e)}")
             return False
     
+    def enviar(self, telefono, mensaje):
+        return self.enviar_mensaje(telefono, mensaje)
+    
+    def conectar(self):
+        """Abre el navegador y espera WhatsApp Web solo si no hay una sesión activa"""
+        if self.sesion_activa():
+            return True
+        if not self.inicializar_navegador():
+            print("No se pudo inicializar el navegador")
+            return False
+        if not self.esperar_carga():
+            print("No se pudo conectar a WhatsApp Web")
+            self.cerrar()
+            return False
+        return True
+    
+    def sesion_activa(self):
+        """Indica si el navegador sigue abierto y con WhatsApp Web conectado"""
+        if self.driver is None or not self.conectado:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            # El navegador se cerró o se colgó: se descarta para abrir uno nuevo
+            print("   La sesion del navegador se perdio")
+            try:
+                self.cerrar()
+            except Exception:
+                self.driver = None
+                self.conectado = False
+            return False
+
     def cerrar(self):
         """Cierra el navegador"""
         if self.driver:
@@ -183,12 +233,31 @@ class WhatsAppService:
             self.conectado = False
 
 
+# Avisos que se toman y envían por lote en procesar_avisos_pendientes
+LOTE_AVISOS = int(os.environ.get('AVISOS_LOTE', 100))
+
+# Segundos tras los cuales otro trabajador puede retomar un aviso tomado.
+# Cada resultado guardado renueva la toma del resto del lote, y el lote se
+# achica para que incluso un solo envío lento no la deje vencer (ver limite_lote).
+TOMA_VENCIMIENTO = int(os.environ.get('AVISOS_TOMA_VENCIMIENTO', 1800))
+
+# Reintentos de envíos fallidos (ver sql/014): espera exponencial desde
+# REINTENTO_ESPERA_BASE hasta REINTENTO_ESPERA_MAXIMA segundos, con jitter
+MAX_INTENTOS = int(os.environ.get('AVISOS_MAX_INTENTOS', 5))
+REINTENTO_ESPERA_BASE = int(os.environ.get('AVISOS_REINTENTO_ESPERA_BASE', 60))
+REINTENTO_ESPERA_MAXIMA = int(os.environ.get('AVISOS_REINTENTO_ESPERA_MAXIMA', 3600))
+
+
 class AvisoRecordatorioService:
     """Servicio principal para enviar recordatorios desde la BD"""
     
-    def __init__(self):
+    def __init__(self, transporte=None):
         self.dao = AvisoRecordatorioDao()
-        self.whatsapp = WhatsAppService()
+        # Por defecto WhatsApp Web; el despachador comparte una sesión ya abierta
+        # entre envíos y el benchmark usa TransporteSimulado
+        self.transporte = transporte or WhatsAppService()
+        # Identifica las tomas de avisos de esta instancia (ver sql/013)
+        self.trabajador = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
     
     def formatear_mensaje(self, aviso):
         """
@@ -261,129 +330,155 @@ Gracias."""
             cur.close()
             con.close()
     
-    def procesar_avisos_pendientes(self):
-        """Procesa y envía todos los avisos pendientes de WhatsApp"""
-        print(f"\n{'='*60}")
-        print(f"Procesando avisos - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"{'='*60}\n")
-        
+    def procesar_avisos_pendientes(self, limite=LOTE_AVISOS, solo_reintentos=False, max_lotes=None):
+        """
+        Envía los avisos pendientes de WhatsApp en lotes de `limite`, en orden de cita.
+        Cada lote se toma con FOR UPDATE SKIP LOCKED, así que varios trabajadores
+        pueden correr a la vez sin enviar dos veces el mismo aviso.
+        Los fallidos se reprograman con espera exponencial hasta MAX_INTENTOS;
+        solo_reintentos=True procesa solo los reprogramados que ya vencieron.
+        max_lotes corta después de esa cantidad de lotes (el despachador procesa uno
+        por vuelta para atender antes los avisos puntuales).
+        Retorna el resumen {'procesados', 'exitosos', 'reprogramados', 'fallidos', 'quedan'};
+        quedan es True si se cortó por max_lotes con un lote completo.
+        """
+        resumen = {'procesados': 0, 'exitosos': 0, 'reprogramados': 0, 'fallidos': 0, 'quedan': False}
+        lotes = 0
+        limite = self.limite_lote(limite)
         try:
-            avisos = self.dao.getAvisos()
-            
-            avisos_whatsapp = [
-                a for a in avisos 
-                if a.get('forma_envio') == 'WhatsApp' 
-                and a.get('estado_envio') == 'Pendiente'
-            ]
-            
-            if not avisos_whatsapp:
-                print("No hay avisos de WhatsApp pendientes")
-                return
-            
-            print(f"{len(avisos_whatsapp)} avisos para procesar\n")
-            
-            if not self.whatsapp.inicializar_navegador():
-                print("No se pudo inicializar el navegador")
-                return
-            
-            if not self.whatsapp.esperar_carga():
-                print("No se pudo conectar a WhatsApp Web")
-                self.whatsapp.cerrar()
-                return
-            
-            exitosos = 0
-            fallidos = 0
-            
-            for aviso in avisos_whatsapp:
-                id_aviso = aviso['id_aviso']
-                paciente = aviso.get('paciente', 'Paciente')
-                
-                print(f"{'='*60}")
-                print(f"Procesando aviso #{id_aviso} - {paciente}")
-                print(f"{'='*60}")
-                
-                aviso_completo = self.dao.getAvisoById(id_aviso)
-                if not aviso_completo:
-                    print(f"   ❌ No se encontró el aviso\n")
-                    continue
-                
-                id_paciente = aviso_completo.get('id_paciente')
-                telefono = self.obtener_telefono_paciente(id_paciente)
-                
-                if not telefono:
-                    print(f"   ❌ Paciente sin teléfono registrado\n")
-                    self._marcar_error(id_aviso)
-                    fallidos += 1
-                    continue
-                
-                # ✅ PASO 1: Generar el mensaje automático
-                print(f"   📝 Generando mensaje automático...")
-                mensaje_generado = self.formatear_mensaje(aviso_completo)
-                
-                print(f"   ✅ Mensaje generado ({len(mensaje_generado)} caracteres)")
-                print(f"   Primeros 150 caracteres:")
-                print(f"   {mensaje_generado[:150]}...")
-                print()
+            while True:
+                avisos = self.dao.tomarAvisosPendientes(
+                    'WhatsApp', limite, self.trabajador, TOMA_VENCIMIENTO, solo_reintentos
+                )
+                if not avisos:
+                    break
                 
-                # ✅ PASO 2: Enviar por WhatsApp
-                print(f"   📤 Enviando a: {telefono}")
+                if not resumen['procesados']:
+                    print(f"\n{'='*60}")
+                    print(f"Procesando avisos - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    print(f"{'='*60}\n")
+                print(f"{len(avisos)} avisos para procesar\n")
                 
-                if self.whatsapp.enviar_mensaje(telefono, mensaje_generado):
-                    print(f"   ✅ Mensaje enviado por WhatsApp exitosamente")
-                    
-                    # ✅ PASO 3: GUARDAR EL MENSAJE GENERADO EN LA BD
-                    print(f"   💾 Guardando mensaje en la base de datos...")
-                    
-                    datos_para_actualizar = {
-                        'id_paciente': aviso_completo['id_paciente'],
-                        'id_funcionario': aviso_completo['id_funcionario'],  # ✅ CAMBIO
-                        'id_medico': aviso_completo.get('id_medico'),
-                        'codigo': aviso_completo.get('codigo'),
-                        'fecha_cita': aviso_completo['fecha_cita'],
-                        'hora_cita': aviso_completo['hora_cita'],
-                        'forma_envio': aviso_completo['forma_envio'],
-                        'mensaje': mensaje_generado,
-                        'estado_envio': 'Enviado',
-                        'estado_confirmacion': aviso_completo.get('estado_confirmacion', 'Pendiente')
-                    }
-                    
-                    resultado = self.dao.updateAviso(id_aviso, datos_para_actualizar)
-                    
-                    if resultado:
-                        print(f"   ✅ Mensaje guardado en BD correctamente")
-                        exitosos += 1
-                    else:
-                        print(f"   ⚠️ Mensaje enviado pero hubo error al guardar en BD")
-                        exitosos += 1
-                    
+                if self.transporte.conectar():
+                    guardados = self.enviar_avisos(avisos)
                 else:
-                    print(f"   ❌ Error al enviar mensaje por WhatsApp")
-                    self._marcar_error(id_aviso)
-                    fallidos += 1
+                    # Se reprograman en lugar de quedar tomados hasta que venza la toma
+                    guardados = self.registrar_resultados([{
+                        'id_aviso': a['id_aviso'], 'estado_envio': 'Error', 'mensaje': None,
+                        'reintentable': True, 'error': 'No se pudo conectar al canal de envío'
+                    } for a in avisos])
                 
-                print()
-                time.sleep(3)
+                resumen['procesados'] += len(avisos)
+                if not guardados:
+                    print("❌ No se pudo guardar el resultado del lote")
+                    break
+                resumen['exitosos'] += guardados.get('Enviado', 0)
+                resumen['reprogramados'] += guardados.get('Pendiente', 0)
+                resumen['fallidos'] += guardados.get('Error', 0)
+                if len(avisos) < limite or not self.transporte.sesion_activa():
+                    break
+                lotes += 1
+                if max_lotes is not None and lotes >= max_lotes:
+                    resumen['quedan'] = True
+                    break
+            
+            if not resumen['procesados']:
+                if not solo_reintentos:
+                    print("No hay avisos de WhatsApp pendientes")
+                return resumen
             
             print(f"\n{'='*60}")
             print(f"RESUMEN FINAL:")
-            print(f"   ✅ Exitosos: {exitosos}")
-            print(f"   ❌ Fallidos: {fallidos}")
+            print(f"   ✅ Exitosos: {resumen['exitosos']}")
+            print(f"   🔁 Reprogramados: {resumen['reprogramados']}")
+            print(f"   ❌ Fallidos: {resumen['fallidos']}")
             print(f"{'='*60}\n")
             
         except Exception as e:
             print(f"❌ Error general al procesar avisos: {str(e)}")
             import traceback
             traceback.print_exc()
+        return resumen
     
-    def _marcar_error(self, id_aviso):
-        """Marca un aviso como error"""
-        try:
-            aviso = self.dao.getAvisoById(id_aviso)
-            if aviso:
-                aviso['estado_envio'] = 'Error'
-                self.dao.updateAviso(id_aviso, aviso)
-        except Exception as e:
-            print(f"Error al marcar como error: {e}")
+    def limite_lote(self, limite):
+        """
+        Tamaño de lote que el transporte alcanza a enviar, en el peor caso, en la
+        mitad de TOMA_VENCIMIENTO: así la toma no vence con envíos sin guardar.
+        """
+        por_envio = self.transporte.segundos_por_envio + self.transporte.pausa_entre_envios
+        return max(1, min(limite, int(TOMA_VENCIMIENTO / 2 / por_envio)))
+    
+    def enviar_avisos(self, avisos):
+        """
+        Genera los mensajes y los envía como un lote por el transporte (la sesión
+        ya debe estar abierta). Cada resultado se guarda apenas termina su envío,
+        así un aviso enviado nunca queda tomado sin resultado mientras se manda el
+        resto del lote. Los avisos sin teléfono no se envían ni se reintentan.
+        Retorna {estado_envio: cantidad} de los resultados guardados.
+        """
+        por_estado = {}
+        
+        def guardar(resultado):
+            guardado = self.registrar_resultados([resultado])
+            if guardado is None:
+                print(f"   ⚠️ Aviso #{resultado['id_aviso']} procesado pero hubo error al guardar en BD")
+                return
+            for estado, cantidad in guardado.items():
+                por_estado[estado] = por_estado.get(estado, 0) + cantidad
+        
+        preparados = []
+        for aviso in avisos:
+            telefono = aviso.get('telefono_paciente')
+            if not telefono:
+                print(f"   ❌ Paciente sin teléfono registrado (aviso #{aviso['id_aviso']})")
+                guardar({
+                    'id_aviso': aviso['id_aviso'], 'estado_envio': 'Error', 'mensaje': None,
+                    'reintentable': False, 'error': 'Paciente sin teléfono registrado'
+                })
+                continue
+            mensaje_generado = self.formatear_mensaje(aviso)
+            print(f"   📝 Aviso #{aviso['id_aviso']} - {aviso.get('paciente', 'Paciente')}: "
+                  f"mensaje de {len(mensaje_generado)} caracteres para {telefono}")
+            preparados.append((aviso, telefono, mensaje_generado))
+        
+        def al_enviar(indice, enviado):
+            aviso, telefono, mensaje_generado = preparados[indice]
+            if enviado:
+                print(f"   ✅ Aviso #{aviso['id_aviso']} enviado")
+                guardar({
+                    'id_aviso': aviso['id_aviso'], 'estado_envio': 'Enviado', 'mensaje': mensaje_generado,
+                    'reintentable': False, 'error': None
+                })
+            else:
+                print(f"   ❌ Error al enviar el aviso #{aviso['id_aviso']} a {telefono}")
+                guardar({
+                    'id_aviso': aviso['id_aviso'], 'estado_envio': 'Error', 'mensaje': None,
+                    'reintentable': True, 'error': 'No se pudo enviar el mensaje'
+                })
+        
+        self.transporte.enviar_lote(
+            [(telefono, mensaje) for _, telefono, mensaje in preparados], al_enviar
+        )
+        return por_estado
+    
+    def registrar_resultados(self, resultados):
+        """Guarda los resultados aplicando la política de reintentos. Retorna {estado_envio: cantidad} o None."""
+        return self.dao.registrarResultadosEnvio(
+            resultados, self.trabajador,
+            MAX_INTENTOS, REINTENTO_ESPERA_BASE, REINTENTO_ESPERA_MAXIMA
+        )
+    
+    def enviar_aviso(self, id_aviso):
+        """
+        Envía un aviso por el transporte (la sesión ya debe estar abierta) y
+        guarda el mensaje enviado. Retorna True si se envió.
+        """
+        aviso = self.dao.tomarAviso(id_aviso, self.trabajador, TOMA_VENCIMIENTO)
+        if not aviso:
+            print(f"   ❌ El aviso #{id_aviso} no existe o lo está enviando otro proceso")
+            return False
+        
+        return self.enviar_avisos([aviso]).get('Enviado', 0) > 0
     
     def ejecutar_una_vez(self):
         """Ejecuta el envío una sola vez"""
@@ -391,7 +486,7 @@ Gracias."""
             self.procesar_avisos_pendientes()
         finally:
             input("\nPresiona Enter para cerrar el navegador...")
-            self.whatsapp.cerrar()
+            self.transporte.cerrar()
     
     def mantener_activo(self):
         """Mantiene el servicio activo"""
@@ -409,7 +504,7 @@ Gracias."""
                 time.sleep(60)
         except KeyboardInterrupt:
             print("\nCerrando servicio...")
-            self.whatsapp.cerrar()
+            self.transporte.cerrar()
 
 
 if __name__ == "__main__":
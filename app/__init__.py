@@ -223,3 +223,21 @@ def vista():
 
 
 
+
+# ============================================
+# COMANDOS DE CONSOLA (flask <comando>)
+# ============================================
+from app.Services import generador_agenda_service, reconciliador_cupos, despachador_whatsapp, barredor_reservas
+
+generador_agenda_service.registrar_comandos(app)
+reconciliador_cupos.registrar_comandos(app)
+despachador_whatsapp.registrar_comandos(app)
+barredor_reservas.registrar_comandos(app)
+
+# ============================================
+# CACHE DE CATÁLOGOS REFERENCIALES
+# ============================================
+from app.dao.cache_catalogos import precalentar_catalogos
+
+with app.app_context():
+    precalentar_catalogos()
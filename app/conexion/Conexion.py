@@ -1,22 +1,85 @@
-import psycopg2
+import os
+import threading
+from app.conexion.PoolConexiones import PoolConexiones
+from app.conexion.UnidadTrabajo import unidad_trabajo_actual
 
 class Conexion:
 
+    # Parámetros de conexión
+    # https://www.psycopg.org/docs/extensions.html#psycopg2.extensions.parse_dsn
+    dbname = "odontosisbd"
+    user = "postgres"
+    password = "15dediciembre"
+    host = "127.0.0.1"
+    port = 5432
+
+    # Configuración del pool (se puede sobreescribir por variables de entorno)
+    pool_min = int(os.environ.get('DB_POOL_MIN', 2))
+    pool_max = int(os.environ.get('DB_POOL_MAX', 20))
+    pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    pool_max_inactividad = float(os.environ.get('DB_POOL_MAX_INACTIVIDAD', 60))
+
+    _pool = None
+    _pool_pid = None
+    _pool_heredado = None
+    _pool_lock = threading.Lock()
+
     """Metodo constructor
     """
     def __init__(self):
-        # https://www.psycopg.org/docs/extensions.html#psycopg2.extensions.parse_dsn
-        dbname = "odontosisbd"
-        user = "postgres"
-        password = "15dediciembre"
-        host = "127.0.0.1"
-        port = 5432
         #self.con = psycopg2.connect("dbname=odontosisbd user=Postgres host=localhost password=15dediciembre")
-        self.con = psycopg2.connect(dbname=dbname, user=user, password=password, host=host, port=port)
+        # Dentro de una unidad de trabajo (@unidad_de_trabajo) se reutiliza la conexion del request
+        self.con = unidad_trabajo_actual() or Conexion.getPool().getconn()
 
     """getConexion
 
-        retorna la instancia de la base de datos
+        retorna la instancia de la base de datos.
+        con.close() devuelve la conexion al pool en lugar de cerrarla
     """
     def getConexion(self):
-        return self.con
\ No newline at end of file
+        return self.con
+
+    @classmethod
+    def getPool(cls):
+        """Crea el pool la primera vez (y de nuevo en cada proceso hijo tras un fork)"""
+        pid = os.getpid()
+        if cls._pool is None or cls._pool_pid != pid:
+            with cls._pool_lock:
+                if cls._pool is None or cls._pool_pid != pid:
+                    # El pool heredado del proceso padre no se cierra ni se libera:
+                    # sus sockets siguen siendo del padre
+                    if cls._pool is not None:
+                        cls._pool_heredado = cls._pool
+                    cls._pool = PoolConexiones(
+                        cls.pool_min, cls.pool_max,
+                        timeout=cls.pool_timeout,
+                        max_inactividad=cls.pool_max_inactividad,
+                        dbname=cls.dbname, user=cls.user, password=cls.password,
+                        host=cls.host, port=cls.port
+                    )
+                    cls._pool_pid = pid
+        return cls._pool
+
+    @classmethod
+    def configurarPool(cls, minconn=None, maxconn=None, timeout=None, max_inactividad=None):
+        """Cambia el tamaño/timeout del pool; se aplica al próximo getPool()"""
+        with cls._pool_lock:
+            if minconn is not None:
+                cls.pool_min = minconn
+            if maxconn is not None:
+                cls.pool_max = maxconn
+            if timeout is not None:
+                cls.pool_timeout = timeout
+            if max_inactividad is not None:
+                cls.pool_max_inactividad = max_inactividad
+            if cls._pool is not None and cls._pool_pid == os.getpid():
+                cls._pool.closeall()
+            cls._pool = None
+
+    @classmethod
+    def cerrarPool(cls):
+        """Cierra todas las conexiones del pool (al apagar la aplicación)"""
+        with cls._pool_lock:
+            if cls._pool is not None and cls._pool_pid == os.getpid():
+                cls._pool.closeall()
+            cls._pool = None
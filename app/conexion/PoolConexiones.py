@@ -0,0 +1,183 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+
+class PoolAgotadoError(PoolError):
+    """Se lanza cuando no se libera ninguna conexión dentro del tiempo de espera"""
+
+
+class ConexionPooled:
+    """
+    Envoltorio de una conexión psycopg2 prestada por el pool.
+    Se comporta igual que la conexión original, salvo close(),
+    que la devuelve al pool en lugar de cerrarla.
+    """
+
+    def __init__(self, pool, con):
+        self._pool = pool
+        self._con = con
+
+    def __getattr__(self, nombre):
+        if self._con is None:
+            raise psycopg2.InterfaceError("La conexión ya fue devuelta al pool")
+        return getattr(self._con, nombre)
+
+    @property
+    def closed(self):
+        return 1 if self._con is None else self._con.closed
+
+    def close(self):
+        """Devuelve la conexión al pool (se puede llamar más de una vez)"""
+        if self._con is not None:
+            con, self._con = self._con, None
+            self._pool.putconn(con)
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones thread-safe para PostgreSQL.
+
+    - minconn: conexiones que se abren al crear el pool y se mantienen abiertas
+    - maxconn: máximo de conexiones abiertas al mismo tiempo
+    - timeout: segundos que espera getconn() a que se libere una conexión
+    - max_inactividad: segundos sin uso tras los cuales se verifica la
+      conexión con SELECT 1 antes de entregarla
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30, max_inactividad=60, **kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamaño de pool inválido")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_inactividad = max_inactividad
+        self._kwargs = kwargs
+        self._libres = deque()  # (conexion, momento en que se devolvió)
+        self._total = 0
+        self._cerrado = False
+        self._cond = threading.Condition()
+
+        for _ in range(minconn):
+            self._libres.append((self._conectar(), time.monotonic()))
+            self._total += 1
+
+    def _conectar(self):
+        return psycopg2.connect(**self._kwargs)
+
+    def _saludable(self, con, ultimo_uso):
+        """Health check al entregar una conexión"""
+        if con.closed:
+            return False
+        if time.monotonic() - ultimo_uso < self.max_inactividad:
+            return True
+        try:
+            cur = con.cursor()
+            try:
+                cur.execute("SELECT 1")
+            finally:
+                cur.close()
+            con.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _descartar(self, con):
+        try:
+            if not con.closed:
+                con.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def getconn(self):
+        """
+        Entrega una conexión del pool como ConexionPooled.
+        Si el pool está lleno espera hasta `timeout` segundos y luego
+        lanza PoolAgotadoError.
+        """
+        limite = time.monotonic() + self.timeout
+        while True:
+            con = None
+            ultimo_uso = None
+            with self._cond:
+                while True:
+                    if self._cerrado:
+                        raise PoolError("El pool de conexiones está cerrado")
+                    if self._libres:
+                        # LIFO: se reutiliza primero la conexión más reciente
+                        con, ultimo_uso = self._libres.pop()
+                        break
+                    if self._total < self.maxconn:
+                        self._total += 1
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise PoolAgotadoError(
+                            f"No hay conexiones libres tras esperar {self.timeout}s "
+                            f"(máximo {self.maxconn})"
+                        )
+                    self._cond.wait(restante)
+
+            # La conexión y el health check se hacen fuera del lock
+            if con is None:
+                try:
+                    con = self._conectar()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                return ConexionPooled(self, con)
+
+            if self._saludable(con, ultimo_uso):
+                return ConexionPooled(self, con)
+            self._descartar(con)
+
+    def putconn(self, con):
+        """Recibe una conexión cruda de vuelta; descarta las que quedaron rotas"""
+        if isinstance(con, ConexionPooled):
+            con.close()
+            return
+        if not con.closed and con.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            # Transacción abierta sin commit/rollback: no se filtra al siguiente uso
+            try:
+                con.rollback()
+            except psycopg2.Error:
+                pass
+        if con.closed or self._cerrado or con.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self._descartar(con)
+            return
+        with self._cond:
+            self._libres.append((con, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        """Cierra todas las conexiones libres y rechaza nuevos préstamos"""
+        with self._cond:
+            self._cerrado = True
+            libres = list(self._libres)
+            self._libres.clear()
+            self._total -= len(libres)
+            self._cond.notify_all()
+        for con, _ in libres:
+            try:
+                con.close()
+            except psycopg2.Error:
+                pass
+
+    def estado(self):
+        """Resumen para monitoreo"""
+        with self._cond:
+            return {
+                'total': self._total,
+                'libres': len(self._libres),
+                'en_uso': self._total - len(self._libres),
+                'maximo': self.maxconn
+            }
@@ -0,0 +1,79 @@
+from functools import wraps
+from flask import g, has_request_context, jsonify, make_response, current_app as app
+
+
+class ConexionCompartida:
+    """
+    Conexión única de una unidad de trabajo (una por request).
+    Los DAO la usan como una conexión normal, pero:
+      - commit() no hace nada: se confirma una sola vez al final del request
+      - rollback() deshace y marca la unidad como fallida (no se confirmará nada)
+      - close() no hace nada: la conexión se devuelve al pool al final del request
+    """
+
+    def __init__(self, con):
+        self._con = con
+        self.fallida = False
+
+    def __getattr__(self, nombre):
+        return getattr(self._con, nombre)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.fallida = True
+        self._con.rollback()
+
+    def close(self):
+        pass
+
+
+def unidad_trabajo_actual():
+    """Retorna la ConexionCompartida del request actual, o None si no hay unidad abierta"""
+    if has_request_context():
+        return g.get('_unidad_trabajo')
+    return None
+
+
+def unidad_de_trabajo(vista):
+    """
+    Decorador para endpoints: todas las llamadas a Conexion() dentro del
+    request comparten una conexión y una transacción, que se confirma al
+    final si no hubo rollback, excepción ni respuesta de error (>= 400).
+    """
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if unidad_trabajo_actual() is not None:
+            return vista(*args, **kwargs)
+
+        from app.conexion.Conexion import Conexion
+        con = Conexion.getPool().getconn()
+        unidad = ConexionCompartida(con)
+        g._unidad_trabajo = unidad
+        try:
+            try:
+                respuesta = make_response(vista(*args, **kwargs))
+            except Exception:
+                con.rollback()
+                raise
+
+            if unidad.fallida or respuesta.status_code >= 400:
+                con.rollback()
+                return respuesta
+
+            try:
+                con.commit()
+            except Exception as e:
+                app.logger.error(f"❌ Error al confirmar la unidad de trabajo: {str(e)}")
+                con.rollback()
+                return jsonify({
+                    'success': False,
+                    'error': 'No se pudo confirmar la operación.'
+                }), 500
+            return respuesta
+        finally:
+            g.pop('_unidad_trabajo', None)
+            con.close()
+
+    return envoltura
@@ -0,0 +1,189 @@
+"""
+Bus de invalidación del cache de catálogos entre workers (LISTEN/NOTIFY).
+
+Cada proceso (worker de gunicorn) tiene su propio cache en memoria. Los
+triggers de sql/003_notify_cache_catalogos.sql emiten un NOTIFY en el canal
+'cache_catalogos' con {"tabla": ..., "id": ...} en cada escritura; un hilo
+de escucha por proceso recibe el aviso y desaloja las entradas afectadas.
+
+Mientras el hilo no está conectado el cache usa un TTL corto de respaldo
+(ver CacheCatalogos.ttl_sin_bus), y al conectarse o perder la conexión se
+vacía completo, porque los avisos de ese intervalo se perdieron.
+
+Otros caches en memoria (ej. el índice de turnos libres) se suscriben a
+una tabla con registrar_oyente(); reciben el ID cambiado, o None cuando
+deben descartar todo lo que tienen de esa tabla.
+"""
+
+import json
+import os
+import select
+import threading
+
+import psycopg2
+from flask import current_app, has_app_context
+
+CANAL = 'cache_catalogos'
+
+BUS_HABILITADO = os.environ.get('CACHE_BUS_INVALIDACION', '1') != '0'
+
+# Segundos máximos entre reintentos de conexión (la espera se duplica hasta este tope)
+ESPERA_REINTENTO_MAX = 30
+
+# Tabla de la base -> catálogo del cache
+TABLAS_CATALOGO = {
+    'ciudades': 'ciudades',
+    'paises': 'paises',
+    'dias': 'dias',
+    'turnos': 'turnos',
+    'especialidades': 'especialidades',
+    'cargo': 'cargos',
+    'estado_cita': 'estados_cita'
+}
+
+
+# Tabla de la base -> funciones oyentes(id_registro)
+_oyentes = {}
+
+
+def registrar_tabla(tabla, catalogo):
+    """Asocia otra tabla a un catálogo del cache (la tabla necesita el trigger de notificación)"""
+    TABLAS_CATALOGO[tabla] = catalogo
+
+
+def registrar_oyente(tabla, funcion):
+    """Suscribe funcion(id_registro) a los avisos de una tabla (id_registro None = todo cambió)"""
+    _oyentes.setdefault(tabla, [])
+    if funcion not in _oyentes[tabla]:
+        _oyentes[tabla].append(funcion)
+
+
+def _avisar_oyentes(tabla, id_registro, logger=None):
+    for funcion in _oyentes.get(tabla, []):
+        try:
+            funcion(id_registro)
+        except Exception as e:
+            if logger is not None:
+                logger.error(f"Error en oyente de invalidación de {tabla}: {str(e)}")
+
+
+def _avisar_todos_los_oyentes(logger=None):
+    for tabla in list(_oyentes):
+        _avisar_oyentes(tabla, None, logger)
+
+
+def procesar_aviso(cache, payload, logger=None):
+    """Aplica un aviso del canal sobre el cache y los oyentes. Retorna el catálogo afectado o None."""
+    try:
+        datos = json.loads(payload)
+        tabla = datos['tabla']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+    _avisar_oyentes(tabla, datos.get('id'), logger)
+
+    catalogo = TABLAS_CATALOGO.get(tabla)
+    if catalogo is None:
+        return None
+
+    id_registro = datos.get('id')
+    if id_registro is None:
+        cache.invalidar_catalogo(catalogo)
+    else:
+        cache.invalidar(catalogo, id_registro)
+    return catalogo
+
+
+class EscuchaInvalidaciones(threading.Thread):
+    """Hilo que mantiene una conexión dedicada (fuera del pool) escuchando el canal"""
+
+    def __init__(self, cache, logger, parametros_conexion, intervalo=5):
+        super().__init__(name='escucha-cache-catalogos', daemon=True)
+        self.cache = cache
+        self.logger = logger
+        self.parametros_conexion = parametros_conexion
+        self.intervalo = intervalo
+        self._detener = threading.Event()
+
+    def detener(self):
+        self._detener.set()
+
+    def run(self):
+        espera = 1
+        while not self._detener.is_set():
+            con = None
+            try:
+                con = psycopg2.connect(**self.parametros_conexion)
+                con.set_session(autocommit=True)
+                cur = con.cursor()
+                cur.execute(f"LISTEN {CANAL}")
+                cur.close()
+
+                self.cache.invalidar_catalogo()
+                _avisar_todos_los_oyentes(self.logger)
+                self.cache.bus_conectado = True
+                self.logger.info(f"Escuchando invalidaciones de cache en el canal '{CANAL}' (pid {os.getpid()})")
+                espera = 1
+
+                while not self._detener.is_set():
+                    if select.select([con], [], [], self.intervalo) == ([], [], []):
+                        continue
+                    con.poll()
+                    while con.notifies:
+                        aviso = con.notifies.pop(0)
+                        procesar_aviso(self.cache, aviso.payload, self.logger)
+            except Exception as e:
+                self.logger.error(f"Error en la escucha de invalidaciones de cache: {str(e)}")
+            finally:
+                if self.cache.bus_conectado:
+                    self.cache.bus_conectado = False
+                    self.cache.invalidar_catalogo()
+                    _avisar_todos_los_oyentes(self.logger)
+                if con is not None:
+                    try:
+                        con.close()
+                    except psycopg2.Error:
+                        pass
+
+            self._detener.wait(espera)
+            espera = min(espera * 2, ESPERA_REINTENTO_MAX)
+
+
+_escucha = None
+_escucha_pid = None
+_escucha_lock = threading.Lock()
+
+
+def asegurar_escucha(cache):
+    """
+    Arranca el hilo de escucha en el proceso actual si todavía no corre.
+    Se llama en cada lectura del cache: tras un fork (workers de gunicorn)
+    el hilo del padre no existe en el hijo y se arranca uno nuevo.
+    """
+    global _escucha, _escucha_pid
+    pid = os.getpid()
+    if not BUS_HABILITADO or _escucha_pid == pid or not has_app_context():
+        return
+    with _escucha_lock:
+        if _escucha_pid == pid:
+            return
+        from app.conexion.Conexion import Conexion
+        parametros = {
+            'dbname': Conexion.dbname, 'user': Conexion.user, 'password': Conexion.password,
+            'host': Conexion.host, 'port': Conexion.port
+        }
+        # El estado heredado del padre no vale en este proceso
+        cache.bus_conectado = False
+        _escucha = EscuchaInvalidaciones(cache, current_app.logger, parametros)
+        _escucha.start()
+        _escucha_pid = pid
+
+
+def detener_escucha():
+    """Detiene el hilo de escucha del proceso actual (al apagar la aplicación)"""
+    global _escucha, _escucha_pid
+    with _escucha_lock:
+        if _escucha is not None and _escucha_pid == os.getpid():
+            _escucha.detener()
+        _escucha = None
+        _escucha_pid = None
@@ -0,0 +1,155 @@
+"""
+Cache en memoria de los catálogos referenciales (ciudades, países, días,
+turnos, especialidades, cargos, estados de cita).
+
+Estas tablas casi no cambian, pero se consultan en cada formulario.
+Cada catálogo guarda sus lecturas con un TTL; los métodos de escritura del
+DAO desalojan las entradas que modifican (write-through invalidation):
+  - guardar*: el listado completo
+  - update*/delete*: el listado completo y la entrada de ese ID
+Las escrituras hechas en otros workers (o directo en la base) llegan por
+el bus LISTEN/NOTIFY de app/dao/bus_invalidacion.py.
+"""
+
+import copy
+import os
+import threading
+import time
+from functools import wraps
+from flask import current_app as app
+from app.dao.bus_invalidacion import asegurar_escucha
+
+TTL_POR_DEFECTO = int(os.environ.get('CACHE_CATALOGOS_TTL', 600))
+# TTL de respaldo mientras el bus de invalidación no está conectado
+TTL_SIN_BUS = int(os.environ.get('CACHE_CATALOGOS_TTL_SIN_BUS', 30))
+
+_SIN_VALOR = object()
+
+
+class CacheCatalogos:
+    """Cache thread-safe por catálogo con expiración por TTL"""
+
+    def __init__(self, ttl=TTL_POR_DEFECTO, ttl_sin_bus=TTL_SIN_BUS):
+        self.ttl = ttl
+        self.ttl_sin_bus = ttl_sin_bus
+        self.bus_conectado = False
+        self._datos = {}  # catalogo -> {clave: (expira_en, valor)}
+        self._lock = threading.Lock()
+
+    def obtener(self, catalogo, clave):
+        with self._lock:
+            entrada = self._datos.get(catalogo, {}).get(clave)
+        if entrada is None:
+            return _SIN_VALOR
+        expira_en, valor = entrada
+        if expira_en < time.monotonic():
+            return _SIN_VALOR
+        # Copia para que quien la reciba pueda modificarla sin ensuciar el cache
+        return copy.deepcopy(valor)
+
+    def guardar(self, catalogo, clave, valor):
+        ttl = self.ttl if self.bus_conectado else min(self.ttl, self.ttl_sin_bus)
+        with self._lock:
+            self._datos.setdefault(catalogo, {})[clave] = (time.monotonic() + ttl, copy.deepcopy(valor))
+
+    def invalidar(self, catalogo, id_registro=_SIN_VALOR):
+        """
+        Sin id_registro: desaloja los listados del catálogo.
+        Con id_registro: además desaloja las lecturas por ese ID.
+        """
+        with self._lock:
+            entradas = self._datos.get(catalogo)
+            if not entradas:
+                return
+            for clave in list(entradas):
+                _, args = clave
+                if args == () or (id_registro is not _SIN_VALOR and args[:1] == (id_registro,)):
+                    del entradas[clave]
+
+    def invalidar_catalogo(self, catalogo=None):
+        """Vacía un catálogo completo, o todos si catalogo es None"""
+        with self._lock:
+            if catalogo is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(catalogo, None)
+
+
+cache_catalogos = CacheCatalogos()
+
+
+def _normalizar_id(valor):
+    # Los IDs llegan como int desde las rutas, pero pueden venir como str desde JSON
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return valor
+
+
+def cacheado(catalogo):
+    """
+    Decorador para métodos de lectura del DAO (listado o por ID).
+    No se guardan resultados vacíos: los DAO devuelven [] o None también
+    cuando la consulta falla, y eso no debe quedar cacheado.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, *args):
+            asegurar_escucha(cache_catalogos)
+            clave = (metodo.__name__, tuple(_normalizar_id(a) for a in args))
+            valor = cache_catalogos.obtener(catalogo, clave)
+            if valor is not _SIN_VALOR:
+                return valor
+            valor = metodo(self, *args)
+            if valor:
+                cache_catalogos.guardar(catalogo, clave, valor)
+            return valor
+        return envoltura
+    return decorador
+
+
+def invalida_cache(catalogo, por_id=False):
+    """
+    Decorador para métodos de escritura del DAO.
+    por_id=True: el primer argumento es el ID del registro modificado.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                if por_id and args:
+                    cache_catalogos.invalidar(catalogo, _normalizar_id(args[0]))
+                else:
+                    cache_catalogos.invalidar(catalogo)
+        return envoltura
+    return decorador
+
+
+def precalentar_catalogos():
+    """Carga todos los listados de catálogos en el cache (al iniciar la aplicación)"""
+    from app.dao.referenciales.ciudad.CiudadDao import CiudadDao
+    from app.dao.referenciales.paises.PaisDao import PaisDao
+    from app.dao.referenciales.dia.DiaDao import DiaDao
+    from app.dao.referenciales.turno.TurnoDao import TurnoDao
+    from app.dao.referenciales.especialidad.EspecialidadDao import EspecialidadDao
+    from app.dao.referenciales.cargo.CargoDao import CargoDao
+    from app.dao.referenciales.estado_cita.EstadoCitaDao import EstadoCitaDao
+    from app.dao.referenciales_agendamiento.cita.CitaDao import CitaDao
+
+    lecturas = [
+        CiudadDao().getCiudades,
+        PaisDao().getPaises,
+        DiaDao().getDias,
+        TurnoDao().getTurnos,
+        EspecialidadDao().getEspecialidades,
+        CargoDao().getCargos,
+        EstadoCitaDao().getEstadosCitas,
+        CitaDao().getEstadosQueOcupanCupo
+    ]
+    for leer in lecturas:
+        try:
+            leer()
+        except Exception as e:
+            app.logger.error(f"Error al precalentar catálogo {leer.__qualname__}: {str(e)}")
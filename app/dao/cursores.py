@@ -0,0 +1,39 @@
+"""
+Lectura por lotes con cursores del lado del servidor (cursores con nombre de psycopg2).
+
+Un cursor normal trae todo el resultado a memoria en execute()/fetchall();
+uno con nombre deja el resultado en PostgreSQL y se van pidiendo `lote`
+filas por vez, así la memoria del worker no depende del tamaño del resultado.
+"""
+
+import uuid
+from flask import current_app as app
+from app.conexion.Conexion import Conexion
+
+TAMANIO_LOTE = 500
+
+
+def iterar_cursor_servidor(sql, params=None, mapear=None, lote=TAMANIO_LOTE):
+    """
+    Generador que ejecuta `sql` en un cursor con nombre y entrega las filas
+    de a una (mapeadas con `mapear` si se indica), leyendo `lote` filas por
+    viaje a la base. La conexión se devuelve al pool al terminar o al
+    abandonar el generador.
+    """
+    conexion = Conexion()
+    con = conexion.getConexion()
+    cur = con.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cur.itersize = lote
+    try:
+        cur.execute(sql, params)
+        for row in cur:
+            yield mapear(row) if mapear else row
+    except Exception as e:
+        app.logger.error(f"Error al leer con cursor del servidor: {str(e)}")
+        raise
+    finally:
+        try:
+            cur.close()
+        finally:
+            # El pool deshace la transacción de solo lectura al recibir la conexión
+            con.close()
@@ -0,0 +1,217 @@
+"""
+Índice en memoria de turnos libres (agenda_detalle con cupos disponibles)
+para responder "¿cuándo es el próximo turno libre de tal especialidad?"
+sin recorrer cabeceras y detalles en la base.
+
+Guarda los turnos desde hoy hasta HORIZONTE_DIAS adelante, agrupados por
+especialidad en listas ordenadas por (fecha, hora_inicio, id), así una
+búsqueda es un bisect más un recorrido corto.
+
+Se mantiene al día con el bus de invalidación (app/dao/bus_invalidacion.py):
+los triggers de sql/006_notify_agenda.sql avisan cada detalle o cabecera
+que cambió (reservas, cancelaciones, publicaciones) y esos IDs se vuelven
+a leer de la base en la siguiente búsqueda. Sin bus, el índice se recarga
+completo cada TTL_SIN_BUS segundos. También se recarga al cambiar el día.
+"""
+
+import bisect
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from flask import current_app as app
+from app.dao.bus_invalidacion import asegurar_escucha, registrar_oyente
+from app.dao.cache_catalogos import cache_catalogos
+from app.dao.referenciales_agendamiento.agenda.AgendaDetalleDao import AgendaDetalleDao
+
+HORIZONTE_DIAS = int(os.environ.get('INDICE_TURNOS_HORIZONTE', 120))
+TTL_SIN_BUS = int(os.environ.get('INDICE_TURNOS_TTL_SIN_BUS', 30))
+
+
+def _clave(turno):
+    return (turno['fecha'], turno['hora_inicio'], turno['id_agenda_detalle'])
+
+
+class IndiceTurnos:
+    """Índice thread-safe de turnos con cupo, por especialidad"""
+
+    def __init__(self, horizonte_dias=HORIZONTE_DIAS, ttl_sin_bus=TTL_SIN_BUS):
+        self.horizonte_dias = horizonte_dias
+        self.ttl_sin_bus = ttl_sin_bus
+        self._lock = threading.Lock()
+        self._sincronizacion_lock = threading.Lock()
+        self._turnos = {}            # id_agenda_detalle -> turno
+        self._por_cabecera = {}      # id_agenda_cabecera -> {id_agenda_detalle}
+        self._por_especialidad = {}  # id_especialidad -> [(fecha, hora_inicio, id_agenda_detalle)] ordenada
+        self._desde = None
+        self._hasta = None
+        self._cargado_en = 0
+        self._recargar = True
+        self._detalles_pendientes = set()
+        self._cabeceras_pendientes = set()
+
+    # ----------------------------------------
+    # Avisos del bus
+    # ----------------------------------------
+
+    def marcar_detalle(self, id_agenda_detalle):
+        """Un detalle cambió (None: cambiaron muchos, recargar todo)"""
+        with self._lock:
+            if id_agenda_detalle is None:
+                self._recargar = True
+            else:
+                self._detalles_pendientes.add(int(id_agenda_detalle))
+
+    def marcar_cabecera(self, id_agenda_cabecera):
+        """Una cabecera cambió (estado, médico, fecha...): se releen todos sus detalles"""
+        with self._lock:
+            if id_agenda_cabecera is None:
+                self._recargar = True
+            else:
+                self._cabeceras_pendientes.add(int(id_agenda_cabecera))
+
+    # ----------------------------------------
+    # Mantenimiento de las estructuras (con self._lock tomado)
+    # ----------------------------------------
+
+    def _quitar(self, id_agenda_detalle):
+        turno = self._turnos.pop(id_agenda_detalle, None)
+        if turno is None:
+            return
+        lista = self._por_especialidad.get(turno['id_especialidad'], [])
+        clave = _clave(turno)
+        i = bisect.bisect_left(lista, clave)
+        if i < len(lista) and lista[i] == clave:
+            del lista[i]
+        ids = self._por_cabecera.get(turno['id_agenda_cabecera'])
+        if ids is not None:
+            ids.discard(id_agenda_detalle)
+            if not ids:
+                del self._por_cabecera[turno['id_agenda_cabecera']]
+
+    def _agregar(self, turno):
+        self._quitar(turno['id_agenda_detalle'])
+        self._turnos[turno['id_agenda_detalle']] = turno
+        bisect.insort(self._por_especialidad.setdefault(turno['id_especialidad'], []), _clave(turno))
+        self._por_cabecera.setdefault(turno['id_agenda_cabecera'], set()).add(turno['id_agenda_detalle'])
+
+    # ----------------------------------------
+    # Sincronización con la base
+    # ----------------------------------------
+
+    def _cargar_todo(self, hoy):
+        hasta = hoy + timedelta(days=self.horizonte_dias)
+        turnos = AgendaDetalleDao().getTurnosConCupo(hoy, hasta)
+        if turnos is None:
+            with self._lock:
+                self._recargar = True
+            return
+
+        por_especialidad = {}
+        por_cabecera = {}
+        for turno in turnos:
+            por_especialidad.setdefault(turno['id_especialidad'], []).append(_clave(turno))
+            por_cabecera.setdefault(turno['id_agenda_cabecera'], set()).add(turno['id_agenda_detalle'])
+        for lista in por_especialidad.values():
+            lista.sort()
+
+        with self._lock:
+            self._turnos = {t['id_agenda_detalle']: t for t in turnos}
+            self._por_especialidad = por_especialidad
+            self._por_cabecera = por_cabecera
+            self._desde = hoy
+            self._hasta = hasta
+            self._cargado_en = time.monotonic()
+        app.logger.info(f"Índice de turnos cargado: {len(turnos)} turnos con cupo hasta {hasta}")
+
+    def _refrescar(self, detalles, cabeceras):
+        turnos = AgendaDetalleDao().getTurnosConCupo(
+            self._desde, self._hasta, ids_detalle=detalles, ids_cabecera=cabeceras
+        )
+        with self._lock:
+            if turnos is None:
+                # Se reintenta en la próxima búsqueda
+                self._detalles_pendientes |= detalles
+                self._cabeceras_pendientes |= cabeceras
+                return
+            for id_detalle in detalles:
+                self._quitar(id_detalle)
+            for id_cabecera in cabeceras:
+                for id_detalle in list(self._por_cabecera.get(id_cabecera, ())):
+                    self._quitar(id_detalle)
+            for turno in turnos:
+                self._agregar(turno)
+
+    def sincronizar(self):
+        """Aplica los cambios avisados; recarga todo si corresponde"""
+        asegurar_escucha(cache_catalogos)
+        hoy = date.today()
+        with self._sincronizacion_lock:
+            with self._lock:
+                vencido = (not cache_catalogos.bus_conectado
+                           and time.monotonic() - self._cargado_en > self.ttl_sin_bus)
+                completo = self._recargar or self._desde != hoy or vencido
+                detalles, self._detalles_pendientes = self._detalles_pendientes, set()
+                cabeceras, self._cabeceras_pendientes = self._cabeceras_pendientes, set()
+                if completo:
+                    self._recargar = False
+
+            if completo:
+                self._cargar_todo(hoy)
+            elif detalles or cabeceras:
+                self._refrescar(detalles, cabeceras)
+
+    # ----------------------------------------
+    # Búsqueda
+    # ----------------------------------------
+
+    def buscar(self, id_especialidad, fecha_desde, fecha_hasta, hora_desde=None, hora_hasta=None,
+               id_medico=None, cantidad=10):
+        """
+        Próximos `cantidad` turnos con cupo de una especialidad, ordenados por fecha y hora.
+        hora_desde / hora_hasta filtran por la hora de inicio del turno [desde, hasta).
+        Lo que cae fuera del horizonte del índice se consulta directo en la base.
+        """
+        self.sincronizar()
+
+        ahora = datetime.now()
+        hoy = ahora.date()
+        fecha_desde = max(fecha_desde, hoy)
+        resultado = []
+
+        with self._lock:
+            hasta_indice = self._hasta
+            lista = self._por_especialidad.get(id_especialidad, [])
+            i = bisect.bisect_left(lista, (fecha_desde,))
+            while i < len(lista) and len(resultado) < cantidad:
+                fecha, hora_inicio, id_detalle = lista[i]
+                i += 1
+                if fecha > fecha_hasta:
+                    break
+                if hora_desde is not None and hora_inicio < hora_desde:
+                    continue
+                if hora_hasta is not None and hora_inicio >= hora_hasta:
+                    continue
+                if fecha == hoy and hora_inicio <= ahora.time():
+                    continue
+                turno = self._turnos[id_detalle]
+                if id_medico is not None and turno['id_medico'] != id_medico:
+                    continue
+                resultado.append(dict(turno))
+
+        # Fuera del horizonte (o índice sin cargar): consulta directa
+        if len(resultado) < cantidad and (hasta_indice is None or fecha_hasta > hasta_indice):
+            desde_base = fecha_desde if hasta_indice is None else max(fecha_desde, hasta_indice + timedelta(days=1))
+            extra = AgendaDetalleDao().getTurnosConCupo(
+                desde_base, fecha_hasta, id_especialidad=id_especialidad, id_medico=id_medico,
+                hora_desde=hora_desde, hora_hasta=hora_hasta, cantidad=cantidad - len(resultado)
+            ) or []
+            resultado.extend(t for t in extra if not (t['fecha'] == hoy and t['hora_inicio'] <= ahora.time()))
+
+        return resultado
+
+
+indice_turnos = IndiceTurnos()
+
+registrar_oyente('agenda_detalle', indice_turnos.marcar_detalle)
+registrar_oyente('agenda_cabecera', indice_turnos.marcar_cabecera)
@@ -0,0 +1,111 @@
+"""
+Paginación por cursor (keyset) para los listados grandes.
+
+En lugar de OFFSET, cada página continúa desde los valores de orden de la
+última fila vista: WHERE (col1, col2, id) < (%s, %s, %s) ORDER BY ... LIMIT n.
+Así una página profunda cuesta lo mismo que la primera.
+
+El cursor que recibe el cliente es opaco: JSON en base64 con los valores
+de la clave de orden y la dirección ('sig' o 'ant').
+Las columnas de la clave deben ser NOT NULL (o venir envueltas en COALESCE)
+y terminar en una columna única para que el orden sea estable.
+"""
+
+import base64
+import json
+from datetime import date, datetime, time
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+def normalizar_limite(limite):
+    """Aplica el valor por defecto y el tope de tamaño de página"""
+    try:
+        limite = int(limite) if limite not in (None, '') else LIMITE_POR_DEFECTO
+    except (TypeError, ValueError):
+        raise ValueError('El parámetro limite debe ser un número')
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _serializar(valor):
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def codificar_cursor(valores, direccion='sig'):
+    datos = {'v': [_serializar(v) for v in valores], 'd': direccion}
+    texto = json.dumps(datos, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (valores, direccion); lanza ValueError si el cursor es inválido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode())
+        valores = datos['v']
+        direccion = datos.get('d', 'sig')
+    except Exception:
+        raise ValueError('Cursor de paginación inválido')
+    if not isinstance(valores, list) or direccion not in ('sig', 'ant'):
+        raise ValueError('Cursor de paginación inválido')
+    return valores, direccion
+
+
+def clausulas_keyset(claves, descendente, cursor):
+    """
+    Arma la condición y el ORDER BY de una página.
+    claves: expresiones SQL de la clave de orden, ej. ['o.fecha_registro', 'o.id_odontograma']
+    Retorna (condicion, order_by, params, retrocede). condicion es '' en la primera página.
+    """
+    retrocede = False
+    condicion = ''
+    params = []
+
+    if cursor:
+        valores, direccion = decodificar_cursor(cursor)
+        if len(valores) != len(claves):
+            raise ValueError('Cursor de paginación inválido')
+        retrocede = direccion == 'ant'
+        # Hacia adelante en orden DESC se buscan claves menores; al retroceder, mayores
+        operador = '<' if descendente != retrocede else '>'
+        columnas = ', '.join(claves)
+        marcadores = ', '.join(['%s'] * len(claves))
+        condicion = f"({columnas}) {operador} ({marcadores})"
+        params = valores
+
+    # Al retroceder se lee en orden inverso y luego se da vuelta la página
+    asc = (not descendente) != retrocede
+    sentido = 'ASC' if asc else 'DESC'
+    order_by = ', '.join(f"{c} {sentido}" for c in claves)
+    return condicion, order_by, params, retrocede
+
+
+def armar_pagina(rows, clave_fila, limite, cursor, retrocede):
+    """
+    Recorta las filas (la consulta debe pedir limite + 1) y calcula los cursores.
+    clave_fila: función que devuelve los valores de la clave de una fila cruda.
+    Retorna (rows, siguiente, anterior).
+    """
+    hay_mas = len(rows) > limite
+    rows = list(rows[:limite])
+
+    if retrocede:
+        rows.reverse()
+
+    if not rows:
+        return rows, None, None
+
+    primera = codificar_cursor(clave_fila(rows[0]), 'ant')
+    ultima = codificar_cursor(clave_fila(rows[-1]), 'sig')
+
+    if retrocede:
+        siguiente = ultima
+        anterior = primera if hay_mas else None
+    else:
+        siguiente = ultima if hay_mas else None
+        anterior = primera if cursor else None
+
+    return rows, siguiente, anterior
@@ -1,9 +1,11 @@
 # Data Access Object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class CargoDao:
 
+    @cacheado('cargos')
     def getCargos(self):
         cargoSQL = """
         SELECT id_cargo, descripcion
@@ -25,6 +27,7 @@ class CargoDao:
             cur.close()
             con.close()
 
+    @cacheado('cargos')
     def getCargoById(self, id_cargo):
         cargoSQL = """
         SELECT id_cargo, descripcion
@@ -73,6 +76,7 @@ class CargoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('cargos')
     def guardarCargo(self, descripcion):
         insertCargoSQL = """
         INSERT INTO cargo(descripcion) VALUES(%s) RETURNING id_cargo
@@ -95,6 +99,7 @@ class CargoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('cargos', por_id=True)
     def updateCargo(self, id_cargo, descripcion):
         updateCargoSQL = """
         UPDATE cargo
@@ -119,6 +124,7 @@ class CargoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('cargos', por_id=True)
     def deleteCargo(self, id_cargo):
         deleteCargoSQL = """
         DELETE FROM cargo
@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class CiudadDao:
 
+    @cacheado('ciudades')
     def getCiudades(self):
 
         ciudadSQL = """
@@ -29,6 +31,7 @@ class CiudadDao:
             cur.close()
             con.close()
 
+    @cacheado('ciudades')
     def getCiudadById(self, id_ciudad):
 
         ciudadSQL = """
@@ -57,6 +60,7 @@ class CiudadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('ciudades')
     def guardarCiudad(self, descripcion):
 
         insertCiudadSQL = """
@@ -85,6 +89,7 @@ class CiudadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('ciudades', por_id=True)
     def updateCiudad(self, id_ciudad, descripcion):
 
         updateCiudadSQL = """
@@ -113,6 +118,7 @@ class CiudadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('ciudades', por_id=True)
     def deleteCiudad(self, id_ciudad):
 
         updateCiudadSQL = """
@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class DiaDao:
 
+    @cacheado('dias')
     def getDias(self):
 
         diaSQL = """
@@ -29,6 +31,7 @@ class DiaDao:
             cur.close()
             con.close()
 
+    @cacheado('dias')
     def getDiaById(self, id_dia):
 
         diaSQL = """
@@ -57,6 +60,7 @@ class DiaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('dias')
     def guardarDia(self, descripcion):
 
         insertDiaSQL = """
@@ -85,6 +89,7 @@ class DiaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('dias', por_id=True)
     def updateDia(self, id_dia, descripcion):
 
         updateDiaSQL = """
@@ -113,6 +118,7 @@ class DiaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('dias', por_id=True)
     def deleteDia(self, id_dia):
 
         updateDiaSQL = """
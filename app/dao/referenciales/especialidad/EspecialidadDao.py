@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class EspecialidadDao:
 
+    @cacheado('especialidades')
     def getEspecialidades(self):
         especialidadSQL = """
         SELECT id_especialidad, nombre_especialidad
@@ -28,6 +30,7 @@ class EspecialidadDao:
             cur.close()
             con.close()
 
+    @cacheado('especialidades')
     def getEspecialidadById(self, id_especialidad):
         especialidadSQL = """
         SELECT id_especialidad, nombre_especialidad
@@ -55,6 +58,7 @@ class EspecialidadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('especialidades')
     def guardarEspecialidad(self, nombre_especialidad):
         insertEspecialidadSQL = """
         INSERT INTO especialidades(nombre_especialidad) VALUES(%s) RETURNING id_especialidad
@@ -82,6 +86,7 @@ class EspecialidadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('especialidades', por_id=True)
     def updateEspecialidad(self, id_especialidad, nombre_especialidad):
         updateEspecialidadSQL = """
         UPDATE especialidades
@@ -109,6 +114,7 @@ class EspecialidadDao:
             cur.close()
             con.close()
 
+    @invalida_cache('especialidades', por_id=True)
     def deleteEspecialidad(self, id_especialidad):
         deleteEspecialidadSQL = """
         DELETE FROM especialidades
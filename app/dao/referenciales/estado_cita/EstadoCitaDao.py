@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class EstadoCitaDao:
 
+    @cacheado('estados_cita')
     def getEstadosCitas(self):
 
         estadocitaSQL = """
@@ -29,6 +31,7 @@ class EstadoCitaDao:
             cur.close()
             con.close()
 
+    @cacheado('estados_cita')
     def getEstadoCitaById(self, id_estado):
 
         estadocitaSQL = """
@@ -57,6 +60,7 @@ class EstadoCitaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('estados_cita')
     def guardarEstadoCita(self, descripcion):
 
         insertEstadoCitaSQL = """
@@ -85,6 +89,7 @@ class EstadoCitaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('estados_cita', por_id=True)
     def updateEstadoCita(self, id_estado, descripcion):
 
         updateEstadoCitaSQL = """
@@ -113,6 +118,7 @@ class EstadoCitaDao:
             cur.close()
             con.close()
 
+    @invalida_cache('estados_cita', por_id=True)
     def deleteEstadoCita(self, id_estado):
 
         updateEstadoCitaSQL = """
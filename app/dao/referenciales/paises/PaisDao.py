@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class PaisDao:
 
+    @cacheado('paises')
     def getPaises(self):
         paisSQL = """
         SELECT id_pais, descripcion
@@ -23,6 +25,7 @@ class PaisDao:
             cur.close()
             con.close()
 
+    @cacheado('paises')
     def getPaisById(self, id_pais):
         paisSQL = """
         SELECT id_pais, descripcion
@@ -48,6 +51,7 @@ class PaisDao:
             cur.close()
             con.close()
 
+    @invalida_cache('paises')
     def guardarPais(self, descripcion):
         insertPaisSQL = """
         INSERT INTO paises(descripcion) VALUES(%s) RETURNING id_pais
@@ -68,6 +72,7 @@ class PaisDao:
             cur.close()
             con.close()
 
+    @invalida_cache('paises', por_id=True)
     def updatePais(self, id_pais, descripcion):
         updatePaisSQL = """
         UPDATE paises
@@ -90,6 +95,7 @@ class PaisDao:
             cur.close()
             con.close()
 
+    @invalida_cache('paises', por_id=True)
     def deletePais(self, id_pais):
         deletePaisSQL = """
         DELETE FROM paises
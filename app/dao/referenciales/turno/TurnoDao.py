@@ -1,9 +1,11 @@
 # Data access object - DAO
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cache_catalogos import cacheado, invalida_cache
 
 class TurnoDao:
 
+    @cacheado('turnos')
     def getTurnos(self):
 
         turnoSQL = """
@@ -29,6 +31,7 @@ class TurnoDao:
             cur.close()
             con.close()
 
+    @cacheado('turnos')
     def getTurnoById(self, id_turno):
 
         turnoSQL = """
@@ -57,6 +60,7 @@ class TurnoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('turnos')
     def guardarTurno(self, descripcion):
 
         insertTurnoSQL = """
@@ -85,6 +89,7 @@ class TurnoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('turnos', por_id=True)
     def updateTurno(self, id_turno, descripcion):
 
         updateTurnoSQL = """
@@ -113,6 +118,7 @@ class TurnoDao:
             cur.close()
             con.close()
 
+    @invalida_cache('turnos', por_id=True)
     def deleteTurno(self, id_turno):
 
         updateTurnoSQL = """
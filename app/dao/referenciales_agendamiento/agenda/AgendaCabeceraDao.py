@@ -1,3 +1,4 @@
+import json
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
 
@@ -95,6 +96,91 @@ class AgendaCabeceraDao:
             cur.close()
             con.close()
 
+    def getCalendarioMensual(self, fecha_desde, fecha_hasta, id_medico=None, id_especialidad=None):
+        """
+        Totales por día de las agendas activas entre fecha_desde (incluida) y
+        fecha_hasta (excluida), para la vista de calendario mensual.
+        Una sola consulta agrupada: turnos, cupos máximos y disponibles,
+        citas que ocupan cupo y citas por estado.
+        Retorna una lista por día con agenda (los días sin agenda no aparecen),
+        o None si hubo error.
+        """
+        condiciones = [
+            "ac.estado = 'Activo'",
+            "ac.fecha_agenda >= %(fecha_desde)s",
+            "ac.fecha_agenda < %(fecha_hasta)s"
+        ]
+        if id_medico is not None:
+            condiciones.append("ac.id_medico = %(id_medico)s")
+        if id_especialidad is not None:
+            condiciones.append("ac.id_especialidad = %(id_especialidad)s")
+
+        sql = f"""
+        WITH turnos AS (
+            SELECT ac.fecha_agenda, ad.id_agenda_detalle, ad.cupos_maximos,
+                   ad.cupos_disponibles, ad.estado_detalle
+            FROM agenda_cabecera ac
+            JOIN agenda_detalle ad ON ad.id_agenda_cabecera = ac.id_agenda_cabecera
+            WHERE {' AND '.join(condiciones)}
+        ),
+        por_dia AS (
+            SELECT
+                fecha_agenda,
+                COUNT(*) AS turnos,
+                COUNT(*) FILTER (WHERE cupos_disponibles > 0 AND estado_detalle <> 'Cancelado') AS turnos_libres,
+                COALESCE(SUM(cupos_maximos), 0) AS cupos_maximos,
+                COALESCE(SUM(cupos_disponibles), 0) AS cupos_disponibles
+            FROM turnos
+            GROUP BY fecha_agenda
+        ),
+        citas AS (
+            SELECT t.fecha_agenda, ec.descripcion, ec.ocupa_cupo, COUNT(*) AS cantidad
+            FROM turnos t
+            JOIN cita_detalle cd ON cd.id_agenda_detalle = t.id_agenda_detalle
+            JOIN estado_cita ec ON ec.id_estado_cita = cd.id_estado_cita
+            GROUP BY t.fecha_agenda, ec.descripcion, ec.ocupa_cupo
+        )
+        SELECT
+            d.fecha_agenda,
+            d.turnos,
+            d.turnos_libres,
+            d.cupos_maximos,
+            d.cupos_disponibles,
+            COALESCE(SUM(c.cantidad) FILTER (WHERE c.ocupa_cupo), 0) AS reservadas,
+            COALESCE(json_object_agg(c.descripcion, c.cantidad) FILTER (WHERE c.descripcion IS NOT NULL), '{{}}')
+        FROM por_dia d
+        LEFT JOIN citas c ON c.fecha_agenda = d.fecha_agenda
+        GROUP BY d.fecha_agenda, d.turnos, d.turnos_libres, d.cupos_maximos, d.cupos_disponibles
+        ORDER BY d.fecha_agenda
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {
+                'fecha_desde': fecha_desde,
+                'fecha_hasta': fecha_hasta,
+                'id_medico': id_medico,
+                'id_especialidad': id_especialidad
+            })
+            return [
+                {
+                    'fecha': str(r[0]),
+                    'turnos': r[1],
+                    'turnos_libres': r[2],
+                    'cupos_maximos': int(r[3]),
+                    'cupos_disponibles': int(r[4]),
+                    'reservadas': int(r[5]),
+                    'por_estado': r[6]
+                } for r in cur.fetchall()
+            ]
+        except Exception as e:
+            app.logger.error(f"Error al obtener calendario mensual: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     def existeCabecera(self, id_medico, fecha_agenda, excluir_id=None):
         """
         Valida si ya existe una cabecera para ese médico en esa fecha.
@@ -221,4 +307,135 @@ class AgendaCabeceraDao:
             return False
         finally:
             cur.close()
-            con.close()
\ No newline at end of file
+            con.close()
+    # ========================================
+    # GENERACIÓN RECURRENTE
+    # ========================================
+
+    # Clave de pg_advisory_xact_lock para serializar generaciones del mismo médico
+    LOCK_GENERACION_AGENDA = 7012
+
+    def generarAgendaRecurrente(self, id_medico, id_especialidad, id_funcionario,
+                                fecha_desde, fecha_hasta, patron, observaciones=None):
+        """
+        Genera en bloque las disponibilidades, cabeceras y detalles de un médico
+        para un rango de fechas según un patrón semanal, en una sola sentencia.
+        patron: lista de dicts {id_dia, id_turno, hora_inicio, hora_fin, cupos}
+        El día de la semana de cada fecha se compara con dias.descripcion (LUNES, MARTES, ...).
+        Los horarios que se solapan con disponibilidades existentes del médico se omiten.
+        Reutiliza la cabecera del día si ya existe (una agenda por médico y día).
+        Retorna un dict con lo creado y lo omitido, o None si hubo error.
+        """
+        sql = """
+        WITH patron AS (
+            SELECT *
+            FROM json_to_recordset(%(patron)s::json)
+                 AS p(id_dia INT, id_turno INT, hora_inicio TIME, hora_fin TIME, cupos INT)
+        ),
+        horarios AS (
+            SELECT f::date AS fecha, p.id_dia, p.id_turno, p.hora_inicio, p.hora_fin, p.cupos
+            FROM generate_series(%(desde)s::date, %(hasta)s::date, INTERVAL '1 day') f
+            JOIN dias d
+              ON translate(UPPER(TRIM(d.descripcion)), 'ÁÉÍÓÚ', 'AEIOU') =
+                 (ARRAY['LUNES','MARTES','MIERCOLES','JUEVES','VIERNES','SABADO','DOMINGO'])[EXTRACT(ISODOW FROM f)::int]
+            JOIN patron p ON p.id_dia = d.id_dia
+        ),
+        marcados AS (
+            SELECT h.*,
+                   EXISTS (
+                       SELECT 1
+                       FROM disponibilidad_horaria dh
+                       WHERE dh.id_medico = %(id_medico)s
+                         AND dh.rango && tsrange(h.fecha + h.hora_inicio, h.fecha + h.hora_fin, '[)')
+                   ) AS solapa
+            FROM horarios h
+        ),
+        cabeceras_nuevas AS (
+            INSERT INTO agenda_cabecera(
+                id_medico, id_especialidad, fecha_agenda, estado, id_funcionario, observaciones
+            )
+            SELECT DISTINCT %(id_medico)s, %(id_especialidad)s, m.fecha, 'Activo', %(id_funcionario)s, %(observaciones)s
+            FROM marcados m
+            WHERE NOT m.solapa
+              AND NOT EXISTS (
+                  SELECT 1 FROM agenda_cabecera ac
+                  WHERE ac.id_medico = %(id_medico)s AND ac.fecha_agenda = m.fecha
+              )
+            RETURNING id_agenda_cabecera, fecha_agenda
+        ),
+        cabeceras AS (
+            SELECT id_agenda_cabecera, fecha_agenda FROM cabeceras_nuevas
+            UNION ALL
+            SELECT ac.id_agenda_cabecera, ac.fecha_agenda
+            FROM agenda_cabecera ac
+            WHERE ac.id_medico = %(id_medico)s
+              AND ac.fecha_agenda BETWEEN %(desde)s AND %(hasta)s
+        ),
+        disponibilidades AS (
+            INSERT INTO disponibilidad_horaria(
+                id_medico, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos
+            )
+            SELECT %(id_medico)s, m.id_dia, m.id_turno, m.hora_inicio, m.hora_fin, m.fecha, m.cupos
+            FROM marcados m
+            WHERE NOT m.solapa
+            RETURNING id_disponibilidad, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos
+        ),
+        detalles AS (
+            INSERT INTO agenda_detalle(
+                id_agenda_cabecera, id_disponibilidad_horaria, id_dia, id_turno,
+                hora_inicio, hora_fin, cupos_disponibles, cupos_maximos, estado_detalle
+            )
+            SELECT DISTINCT ON (d.id_disponibilidad)
+                   c.id_agenda_cabecera, d.id_disponibilidad, d.id_dia, d.id_turno,
+                   d.dispo_hora_inicio, d.dispo_hora_fin, d.dispo_cupos, d.dispo_cupos, 'Disponible'
+            FROM disponibilidades d
+            JOIN cabeceras c ON c.fecha_agenda = d.dispo_fecha
+            ORDER BY d.id_disponibilidad, c.id_agenda_cabecera
+            RETURNING id_agenda_detalle
+        )
+        SELECT
+            (SELECT COUNT(*) FROM cabeceras_nuevas),
+            (SELECT COUNT(*) FROM disponibilidades),
+            (SELECT COUNT(*) FROM detalles),
+            (SELECT COALESCE(json_agg(json_build_object(
+                        'fecha', m.fecha,
+                        'hora_inicio', m.hora_inicio,
+                        'hora_fin', m.hora_fin
+                    ) ORDER BY m.fecha, m.hora_inicio), '[]'::json)
+             FROM marcados m WHERE m.solapa)
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            # Dos generaciones simultáneas del mismo médico no pueden cruzar sus validaciones
+            cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (self.LOCK_GENERACION_AGENDA, id_medico))
+            cur.execute(sql, {
+                'patron': json.dumps(patron),
+                'desde': fecha_desde,
+                'hasta': fecha_hasta,
+                'id_medico': id_medico,
+                'id_especialidad': id_especialidad,
+                'id_funcionario': id_funcionario,
+                'observaciones': observaciones
+            })
+            cabeceras, disponibilidades, detalles, omitidos = cur.fetchone()
+            con.commit()
+            app.logger.info(
+                f"Agenda generada para médico {id_medico} ({fecha_desde} a {fecha_hasta}): "
+                f"{cabeceras} cabeceras, {disponibilidades} disponibilidades, {detalles} detalles, "
+                f"{len(omitidos)} horarios omitidos por solapamiento"
+            )
+            return {
+                'cabeceras_creadas': cabeceras,
+                'disponibilidades_creadas': disponibilidades,
+                'detalles_creados': detalles,
+                'omitidos': omitidos
+            }
+        except Exception as e:
+            app.logger.error(f"Error al generar agenda recurrente: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
@@ -104,6 +104,87 @@ class AgendaDetalleDao:
             cur.close()
             con.close()
 
+    def getTurnosConCupo(self, fecha_desde, fecha_hasta, id_especialidad=None, id_medico=None,
+                         hora_desde=None, hora_hasta=None, cantidad=None,
+                         ids_detalle=None, ids_cabecera=None):
+        """
+        Turnos (agenda_detalle) con cupos disponibles de agendas activas, ordenados
+        por fecha y hora. Carga y refresca el índice de turnos libres, y sirve de
+        búsqueda directa fuera del horizonte del índice.
+        ids_detalle / ids_cabecera: limita a esos detalles o cabeceras (refresco parcial).
+        """
+        condiciones = [
+            "ac.estado = 'Activo'",
+            "ad.estado_detalle <> 'Cancelado'",
+            "ad.cupos_disponibles > 0",
+            "ac.fecha_agenda BETWEEN %s AND %s"
+        ]
+        params = [fecha_desde, fecha_hasta]
+        if id_especialidad is not None:
+            condiciones.append("ac.id_especialidad = %s")
+            params.append(id_especialidad)
+        if id_medico is not None:
+            condiciones.append("ac.id_medico = %s")
+            params.append(id_medico)
+        if hora_desde is not None:
+            condiciones.append("ad.hora_inicio >= %s")
+            params.append(hora_desde)
+        if hora_hasta is not None:
+            condiciones.append("ad.hora_inicio < %s")
+            params.append(hora_hasta)
+        if ids_detalle is not None or ids_cabecera is not None:
+            condiciones.append("(ad.id_agenda_detalle = ANY(%s) OR ad.id_agenda_cabecera = ANY(%s))")
+            params.extend([list(ids_detalle or []), list(ids_cabecera or [])])
+
+        sql = f"""
+        SELECT
+            ad.id_agenda_detalle,
+            ad.id_agenda_cabecera,
+            ac.id_medico,
+            m.nombre || ' ' || m.apellido AS medico,
+            ac.id_especialidad,
+            e.nombre_especialidad,
+            ac.fecha_agenda,
+            ad.hora_inicio,
+            ad.hora_fin,
+            ad.cupos_disponibles
+        FROM agenda_detalle ad
+        JOIN agenda_cabecera ac ON ad.id_agenda_cabecera = ac.id_agenda_cabecera
+        JOIN medico m ON ac.id_medico = m.id_medico
+        JOIN especialidades e ON ac.id_especialidad = e.id_especialidad
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY ac.fecha_agenda, ad.hora_inicio, ad.id_agenda_detalle
+        """
+        if cantidad is not None:
+            sql += " LIMIT %s"
+            params.append(cantidad)
+
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params))
+            return [
+                {
+                    'id_agenda_detalle': r[0],
+                    'id_agenda_cabecera': r[1],
+                    'id_medico': r[2],
+                    'medico': r[3],
+                    'id_especialidad': r[4],
+                    'especialidad': r[5],
+                    'fecha': r[6],
+                    'hora_inicio': r[7],
+                    'hora_fin': r[8],
+                    'cupos_disponibles': r[9]
+                } for r in cur.fetchall()
+            ]
+        except Exception as e:
+            app.logger.error(f"Error al obtener turnos con cupo: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     def existeDetalle(self, id_agenda_cabecera, id_disponibilidad_horaria):
         """Valida si ya existe un detalle con esa disponibilidad en la cabecera"""
         sql = """
@@ -194,6 +275,145 @@ class AgendaDetalleDao:
         
         return ids_creados if ids_creados else False
 
+    def publicarDisponibilidades(self, id_agenda_cabecera, ids_disponibilidades):
+        """
+        Publica varias disponibilidades en una cabecera con una sola sentencia
+        (INSERT ... SELECT) y una sola transacción.
+        ids_disponibilidades: lista de IDs en el orden pedido (se descartan repetidos).
+        Retorna una lista con el resultado de cada ID pedido, o None si la
+        cabecera no existe o hubo un error:
+            {'id_disponibilidad', 'resultado', 'id_agenda_detalle'}
+        resultado: 'publicada', 'ya_publicada', 'no_existe', 'medico_distinto',
+                   'fecha_distinta', 'repetida' o 'invalida'
+        """
+        ids_unicos = []
+        resultados = []
+        vistos = set()
+        for id_disp in ids_disponibilidades:
+            try:
+                id_int = int(id_disp)
+            except (TypeError, ValueError):
+                resultados.append({'id_disponibilidad': id_disp, 'resultado': 'invalida', 'id_agenda_detalle': None})
+                continue
+            if id_int in vistos:
+                resultados.append({'id_disponibilidad': id_int, 'resultado': 'repetida', 'id_agenda_detalle': None})
+                continue
+            vistos.add(id_int)
+            ids_unicos.append(id_int)
+            resultados.append({'id_disponibilidad': id_int, 'resultado': None, 'id_agenda_detalle': None})
+
+        sql_cabecera = "SELECT id_medico, fecha_agenda FROM agenda_cabecera WHERE id_agenda_cabecera = %s"
+
+        # candidatos: cada ID pedido con su disponibilidad y, si ya está publicada, su detalle.
+        # Solo se insertan las válidas y no publicadas; ON CONFLICT cubre una publicación
+        # simultánea de la misma disponibilidad (índice único de sql/005).
+        sql = """
+        WITH pedidos AS (
+            SELECT id, orden
+            FROM unnest(%(ids)s::int[]) WITH ORDINALITY AS u(id, orden)
+        ),
+        candidatos AS (
+            SELECT
+                p.id AS id_pedido,
+                p.orden,
+                d.id_disponibilidad,
+                d.id_medico,
+                d.dispo_fecha,
+                d.id_dia,
+                d.id_turno,
+                d.dispo_hora_inicio,
+                d.dispo_hora_fin,
+                d.dispo_cupos,
+                ex.id_agenda_detalle AS id_existente
+            FROM pedidos p
+            LEFT JOIN disponibilidad_horaria d ON d.id_disponibilidad = p.id
+            LEFT JOIN LATERAL (
+                SELECT ad.id_agenda_detalle
+                FROM agenda_detalle ad
+                WHERE ad.id_agenda_cabecera = %(id_cabecera)s
+                  AND ad.id_disponibilidad_horaria = p.id
+                LIMIT 1
+            ) ex ON TRUE
+        ),
+        insertados AS (
+            INSERT INTO agenda_detalle(
+                id_agenda_cabecera,
+                id_disponibilidad_horaria,
+                id_dia,
+                id_turno,
+                hora_inicio,
+                hora_fin,
+                cupos_disponibles,
+                cupos_maximos,
+                estado_detalle
+            )
+            SELECT %(id_cabecera)s, c.id_disponibilidad, c.id_dia, c.id_turno,
+                   c.dispo_hora_inicio, c.dispo_hora_fin, c.dispo_cupos, c.dispo_cupos, 'Disponible'
+            FROM candidatos c
+            WHERE c.id_disponibilidad IS NOT NULL
+              AND c.id_existente IS NULL
+              AND c.id_medico = %(id_medico)s
+              AND c.dispo_fecha = %(fecha)s
+            ORDER BY c.orden
+            ON CONFLICT DO NOTHING
+            RETURNING id_agenda_detalle, id_disponibilidad_horaria
+        )
+        SELECT c.id_pedido, c.id_disponibilidad, c.id_medico, c.dispo_fecha,
+               c.id_existente, i.id_agenda_detalle
+        FROM candidatos c
+        LEFT JOIN insertados i ON i.id_disponibilidad_horaria = c.id_pedido
+        ORDER BY c.orden
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql_cabecera, (id_agenda_cabecera,))
+            cabecera = cur.fetchone()
+            if not cabecera:
+                app.logger.warning(f"No existe la cabecera {id_agenda_cabecera}")
+                return None
+            id_medico, fecha_agenda = cabecera
+
+            salida = {}
+            if ids_unicos:
+                cur.execute(sql, {
+                    'ids': ids_unicos,
+                    'id_cabecera': id_agenda_cabecera,
+                    'id_medico': id_medico,
+                    'fecha': fecha_agenda
+                })
+                for id_pedido, id_disp, id_medico_disp, fecha_disp, id_existente, id_nuevo in cur.fetchall():
+                    if id_disp is None:
+                        salida[id_pedido] = ('no_existe', None)
+                    elif id_existente is not None:
+                        salida[id_pedido] = ('ya_publicada', id_existente)
+                    elif id_medico_disp != id_medico:
+                        salida[id_pedido] = ('medico_distinto', None)
+                    elif fecha_disp != fecha_agenda:
+                        salida[id_pedido] = ('fecha_distinta', None)
+                    elif id_nuevo is None:
+                        # La publicó otra transacción al mismo tiempo
+                        salida[id_pedido] = ('ya_publicada', None)
+                    else:
+                        salida[id_pedido] = ('publicada', id_nuevo)
+            con.commit()
+
+            for r in resultados:
+                if r['resultado'] is None:
+                    r['resultado'], r['id_agenda_detalle'] = salida[r['id_disponibilidad']]
+
+            publicadas = sum(1 for r in resultados if r['resultado'] == 'publicada')
+            app.logger.info(f"Cabecera {id_agenda_cabecera}: {publicadas} de {len(resultados)} disponibilidades publicadas")
+            return resultados
+        except Exception as e:
+            app.logger.error(f"Error al publicar disponibilidades: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     def deleteDetalle(self, id_agenda_detalle):
         """Elimina un detalle específico"""
         sql = "DELETE FROM agenda_detalle WHERE id_agenda_detalle=%s"
@@ -0,0 +1,231 @@
+from flask import current_app as app
+from app.conexion.Conexion import Conexion
+from app.dao.referenciales_agendamiento.cita.CitaDao import CitaDao
+
+
+class ReconciliacionCuposDao:
+    """
+    Recalcula agenda_detalle.cupos_disponibles a partir de los datos reales:
+        cupos_maximos - detalles de cita que ocupan cupo - reservas de cupo activas
+    Reporta los desvíos y los corrige en bloque (sql/010).
+    """
+
+    # Turnos de un rango de fechas o de una lista de IDs
+    TURNOS_POR_FECHA = """
+        SELECT ad.id_agenda_detalle
+        FROM agenda_detalle ad
+        JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+        WHERE ac.fecha_agenda BETWEEN %(fecha_desde)s AND %(fecha_hasta)s
+    """
+    TURNOS_POR_ID = "SELECT unnest(%(ids)s::int[]) AS id_agenda_detalle"
+
+    # Cupos esperados de los turnos elegidos, en una consulta agregada
+    ESPERADOS = """
+    turnos AS ({turnos}),
+    ocupados AS (
+        SELECT cd.id_agenda_detalle, COUNT(*) AS cantidad
+        FROM cita_detalle cd
+        JOIN turnos t ON t.id_agenda_detalle = cd.id_agenda_detalle
+        WHERE cd.id_estado_cita = ANY(%(ocupan)s::int[])
+        GROUP BY cd.id_agenda_detalle
+    ),
+    reservados AS (
+        SELECT r.id_agenda_detalle, COUNT(*) AS cantidad
+        FROM reserva_cupo r
+        JOIN turnos t ON t.id_agenda_detalle = r.id_agenda_detalle
+        WHERE r.estado = 'Activa'
+        GROUP BY r.id_agenda_detalle
+    ),
+    esperados AS (
+        SELECT
+            ad.id_agenda_detalle,
+            ad.cupos_maximos,
+            ad.cupos_disponibles AS cupos_actuales,
+            COALESCE(o.cantidad, 0) AS ocupados,
+            COALESCE(r.cantidad, 0) AS reservados,
+            GREATEST(ad.cupos_maximos - COALESCE(o.cantidad, 0) - COALESCE(r.cantidad, 0), 0) AS cupos_esperados
+        FROM agenda_detalle ad
+        JOIN turnos t ON t.id_agenda_detalle = ad.id_agenda_detalle
+        LEFT JOIN ocupados o ON o.id_agenda_detalle = ad.id_agenda_detalle
+        LEFT JOIN reservados r ON r.id_agenda_detalle = ad.id_agenda_detalle
+        WHERE ad.cupos_maximos IS NOT NULL
+    )
+    """
+
+    SQL_REPORTE = "WITH " + ESPERADOS + """
+    SELECT
+        e.id_agenda_detalle,
+        ac.fecha_agenda,
+        ad.hora_inicio,
+        ac.id_medico,
+        e.cupos_maximos,
+        e.cupos_actuales,
+        e.ocupados,
+        e.reservados,
+        e.cupos_esperados
+    FROM esperados e
+    JOIN agenda_detalle ad ON ad.id_agenda_detalle = e.id_agenda_detalle
+    JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+    WHERE e.cupos_actuales IS DISTINCT FROM e.cupos_esperados
+    ORDER BY ac.fecha_agenda, ad.hora_inicio, e.id_agenda_detalle
+    """
+
+    # Corrección en bloque: solo los turnos con desvío. Los estados distintos de
+    # Disponible/Agotado (ej. Cancelado) no se tocan.
+    SQL_CORREGIR = "WITH " + ESPERADOS.format(turnos=TURNOS_POR_ID) + """
+    UPDATE agenda_detalle ad
+    SET cupos_disponibles = e.cupos_esperados,
+        estado_detalle = CASE
+            WHEN ad.estado_detalle NOT IN ('Disponible', 'Agotado') THEN ad.estado_detalle
+            WHEN e.cupos_esperados = 0 THEN 'Agotado'
+            ELSE 'Disponible'
+        END
+    FROM esperados e
+    WHERE ad.id_agenda_detalle = e.id_agenda_detalle
+      AND ad.cupos_disponibles IS DISTINCT FROM e.cupos_esperados
+    RETURNING ad.id_agenda_detalle, e.cupos_actuales, e.cupos_esperados, e.ocupados, e.reservados
+    """
+
+    SQL_BLOQUEAR = """
+    SELECT id_agenda_detalle
+    FROM agenda_detalle
+    WHERE id_agenda_detalle IN ({turnos})
+    ORDER BY id_agenda_detalle
+    FOR UPDATE
+    """
+
+    # Toma y borra un lote de marcas (registro de solo inserción, sql/017) y
+    # retorna los turnos sin repetir con sus marcas borradas. Si un turno tiene
+    # más marcas fuera del lote, se vuelve a revisar en un lote siguiente.
+    SQL_TOMAR_PENDIENTES = """
+    WITH marcas AS (
+        SELECT id_marca
+        FROM cupos_por_reconciliar
+        ORDER BY id_marca
+        LIMIT %(limite)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    borradas AS (
+        DELETE FROM cupos_por_reconciliar c
+        USING marcas m
+        WHERE c.id_marca = m.id_marca
+        RETURNING c.id_agenda_detalle
+    )
+    SELECT id_agenda_detalle, COUNT(*) FROM borradas GROUP BY id_agenda_detalle
+    """
+
+    def _ocupan(self):
+        return sorted(CitaDao().getEstadosQueOcupanCupo())
+
+    def _leer_correcciones(self, rows):
+        return [
+            {
+                'id_agenda_detalle': r[0],
+                'cupos_anteriores': r[1],
+                'cupos_corregidos': r[2],
+                'ocupados': r[3],
+                'reservados': r[4],
+                'desvio': r[1] - r[2]
+            }
+            for r in rows
+        ]
+
+    def _corregir(self, cur, ids, ocupan):
+        """
+        Bloquea los turnos (en orden de ID) y recién después recalcula: la sentencia
+        de corrección toma una foto nueva que ya incluye las reservas que estaban
+        en curso al pedir el bloqueo.
+        """
+        if not ids:
+            return []
+        cur.execute(self.SQL_BLOQUEAR.format(turnos=self.TURNOS_POR_ID), {'ids': ids})
+        ids = [r[0] for r in cur.fetchall()]
+        if not ids:
+            return []
+        cur.execute(self.SQL_CORREGIR, {'ids': ids, 'ocupan': ocupan})
+        return self._leer_correcciones(cur.fetchall())
+
+    def reportarDesvios(self, fecha_desde, fecha_hasta):
+        """
+        Turnos del rango cuyo cupos_disponibles no coincide con el esperado (solo lectura).
+        Retorna una lista (vacía si no hay desvíos), o None si hubo error.
+        """
+        ocupan = self._ocupan()
+        sql = self.SQL_REPORTE.format(turnos=self.TURNOS_POR_FECHA)
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta, 'ocupan': ocupan})
+            return [
+                {
+                    'id_agenda_detalle': r[0],
+                    'fecha': r[1].isoformat(),
+                    'hora_inicio': r[2].strftime('%H:%M') if r[2] else None,
+                    'id_medico': r[3],
+                    'cupos_maximos': r[4],
+                    'cupos_disponibles': r[5],
+                    'ocupados': r[6],
+                    'reservados': r[7],
+                    'cupos_esperados': r[8],
+                    'desvio': (r[5] or 0) - r[8]
+                }
+                for r in cur.fetchall()
+            ]
+        except Exception as e:
+            app.logger.error(f"❌ Error al reportar desvíos de cupos: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def corregirDesvios(self, fecha_desde, fecha_hasta):
+        """Corrige en bloque los desvíos de un rango de fechas. Retorna las correcciones o None si hubo error."""
+        ocupan = self._ocupan()
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(self.TURNOS_POR_FECHA, {'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta})
+            ids = [r[0] for r in cur.fetchall()]
+            correcciones = self._corregir(cur, ids, ocupan)
+            con.commit()
+            if correcciones:
+                app.logger.warning(f"🧮 Cupos corregidos entre {fecha_desde} y {fecha_hasta}: {len(correcciones)} turnos")
+            return correcciones
+        except Exception as e:
+            app.logger.error(f"❌ Error al corregir desvíos de cupos: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def reconciliarPendientes(self, limite=500):
+        """
+        Reconciliación incremental: toma un lote de turnos marcados como cambiados
+        y corrige los que tengan desvío. Varios procesos pueden correrla a la vez.
+        Retorna {'marcas', 'revisados', 'correcciones'} o None si hubo error (el lote
+        queda pendiente). marcas es la cantidad de marcas tomadas: un turno suele
+        tener varias, así que el lote está completo si marcas llega al límite.
+        """
+        ocupan = self._ocupan()
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(self.SQL_TOMAR_PENDIENTES, {'limite': limite})
+            tomadas = cur.fetchall()
+            ids = sorted(r[0] for r in tomadas)
+            correcciones = self._corregir(cur, ids, ocupan)
+            con.commit()
+            if correcciones:
+                app.logger.warning(f"🧮 Cupos corregidos (incremental): {len(correcciones)} de {len(ids)} turnos revisados")
+            return {'marcas': sum(r[1] for r in tomadas), 'revisados': len(ids), 'correcciones': correcciones}
+        except Exception as e:
+            app.logger.error(f"❌ Error en la reconciliación incremental de cupos: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
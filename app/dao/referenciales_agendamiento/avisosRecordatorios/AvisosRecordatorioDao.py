@@ -1,7 +1,53 @@
+import json
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cursores import iterar_cursor_servidor
+from app.dao.paginacion import normalizar_limite, clausulas_keyset, armar_pagina
 from datetime import datetime
 
+# Columnas que necesita el envío de un aviso (mismo orden que _filaEnvio).
+# {avisos} es la tabla o el CTE del que salen los avisos.
+SQL_AVISOS_PARA_ENVIO = """
+SELECT a.id_aviso,
+       a.id_paciente,
+       p.nombre || ' ' || p.apellido AS paciente,
+       p.telefono AS telefono_paciente,
+       a.id_funcionario,
+       f.nombre || ' ' || f.apellido AS funcionario,
+       a.id_medico,
+       COALESCE(m.nombre || ' ' || m.apellido, 'Sin médico') AS medico,
+       a.codigo,
+       COALESCE(c.nombre_consultorio, 'Sin consultorio') AS nombre_consultorio,
+       a.fecha_cita,
+       a.hora_cita,
+       a.forma_envio,
+       a.mensaje,
+       a.estado_envio,
+       a.estado_confirmacion
+FROM {avisos} a
+JOIN paciente p ON a.id_paciente = p.id_paciente
+JOIN funcionario f ON a.id_funcionario = f.id_funcionario
+LEFT JOIN medico m ON a.id_medico = m.id_medico
+LEFT JOIN consultorio c ON a.codigo = c.codigo
+"""
+
+# Marca como tomados los avisos de `candidatos` (SELECT con FOR UPDATE SKIP LOCKED)
+# y los devuelve con los datos de envío
+SQL_TOMAR_AVISOS = """
+WITH candidatos AS ({candidatos}),
+tomados AS (
+    UPDATE avisos_recordatorios a
+    SET tomado_por = %(trabajador)s,
+        tomado_en = NOW(),
+        intentos = a.intentos + 1
+    FROM candidatos c
+    WHERE a.id_aviso = c.id_aviso
+    RETURNING a.*
+)
+""" + SQL_AVISOS_PARA_ENVIO.format(avisos='tomados') + """
+ORDER BY a.fecha_cita, a.hora_cita, a.id_aviso
+"""
+
 class AvisoRecordatorioDao:
 
     # ==============================
@@ -75,6 +121,140 @@ class AvisoRecordatorioDao:
             cur.close()
             con.close()
 
+    # ==============================
+    #   LISTAR AVISOS EN STREAMING
+    # ==============================
+    def iterarAvisos(self):
+        """Como getAvisos, pero generador sobre un cursor del servidor (lectura por lotes)"""
+        sql = """
+        SELECT a.id_aviso,
+               p.nombre || ' ' || p.apellido AS paciente,
+               p.telefono AS telefono_paciente,
+               f.nombre || ' ' || f.apellido AS funcionario,
+               COALESCE(m.nombre || ' ' || m.apellido, 'Sin médico') AS medico,
+               COALESCE(c.nombre_consultorio, 'Sin consultorio') AS nombre_consultorio,
+               a.fecha_cita,
+               a.hora_cita,
+               a.forma_envio,
+               a.mensaje,
+               a.estado_envio,
+               a.estado_confirmacion,
+               a.id_paciente,
+               a.id_funcionario,
+               a.id_medico,
+               a.codigo
+        FROM avisos_recordatorios a
+        JOIN paciente p ON a.id_paciente = p.id_paciente
+        JOIN funcionario f ON a.id_funcionario = f.id_funcionario
+        LEFT JOIN medico m ON a.id_medico = m.id_medico
+        LEFT JOIN consultorio c ON a.codigo = c.codigo
+        ORDER BY a.fecha_cita DESC, a.hora_cita DESC;
+        """
+        return iterar_cursor_servidor(sql, mapear=lambda row: {
+            'id_aviso': row[0],
+            'paciente': row[1],
+            'telefono_paciente': row[2],
+            'funcionario': row[3],
+            'medico': row[4],
+            'nombre_consultorio': row[5],
+            'fecha_cita': row[6].isoformat() if row[6] else None,
+            'hora_cita': row[7].strftime("%H:%M") if row[7] else None,
+            'forma_envio': row[8],
+            'mensaje': row[9],
+            'estado_envio': row[10],
+            'estado_confirmacion': row[11],
+            'id_paciente': row[12],
+            'id_funcionario': row[13],
+            'id_medico': row[14],
+            'codigo': row[15]
+        })
+
+    # ==============================
+    #   PÁGINA DE AVISOS (CURSOR)
+    # ==============================
+    def getAvisosPagina(self, cursor=None, limite=None):
+        """
+        Página de avisos por cursor, mismo orden que getAvisos
+        (fecha_cita DESC, hora_cita DESC) con id_aviso como desempate.
+        fecha/hora pueden ser NULL, por eso la clave usa COALESCE con el valor
+        máximo: en DESC los NULL van primero, como en getAvisos (índice en sql/018).
+        """
+        limite = normalizar_limite(limite)
+        condicion, order_by, params, retrocede = clausulas_keyset(
+            ["COALESCE(a.fecha_cita, DATE '9999-12-31')",
+             "COALESCE(a.hora_cita, TIME '23:59:59.999999')",
+             'a.id_aviso'],
+            True, cursor
+        )
+        where = f"WHERE {condicion}" if condicion else ""
+
+        sql = f"""
+        SELECT a.id_aviso,
+               p.nombre || ' ' || p.apellido AS paciente,
+               p.telefono AS telefono_paciente,
+               f.nombre || ' ' || f.apellido AS funcionario,
+               COALESCE(m.nombre || ' ' || m.apellido, 'Sin médico') AS medico,
+               COALESCE(c.nombre_consultorio, 'Sin consultorio') AS nombre_consultorio,
+               a.fecha_cita,
+               a.hora_cita,
+               a.forma_envio,
+               a.mensaje,
+               a.estado_envio,
+               a.estado_confirmacion,
+               a.id_paciente,
+               a.id_funcionario,
+               a.id_medico,
+               a.codigo,
+               COALESCE(a.fecha_cita, DATE '9999-12-31') AS clave_fecha,
+               COALESCE(a.hora_cita, TIME '23:59:59.999999') AS clave_hora
+        FROM avisos_recordatorios a
+        JOIN paciente p ON a.id_paciente = p.id_paciente
+        JOIN funcionario f ON a.id_funcionario = f.id_funcionario
+        LEFT JOIN medico m ON a.id_medico = m.id_medico
+        LEFT JOIN consultorio c ON a.codigo = c.codigo
+        {where}
+        ORDER BY {order_by}
+        LIMIT %s;
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params) + (limite + 1,))
+            rows, siguiente, anterior = armar_pagina(
+                cur.fetchall(), lambda row: (row[16], row[17], row[0]), limite, cursor, retrocede
+            )
+
+            avisos = []
+            for row in rows:
+                avisos.append({
+                    'id_aviso': row[0],
+                    'paciente': row[1],
+                    'telefono_paciente': row[2],
+                    'funcionario': row[3],
+                    'medico': row[4],
+                    'nombre_consultorio': row[5],
+                    'fecha_cita': row[6].isoformat() if row[6] else None,
+                    'hora_cita': row[7].strftime("%H:%M") if row[7] else None,
+                    'forma_envio': row[8],
+                    'mensaje': row[9],
+                    'estado_envio': row[10],
+                    'estado_confirmacion': row[11],
+                    'id_paciente': row[12],
+                    'id_funcionario': row[13],
+                    'id_medico': row[14],
+                    'codigo': row[15]
+                })
+
+            return {'data': avisos, 'siguiente': siguiente, 'anterior': anterior, 'limite': limite}
+
+        except Exception as e:
+            app.logger.error(f"❌ Error en AvisoRecordatorioDao.getAvisosPagina: {e}")
+            return {'data': [], 'siguiente': None, 'anterior': None, 'limite': limite}
+        finally:
+            cur.close()
+            con.close()
+
     # ==============================
     #   OBTENER UN AVISO POR ID
     # ==============================
@@ -142,6 +322,171 @@ class AvisoRecordatorioDao:
             cur.close()
             con.close()
 
+    # ==============================
+    #   AVISOS PARA ENVIAR
+    # ==============================
+    def _filaEnvio(self, row):
+        return {
+            'id_aviso': row[0],
+            'id_paciente': row[1],
+            'paciente': row[2],
+            'telefono_paciente': row[3],
+            'id_funcionario': row[4],
+            'funcionario': row[5],
+            'id_medico': row[6],
+            'medico': row[7],
+            'codigo': row[8],
+            'nombre_consultorio': row[9],
+            'fecha_cita': row[10].isoformat() if row[10] else None,
+            'hora_cita': row[11].strftime("%H:%M") if row[11] else None,
+            'forma_envio': row[12],
+            'mensaje': row[13],
+            'estado_envio': row[14],
+            'estado_confirmacion': row[15]
+        }
+
+    def _tomar(self, candidatos, params):
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(SQL_TOMAR_AVISOS.format(candidatos=candidatos), params)
+            avisos = [self._filaEnvio(row) for row in cur.fetchall()]
+            con.commit()
+            return avisos
+        except Exception as e:
+            app.logger.error(f"❌ Error al tomar avisos para envío: {e}")
+            con.rollback()
+            return []
+        finally:
+            cur.close()
+            con.close()
+
+    def tomarAvisosPendientes(self, forma_envio, limite, trabajador, vencimiento, solo_reintentos=False):
+        """
+        Toma un lote de avisos pendientes de un canal para `trabajador`, en orden
+        de cita, con todo lo necesario para enviarlos (incluido el teléfono).
+        Solo considera los que ya llegaron a su proximo_intento_en, y saltea los
+        que otro trabajador tomó hace menos de `vencimiento` segundos.
+        solo_reintentos=True: solo los que ya fallaron al menos una vez.
+        Usa los índices parciales de avisos pendientes (sql/012 y sql/014).
+        """
+        candidatos = """
+            SELECT id_aviso
+            FROM avisos_recordatorios
+            WHERE estado_envio = 'Pendiente'
+              AND forma_envio = %(forma_envio)s
+              AND proximo_intento_en <= NOW()
+              AND (NOT %(solo_reintentos)s OR intentos > 0)
+              AND (tomado_en IS NULL OR tomado_en < NOW() - make_interval(secs => %(vencimiento)s))
+            ORDER BY fecha_cita, hora_cita, id_aviso
+            LIMIT %(limite)s
+            FOR UPDATE SKIP LOCKED
+        """
+        return self._tomar(candidatos, {
+            'forma_envio': forma_envio, 'limite': limite, 'solo_reintentos': solo_reintentos,
+            'trabajador': trabajador, 'vencimiento': vencimiento
+        })
+
+    def tomarAviso(self, id_aviso, trabajador, vencimiento):
+        """
+        Toma un aviso puntual (en cualquier estado: es un envío pedido a mano).
+        Retorna el aviso, o None si no existe o lo tiene tomado otro trabajador.
+        """
+        candidatos = """
+            SELECT id_aviso
+            FROM avisos_recordatorios
+            WHERE id_aviso = %(id_aviso)s
+              AND (tomado_en IS NULL OR tomado_en < NOW() - make_interval(secs => %(vencimiento)s))
+            FOR UPDATE SKIP LOCKED
+        """
+        avisos = self._tomar(candidatos, {
+            'id_aviso': id_aviso, 'trabajador': trabajador, 'vencimiento': vencimiento
+        })
+        return avisos[0] if avisos else None
+
+    def registrarResultadosEnvio(self, resultados, trabajador, max_intentos, espera_base, espera_maxima):
+        """
+        Guarda en una sola sentencia el resultado de un lote de envíos y libera
+        la toma. resultados: [{'id_aviso', 'estado_envio', 'mensaje', 'reintentable', 'error'}];
+        mensaje None conserva el mensaje actual.
+
+        Un envío fallido reintentable vuelve a 'Pendiente' con proximo_intento_en
+        a espera_base * 2^(intentos-1) segundos (tope espera_maxima, con jitter);
+        al llegar a max_intentos, o si no es reintentable, queda en 'Error' (sql/014).
+
+        También renueva tomado_en de los demás avisos que `trabajador` tiene
+        tomados, para que la toma no venza mientras sigue enviando el lote.
+
+        Es idempotente: solo se aplica si `trabajador` sigue siendo el dueño de
+        la toma, o si el aviso se envió y sigue 'Pendiente' (la toma venció
+        durante el envío y no debe mandarlo otro trabajador).
+        Retorna {estado_envio: cantidad} de los avisos actualizados, o None si hubo error.
+        """
+        if not resultados:
+            return {}
+        sql = """
+        WITH r AS (
+            SELECT res.*,
+                   res.estado_envio <> 'Enviado' AND res.reintentable AND a.intentos < %(max_intentos)s AS reintenta
+            FROM json_to_recordset(%(resultados)s::json) AS res(
+                id_aviso INT, estado_envio VARCHAR, mensaje TEXT, reintentable BOOLEAN, error TEXT
+            )
+            JOIN avisos_recordatorios a ON a.id_aviso = res.id_aviso
+        ),
+        actualizados AS (
+            UPDATE avisos_recordatorios a
+            SET estado_envio = CASE
+                    WHEN r.estado_envio = 'Enviado' THEN 'Enviado'
+                    WHEN r.reintenta THEN 'Pendiente'
+                    ELSE 'Error'
+                END,
+                proximo_intento_en = CASE
+                    WHEN r.reintenta THEN NOW() + make_interval(secs =>
+                        LEAST(%(espera_maxima)s, %(espera_base)s * 2 ^ GREATEST(a.intentos - 1, 0))
+                        * (0.5 + random() / 2))
+                    ELSE a.proximo_intento_en
+                END,
+                ultimo_error = r.error,
+                mensaje = COALESCE(r.mensaje, a.mensaje),
+                tomado_por = NULL,
+                tomado_en = NULL
+            FROM r
+            WHERE a.id_aviso = r.id_aviso
+              AND (a.tomado_por = %(trabajador)s OR (r.estado_envio = 'Enviado' AND a.estado_envio = 'Pendiente'))
+            RETURNING a.estado_envio
+        ),
+        renovados AS (
+            -- El trabajador sigue vivo: se renueva la toma del resto de su lote
+            UPDATE avisos_recordatorios a
+            SET tomado_en = NOW()
+            WHERE a.tomado_por = %(trabajador)s
+              AND a.id_aviso NOT IN (SELECT id_aviso FROM r)
+        )
+        SELECT estado_envio, COUNT(*) FROM actualizados GROUP BY estado_envio
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {
+                'resultados': json.dumps(resultados), 'trabajador': trabajador,
+                'max_intentos': max_intentos, 'espera_base': espera_base, 'espera_maxima': espera_maxima
+            })
+            por_estado = dict(cur.fetchall())
+            con.commit()
+            filas = sum(por_estado.values())
+            if filas < len(resultados):
+                app.logger.warning(f"⚠️ {len(resultados) - filas} resultados de envío ya no eran de {trabajador}")
+            return por_estado
+        except Exception as e:
+            app.logger.error(f"❌ Error al registrar resultados de envío: {e}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     # ==============================
     #   AGREGAR AVISO
     # ==============================
@@ -0,0 +1,220 @@
+from flask import current_app as app
+from psycopg2 import errors
+from app.conexion.Conexion import Conexion
+
+CANAL_ENVIOS = 'envios_whatsapp'
+
+# Clave del advisory lock que toma el despachador mientras corre (uno solo por base)
+LOCK_DESPACHADOR = 7021
+
+
+class EnvioWhatsappDao:
+    """Cola de envíos de WhatsApp (sql/011)"""
+
+    def encolarEnvio(self, tipo, id_aviso=None):
+        """
+        Encola un envío y despierta al despachador. Si el mismo envío ya está
+        en cola o en curso, retorna ese. Retorna el id_envio o None si hubo error.
+        """
+        sql = """
+        WITH existente AS (
+            SELECT id_envio
+            FROM envios_whatsapp
+            WHERE tipo = %(tipo)s
+              AND COALESCE(id_aviso, 0) = COALESCE(%(id_aviso)s::int, 0)
+              AND estado IN ('En cola', 'Enviando')
+        ),
+        nuevo AS (
+            INSERT INTO envios_whatsapp (tipo, id_aviso)
+            SELECT %(tipo)s, %(id_aviso)s::int
+            WHERE NOT EXISTS (SELECT 1 FROM existente)
+            RETURNING id_envio
+        )
+        SELECT id_envio FROM nuevo
+        UNION ALL
+        SELECT id_envio FROM existente
+        """
+        for _ in range(2):
+            conexion = Conexion()
+            con = conexion.getConexion()
+            cur = con.cursor()
+            try:
+                cur.execute(sql, {'tipo': tipo, 'id_aviso': id_aviso})
+                id_envio = cur.fetchone()[0]
+                cur.execute("SELECT pg_notify(%s, %s)", (CANAL_ENVIOS, str(id_envio)))
+                con.commit()
+                app.logger.info(f"📨 Envío de WhatsApp #{id_envio} en cola ({tipo} {id_aviso or ''})")
+                return id_envio
+            except errors.UniqueViolation:
+                # Otro pedido encoló el mismo envío al mismo tiempo: se lee el suyo
+                con.rollback()
+                continue
+            except Exception as e:
+                app.logger.error(f"❌ Error al encolar envío de WhatsApp: {str(e)}")
+                con.rollback()
+                return None
+            finally:
+                cur.close()
+                con.close()
+        return None
+
+    def getEnvioById(self, id_envio):
+        sql = """
+        SELECT id_envio, tipo, id_aviso, estado, resultado, creado_en, iniciado_en, terminado_en,
+               (SELECT COUNT(*) FROM envios_whatsapp c
+                WHERE c.estado = 'En cola'
+                  AND ((c.tipo = 'aviso') > (e.tipo = 'aviso')
+                       OR ((c.tipo = 'aviso') = (e.tipo = 'aviso') AND c.id_envio < e.id_envio))
+               ) AS delante_en_cola
+        FROM envios_whatsapp e
+        WHERE id_envio = %s
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (id_envio,))
+            r = cur.fetchone()
+            if not r:
+                return None
+            return {
+                'id_envio': r[0],
+                'tipo': r[1],
+                'id_aviso': r[2],
+                'estado': r[3],
+                'resultado': r[4],
+                'creado_en': r[5].isoformat() if r[5] else None,
+                'iniciado_en': r[6].isoformat() if r[6] else None,
+                'terminado_en': r[7].isoformat() if r[7] else None,
+                'delante_en_cola': r[8] if r[3] == 'En cola' else 0
+            }
+        except Exception as e:
+            app.logger.error(f"❌ Error al obtener envío de WhatsApp {id_envio}: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def tomarSiguienteEnvio(self):
+        """
+        Pasa el siguiente envío de la cola a 'Enviando' y lo retorna, o None si la cola
+        está vacía. Los avisos puntuales van antes que las corridas de pendientes: un
+        clic no espera detrás de un lote largo.
+        """
+        sql = """
+        UPDATE envios_whatsapp
+        SET estado = 'Enviando', iniciado_en = NOW()
+        WHERE id_envio = (
+            SELECT id_envio
+            FROM envios_whatsapp
+            WHERE estado = 'En cola'
+            ORDER BY (tipo = 'aviso') DESC, id_envio
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id_envio, tipo, id_aviso
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql)
+            r = cur.fetchone()
+            con.commit()
+            if not r:
+                return None
+            return {'id_envio': r[0], 'tipo': r[1], 'id_aviso': r[2]}
+        except Exception as e:
+            app.logger.error(f"❌ Error al tomar envío de WhatsApp de la cola: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def terminarEnvio(self, id_envio, exito, resultado=None):
+        sql = """
+        UPDATE envios_whatsapp
+        SET estado = %s, resultado = %s, terminado_en = NOW()
+        WHERE id_envio = %s
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, ('Completado' if exito else 'Error', resultado, id_envio))
+            con.commit()
+            return cur.rowcount > 0
+        except Exception as e:
+            app.logger.error(f"❌ Error al terminar envío de WhatsApp {id_envio}: {str(e)}")
+            con.rollback()
+            return False
+        finally:
+            cur.close()
+            con.close()
+
+    def devolverACola(self, id_envio, resultado=None):
+        """Vuelve a la cola un envío que quedó a medias (ej. una corrida de pendientes con más lotes)"""
+        sql = """
+        UPDATE envios_whatsapp
+        SET estado = 'En cola', iniciado_en = NULL, resultado = %s
+        WHERE id_envio = %s
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (resultado, id_envio))
+            con.commit()
+            return cur.rowcount > 0
+        except Exception as e:
+            app.logger.error(f"❌ Error al devolver a la cola el envío de WhatsApp {id_envio}: {str(e)}")
+            con.rollback()
+            return False
+        finally:
+            cur.close()
+            con.close()
+
+    def reencolarInterrumpidos(self):
+        """
+        Vuelve a la cola los envíos que quedaron 'Enviando' (el despachador anterior
+        se cortó). Solo lo llama el despachador que tiene el lock, así que no hay otro
+        procesándolos. Retorna la cantidad.
+        """
+        sql = "UPDATE envios_whatsapp SET estado = 'En cola', iniciado_en = NULL WHERE estado = 'Enviando'"
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql)
+            filas = cur.rowcount
+            con.commit()
+            return filas
+        except Exception as e:
+            app.logger.error(f"❌ Error al reencolar envíos de WhatsApp: {str(e)}")
+            con.rollback()
+            return 0
+        finally:
+            cur.close()
+            con.close()
+
+    def despachadorActivo(self):
+        """Indica si hay un despachador corriendo (tiene tomado el advisory lock)"""
+        sql = """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_locks
+            WHERE locktype = 'advisory' AND classid = 0 AND objid = %s AND objsubid = 1 AND granted
+        )
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (LOCK_DESPACHADOR,))
+            return cur.fetchone()[0]
+        except Exception as e:
+            app.logger.error(f"❌ Error al consultar el despachador de WhatsApp: {str(e)}")
+            return False
+        finally:
+            cur.close()
+            con.close()
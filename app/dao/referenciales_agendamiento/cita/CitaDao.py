@@ -1,5 +1,8 @@
+import json
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.cursores import iterar_cursor_servidor
+from app.dao.cache_catalogos import cacheado
 
 class CitaDao:
     """
@@ -11,10 +14,13 @@ class CitaDao:
     # GESTIÓN DE ESTADOS Y CUPOS
     # ========================================
     
+    @cacheado('estados_cita')
     def getEstadosQueOcupanCupo(self):
         """
         Obtiene los IDs de estados que OCUPAN cupo en la agenda
         Ejemplo: Reservado, Confirmado, Realizado
+        Se mantiene en el cache de catálogos ('estados_cita'): se consulta la
+        base solo al expirar el TTL o cuando cambia estado_cita por su API.
         """
         sql = "SELECT id_estado_cita FROM estado_cita WHERE ocupa_cupo = TRUE"
         conexion = Conexion()
@@ -23,16 +29,23 @@ class CitaDao:
         try:
             cur.execute(sql)
             rows = cur.fetchall()
-            ids = [row[0] for row in rows]  # Lista de IDs: [1, 2, 3]
-            app.logger.info(f"🔍 Estados que ocupan cupo obtenidos: {ids}")
+            ids = frozenset(row[0] for row in rows)  # Conjunto de IDs: {1, 2, 3}
+            app.logger.info(f"🔍 Estados que ocupan cupo obtenidos: {sorted(ids)}")
             return ids
         except Exception as e:
             app.logger.error(f"❌ Error al obtener estados que ocupan cupo: {str(e)}")
-            return []
+            return frozenset()
         finally:
             cur.close()
             con.close()
 
+    def ocupaCupo(self, id_estado_cita):
+        """Indica si un estado de cita ocupa cupo (consulta el conjunto en memoria)"""
+        try:
+            return int(id_estado_cita) in self.getEstadosQueOcupanCupo()
+        except (TypeError, ValueError):
+            return False
+
     def restarCupoAgendaDetalle(self, id_agenda_detalle):
         """
         Resta 1 cupo del agenda_detalle
@@ -78,6 +91,8 @@ class CitaDao:
         """
         Suma 1 cupo al agenda_detalle
         Cambia estado_detalle a 'Disponible'
+        El trigger trg_promover_lista_espera (sql/009) ofrece el cupo liberado
+        al siguiente paciente en lista de espera, en la misma transacción.
         """
         sql = """
         UPDATE agenda_detalle
@@ -138,6 +153,7 @@ class CitaDao:
     # GESTIÓN DE ESTADOS DE CITA
     # ========================================
 
+    @cacheado('estados_cita')
     def getEstadosCita(self):
         """Obtiene todos los estados de cita disponibles"""
         sql = """
@@ -221,6 +237,183 @@ class CitaDao:
             cur.close()
             con.close()
 
+    def iterarCitasCabecera(self):
+        """
+        Igual que getCitasCabecera pero como generador sobre un cursor del
+        servidor: las filas se leen por lotes y no se arma la lista completa
+        """
+        sql = """
+        SELECT 
+            cc.id_cita_cabecera,
+            cc.id_paciente,
+            (p.nombre || ' ' || p.apellido) AS paciente_nombre,
+            cc.id_agenda_cabecera,
+            ac.fecha_agenda,
+            (m.nombre || ' ' || m.apellido) AS medico_nombre,
+            e.nombre_especialidad AS especialidad,
+            cc.fecha_registro,
+            cc.observaciones,
+            cc.estado,
+            cc.id_funcionario
+        FROM cita_cabecera cc
+        JOIN paciente p ON cc.id_paciente = p.id_paciente
+        JOIN agenda_cabecera ac ON cc.id_agenda_cabecera = ac.id_agenda_cabecera
+        JOIN medico m ON ac.id_medico = m.id_medico
+        JOIN especialidades e ON ac.id_especialidad = e.id_especialidad
+        ORDER BY cc.fecha_registro DESC
+        """
+        return iterar_cursor_servidor(sql, mapear=lambda r: {
+            'id_cita_cabecera': r[0],
+            'id_paciente': r[1],
+            'paciente_nombre': r[2],
+            'id_agenda_cabecera': r[3],
+            'fecha_agenda': str(r[4]) if r[4] else None,
+            'medico_nombre': r[5],
+            'especialidad': r[6],
+            'fecha_registro': str(r[7]) if r[7] else None,
+            'observaciones': r[8],
+            'estado': r[9],
+            'id_funcionario': r[10]
+        })
+
+    # Columnas por las que se puede ordenar desde DataTables (nombre -> expresión SQL)
+    COLUMNAS_ORDEN_CABECERA = {
+        'paciente_nombre': "p.nombre || ' ' || p.apellido",
+        'medico_nombre': "m.nombre || ' ' || m.apellido",
+        'especialidad': 'e.nombre_especialidad',
+        'fecha_agenda': 'ac.fecha_agenda',
+        'fecha_registro': 'cc.fecha_registro',
+        'estado': 'cc.estado'
+    }
+
+    # A partir de esta cantidad estimada de filas, el total se toma de pg_class
+    UMBRAL_CONTEO_ESTIMADO = 10000
+
+    def contarCitasCabecera(self):
+        """
+        Total de cabeceras para recordsTotal de DataTables.
+        Con tablas grandes usa la estimación del planner (pg_class.reltuples)
+        en lugar de un COUNT(*) que recorre toda la tabla.
+        """
+        sql_estimado = "SELECT reltuples::bigint FROM pg_class WHERE oid = 'cita_cabecera'::regclass"
+        sql_exacto = "SELECT COUNT(*) FROM cita_cabecera"
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql_estimado)
+            row = cur.fetchone()
+            estimado = row[0] if row else -1
+            if estimado >= self.UMBRAL_CONTEO_ESTIMADO:
+                return estimado
+            cur.execute(sql_exacto)
+            return cur.fetchone()[0]
+        except Exception as e:
+            app.logger.error(f"Error al contar cabeceras de citas: {str(e)}")
+            return 0
+        finally:
+            cur.close()
+            con.close()
+
+    def getCitasCabeceraPaginado(self, inicio, cantidad, busqueda=None, orden_columna=None, orden_dir='desc'):
+        """
+        Página de cabeceras para DataTables server-side.
+        Filtro, orden y paginación se resuelven en SQL.
+        Retorna {'total', 'filtrados', 'data'}
+        """
+        expr_orden = self.COLUMNAS_ORDEN_CABECERA.get(orden_columna, 'cc.fecha_registro')
+        direccion = 'ASC' if str(orden_dir).lower() == 'asc' else 'DESC'
+
+        where = ""
+        params = []
+        conteo = "NULL"
+        if busqueda:
+            patron = '%' + busqueda.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where = """
+        WHERE (p.nombre || ' ' || p.apellido) ILIKE %s
+           OR (m.nombre || ' ' || m.apellido) ILIKE %s
+           OR e.nombre_especialidad ILIKE %s
+           OR cc.estado ILIKE %s
+            """
+            params = [patron] * 4
+            # COUNT(*) OVER () da el total filtrado en la misma pasada que la página
+            conteo = "COUNT(*) OVER ()"
+
+        sql = f"""
+        SELECT 
+            cc.id_cita_cabecera,
+            cc.id_paciente,
+            (p.nombre || ' ' || p.apellido) AS paciente_nombre,
+            cc.id_agenda_cabecera,
+            ac.fecha_agenda,
+            (m.nombre || ' ' || m.apellido) AS medico_nombre,
+            e.nombre_especialidad AS especialidad,
+            cc.fecha_registro,
+            cc.observaciones,
+            cc.estado,
+            cc.id_funcionario,
+            {conteo} AS filtrados
+        FROM cita_cabecera cc
+        JOIN paciente p ON cc.id_paciente = p.id_paciente
+        JOIN agenda_cabecera ac ON cc.id_agenda_cabecera = ac.id_agenda_cabecera
+        JOIN medico m ON ac.id_medico = m.id_medico
+        JOIN especialidades e ON ac.id_especialidad = e.id_especialidad
+        {where}
+        ORDER BY {expr_orden} {direccion}, cc.id_cita_cabecera {direccion}
+        LIMIT %s OFFSET %s
+        """
+        total = self.contarCitasCabecera()
+
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params + [cantidad, inicio]))
+            rows = cur.fetchall()
+
+            if not busqueda:
+                filtrados = total
+            elif rows:
+                filtrados = rows[0][11]
+            else:
+                # Página fuera de rango: solo aquí se cuenta aparte
+                cur.execute(f"""
+                SELECT COUNT(*)
+                FROM cita_cabecera cc
+                JOIN paciente p ON cc.id_paciente = p.id_paciente
+                JOIN agenda_cabecera ac ON cc.id_agenda_cabecera = ac.id_agenda_cabecera
+                JOIN medico m ON ac.id_medico = m.id_medico
+                JOIN especialidades e ON ac.id_especialidad = e.id_especialidad
+                {where}
+                """, tuple(params))
+                filtrados = cur.fetchone()[0]
+
+            return {
+                'total': total,
+                'filtrados': filtrados,
+                'data': [
+                    {
+                        'id_cita_cabecera': r[0],
+                        'id_paciente': r[1],
+                        'paciente_nombre': r[2],
+                        'id_agenda_cabecera': r[3],
+                        'fecha_agenda': str(r[4]) if r[4] else None,
+                        'medico_nombre': r[5],
+                        'especialidad': r[6],
+                        'fecha_registro': str(r[7]) if r[7] else None,
+                        'observaciones': r[8],
+                        'estado': r[9],
+                        'id_funcionario': r[10]
+                    } for r in rows
+                ]
+            }
+        except Exception as e:
+            app.logger.error(f"Error al obtener página de cabeceras de citas: {str(e)}")
+            return {'total': 0, 'filtrados': 0, 'data': []}
+        finally:
+            cur.close()
+            con.close()
+
     def getCitaCabeceraById(self, id_cita_cabecera):
         """Obtiene una cabecera específica por ID"""
         sql = """
@@ -325,24 +518,38 @@ class CitaDao:
         """
         Elimina una cabecera de cita
         NOTA: Por CASCADE también elimina los detalles
-        IMPORTANTE: Debe devolver cupos antes de eliminar
+        IMPORTANTE: Devuelve los cupos de los detalles que ocupaban cupo
+
+        Una sola sentencia: los cupos se devuelven con un UPDATE agrupado por
+        agenda_detalle (una fila por turno, sin importar cuántos detalles tenga
+        el plan) y en la misma transacción que el DELETE.
         """
-        # Primero obtenemos todos los detalles para devolver cupos
-        detalles = self.getDetallesPorCabecera(id_cita_cabecera)
-        
-        sql = "DELETE FROM cita_cabecera WHERE id_cita_cabecera=%s"
+        sql = """
+        WITH liberados AS (
+            SELECT cd.id_agenda_detalle, COUNT(*) AS cantidad
+            FROM cita_detalle cd
+            WHERE cd.id_cita_cabecera = %(id_cita_cabecera)s
+              AND cd.id_estado_cita = ANY(%(ocupan)s::int[])
+            GROUP BY cd.id_agenda_detalle
+        ),
+        devueltos AS (
+            UPDATE agenda_detalle ad
+            SET cupos_disponibles = LEAST(ad.cupos_disponibles + l.cantidad,
+                                          COALESCE(ad.cupos_maximos, ad.cupos_disponibles + l.cantidad)),
+                estado_detalle = CASE WHEN ad.estado_detalle = 'Agotado' THEN 'Disponible' ELSE ad.estado_detalle END
+            FROM liberados l
+            WHERE ad.id_agenda_detalle = l.id_agenda_detalle
+            RETURNING ad.id_agenda_detalle
+        )
+        DELETE FROM cita_cabecera
+        WHERE id_cita_cabecera = %(id_cita_cabecera)s
+        """
+        ocupan = sorted(self.getEstadosQueOcupanCupo())
         conexion = Conexion()
         con = conexion.getConexion()
         cur = con.cursor()
         try:
-            # Devolver cupos de todos los detalles que ocupaban cupo
-            estados_ocupan = self.getEstadosQueOcupanCupo()
-            for detalle in detalles:
-                if detalle['id_estado_cita'] in estados_ocupan:
-                    self.sumarCupoAgendaDetalle(detalle['id_agenda_detalle'])
-            
-            # Eliminar cabecera
-            cur.execute(sql, (id_cita_cabecera,))
+            cur.execute(sql, {'id_cita_cabecera': id_cita_cabecera, 'ocupan': ocupan})
             filas = cur.rowcount
             con.commit()
             app.logger.info(f"Cabecera de cita eliminada: {id_cita_cabecera}")
@@ -477,6 +684,11 @@ class CitaDao:
         """
         Crea un nuevo detalle de cita
         IMPORTANTE: Gestiona cupos automáticamente según el estado
+
+        Reserva el cupo e inserta el detalle en una sola sentencia:
+        el UPDATE condicional (cupos_disponibles > 0) bloquea la fila de
+        agenda_detalle, así dos reservas simultáneas no pueden tomar el
+        mismo último cupo. Si no devuelve fila, retorna "SIN_CUPOS".
         """
         app.logger.info(f"=" * 60)
         app.logger.info(f"📝 INICIANDO GUARDADO DE CITA DETALLE")
@@ -485,53 +697,58 @@ class CitaDao:
         app.logger.info(f"   • id_agenda_detalle: {id_agenda_detalle}")
         app.logger.info(f"   • fecha_cita: {fecha_cita}")
         app.logger.info(f"   • hora_cita: {hora_cita}")
-        app.logger.info(f"   • id_estado_cita: {id_estado_cita} (tipo: {type(id_estado_cita)})")
+        app.logger.info(f"   • id_estado_cita: {id_estado_cita}")
         app.logger.info(f"=" * 60)
         
         # CONVERTIR A INTEGER
         id_estado_cita = int(id_estado_cita)
-        app.logger.info(f"🔄 id_estado_cita convertido a: {id_estado_cita} (tipo: {type(id_estado_cita)})")
-
-        # Verificar cupos disponibles
-        cupos = self.verificarCuposDisponibles(id_agenda_detalle)
-        
-        if cupos <= 0:
-            app.logger.warning(f"⚠️ Sin cupos en agenda_detalle {id_agenda_detalle}")
-            return "SIN_CUPOS"
 
+        # Si el estado no ocupa cupo se resta 0, pero igual se exige cupo disponible
+        resta = 1 if self.ocupaCupo(id_estado_cita) else 0
         sql = """
+        WITH cupo AS (
+            UPDATE agenda_detalle ad
+            SET cupos_disponibles = ad.cupos_disponibles - %(resta)s,
+                estado_detalle = CASE
+                    WHEN ad.cupos_disponibles - %(resta)s = 0 THEN 'Agotado'
+                    ELSE ad.estado_detalle
+                END
+            WHERE ad.id_agenda_detalle = %(id_agenda_detalle)s
+              AND ad.cupos_disponibles > 0
+            RETURNING ad.id_agenda_detalle
+        )
         INSERT INTO cita_detalle(
             id_cita_cabecera, id_agenda_detalle, fecha_cita, hora_cita,
             motivo_consulta, id_estado_cita
-        ) VALUES (%s, %s, %s, %s, %s, %s)
+        )
+        SELECT %(id_cita_cabecera)s, cupo.id_agenda_detalle, %(fecha_cita)s, %(hora_cita)s,
+               %(motivo_consulta)s, %(id_estado_cita)s
+        FROM cupo
         RETURNING id_cita_detalle
         """
         conexion = Conexion()
         con = conexion.getConexion()
         cur = con.cursor()
         try:
-            app.logger.info(f"💾 Insertando registro en cita_detalle...")
-            
-            cur.execute(sql, (id_cita_cabecera, id_agenda_detalle, fecha_cita, 
-                            hora_cita, motivo_consulta, id_estado_cita))
-            new_id = cur.fetchone()[0]
-            
-            app.logger.info(f"✅ Cita detalle insertada con ID: {new_id}")
-            
-            # Si el estado ocupa cupo, restar
-            estados_ocupan = self.getEstadosQueOcupanCupo()
-            
-            app.logger.info(f"🔍 Estados que ocupan cupo: {estados_ocupan}")
-            app.logger.info(f"🔍 Estado seleccionado: {id_estado_cita}")
-            app.logger.info(f"🔍 ¿Estado {id_estado_cita} está en {estados_ocupan}?: {id_estado_cita in estados_ocupan}")
-            
-            if id_estado_cita in estados_ocupan:
-                app.logger.info(f"✅ Estado OCUPA CUPO - Procediendo a restar...")
-                resultado = self.restarCupoAgendaDetalle(id_agenda_detalle)
-                app.logger.info(f"✅ Resultado de restar cupo: {resultado}")
-            else:
-                app.logger.info(f"⚠️ Estado NO ocupa cupo - No se resta")
+            app.logger.info(f"💾 Reservando cupo e insertando registro en cita_detalle...")
             
+            cur.execute(sql, {
+                'id_cita_cabecera': id_cita_cabecera,
+                'id_agenda_detalle': id_agenda_detalle,
+                'fecha_cita': fecha_cita,
+                'hora_cita': hora_cita,
+                'motivo_consulta': motivo_consulta,
+                'id_estado_cita': id_estado_cita,
+                'resta': resta
+            })
+            row = cur.fetchone()
+
+            if not row:
+                app.logger.warning(f"⚠️ Sin cupos en agenda_detalle {id_agenda_detalle}")
+                con.rollback()
+                return "SIN_CUPOS"
+
+            new_id = row[0]
             con.commit()
             app.logger.info(f"✅ COMMIT EXITOSO - Detalle de cita creado con ID: {new_id}")
             app.logger.info(f"=" * 60)
@@ -544,6 +761,180 @@ class CitaDao:
             cur.close()
             con.close()
 
+    def guardarCitaDetallesLote(self, id_cita_cabecera, detalles, todo_o_nada=True):
+        """
+        Crea varios detalles de una cabecera en una sola sentencia y una sola transacción
+        (ej. las sesiones de un plan de tratamiento).
+        detalles: lista de dicts {id_agenda_detalle, fecha_cita, hora_cita, motivo_consulta, id_estado_cita}
+        todo_o_nada=True: si algún detalle no se puede crear no se crea ninguno.
+        Retorna una lista por detalle (en el mismo orden), o None si hubo un error:
+            {'indice', 'resultado', 'id_cita_detalle'}
+        resultado: 'creada', 'sin_cupos', 'no_existe', 'invalida' o 'no_procesada'
+        (válida, pero no se creó porque otro detalle del lote falló en modo todo o nada)
+
+        Las filas de agenda_detalle se bloquean en orden de ID (sin deadlocks entre lotes
+        concurrentes) y los cupos se descuentan agrupados: un turno pedido varias veces
+        se actualiza una sola vez.
+        """
+        resultados = []
+        filas = []
+        for i, d in enumerate(detalles):
+            try:
+                filas.append({
+                    'indice': i,
+                    'id_agenda_detalle': int(d['id_agenda_detalle']),
+                    'fecha_cita': str(d['fecha_cita']),
+                    'hora_cita': str(d['hora_cita']),
+                    'motivo_consulta': d['motivo_consulta'],
+                    'id_estado_cita': int(d['id_estado_cita'])
+                })
+                resultados.append({'indice': i, 'resultado': None, 'id_cita_detalle': None})
+            except (KeyError, TypeError, ValueError):
+                resultados.append({'indice': i, 'resultado': 'invalida', 'id_cita_detalle': None})
+
+        if todo_o_nada and len(filas) < len(detalles):
+            for r in resultados:
+                r['resultado'] = r['resultado'] or 'no_procesada'
+            return resultados
+        if not filas:
+            return resultados
+
+        # Igual que guardarCitaDetalle: todo detalle exige cupo disponible, pero solo
+        # los estados que ocupan cupo lo descuentan (acumulado por turno, en el orden pedido)
+        sql = """
+        WITH pedidos AS (
+            SELECT *
+            FROM json_to_recordset(%(filas)s::json) AS p(
+                indice INT, id_agenda_detalle INT, fecha_cita DATE, hora_cita TIME,
+                motivo_consulta TEXT, id_estado_cita INT
+            )
+        ),
+        cupos AS (
+            SELECT ad.id_agenda_detalle, ad.cupos_disponibles
+            FROM agenda_detalle ad
+            WHERE ad.id_agenda_detalle IN (SELECT id_agenda_detalle FROM pedidos)
+            ORDER BY ad.id_agenda_detalle
+            FOR UPDATE
+        ),
+        evaluados AS (
+            SELECT
+                p.*,
+                p.id_estado_cita = ANY(%(ocupan)s::int[]) AS ocupa,
+                CASE
+                    WHEN c.id_agenda_detalle IS NULL THEN 'no_existe'
+                    WHEN c.cupos_disponibles <= 0 THEN 'sin_cupos'
+                    WHEN p.id_estado_cita = ANY(%(ocupan)s::int[])
+                         AND SUM(CASE WHEN p.id_estado_cita = ANY(%(ocupan)s::int[]) THEN 1 ELSE 0 END)
+                             OVER (PARTITION BY p.id_agenda_detalle ORDER BY p.indice) > c.cupos_disponibles
+                        THEN 'sin_cupos'
+                    ELSE 'creada'
+                END AS resultado
+            FROM pedidos p
+            LEFT JOIN cupos c ON c.id_agenda_detalle = p.id_agenda_detalle
+        ),
+        decididos AS (
+            SELECT
+                e.*,
+                CASE
+                    WHEN e.resultado = 'creada' AND %(todo_o_nada)s
+                         AND EXISTS (SELECT 1 FROM evaluados x WHERE x.resultado <> 'creada')
+                        THEN 'no_procesada'
+                    ELSE e.resultado
+                END AS final
+            FROM evaluados e
+        ),
+        insertados AS (
+            INSERT INTO cita_detalle(
+                id_cita_cabecera, id_agenda_detalle, fecha_cita, hora_cita,
+                motivo_consulta, id_estado_cita
+            )
+            SELECT %(id_cita_cabecera)s, d.id_agenda_detalle, d.fecha_cita, d.hora_cita,
+                   d.motivo_consulta, d.id_estado_cita
+            FROM decididos d
+            WHERE d.final = 'creada'
+            ORDER BY d.indice
+            RETURNING id_cita_detalle, id_agenda_detalle, fecha_cita, hora_cita, motivo_consulta, id_estado_cita
+        ),
+        descontados AS (
+            UPDATE agenda_detalle ad
+            SET cupos_disponibles = ad.cupos_disponibles - x.cantidad,
+                estado_detalle = CASE
+                    WHEN ad.cupos_disponibles - x.cantidad = 0 THEN 'Agotado'
+                    ELSE ad.estado_detalle
+                END
+            FROM (
+                SELECT id_agenda_detalle, COUNT(*) AS cantidad
+                FROM decididos
+                WHERE final = 'creada' AND ocupa
+                GROUP BY id_agenda_detalle
+            ) x
+            WHERE ad.id_agenda_detalle = x.id_agenda_detalle
+            RETURNING ad.id_agenda_detalle
+        ),
+        -- RETURNING no trae el índice: se empareja por contenido (y orden entre iguales)
+        creados AS (
+            SELECT i.id_cita_detalle,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY i.id_agenda_detalle, i.fecha_cita, i.hora_cita, i.motivo_consulta, i.id_estado_cita
+                       ORDER BY i.id_cita_detalle
+                   ) AS n,
+                   i.id_agenda_detalle, i.fecha_cita, i.hora_cita, i.motivo_consulta, i.id_estado_cita
+            FROM insertados i
+        ),
+        pedidos_creados AS (
+            SELECT d.indice,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY d.id_agenda_detalle, d.fecha_cita, d.hora_cita, d.motivo_consulta, d.id_estado_cita
+                       ORDER BY d.indice
+                   ) AS n,
+                   d.id_agenda_detalle, d.fecha_cita, d.hora_cita, d.motivo_consulta, d.id_estado_cita
+            FROM decididos d
+            WHERE d.final = 'creada'
+        )
+        SELECT d.indice, d.final, c.id_cita_detalle
+        FROM decididos d
+        LEFT JOIN pedidos_creados pc ON pc.indice = d.indice
+        LEFT JOIN creados c
+               ON c.n = pc.n
+              AND c.id_agenda_detalle = pc.id_agenda_detalle
+              AND c.fecha_cita = pc.fecha_cita
+              AND c.hora_cita = pc.hora_cita
+              AND c.motivo_consulta IS NOT DISTINCT FROM pc.motivo_consulta
+              AND c.id_estado_cita = pc.id_estado_cita
+        ORDER BY d.indice
+        """
+        ocupan = sorted(self.getEstadosQueOcupanCupo())
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {
+                'filas': json.dumps(filas),
+                'ocupan': ocupan,
+                'todo_o_nada': todo_o_nada,
+                'id_cita_cabecera': id_cita_cabecera
+            })
+            por_indice = {indice: (final, id_detalle) for indice, final, id_detalle in cur.fetchall()}
+
+            for r in resultados:
+                if r['indice'] in por_indice:
+                    r['resultado'], r['id_cita_detalle'] = por_indice[r['indice']]
+
+            creados = [r for r in resultados if r['resultado'] == 'creada']
+            if todo_o_nada and len(creados) < len(resultados):
+                con.rollback()
+            else:
+                con.commit()
+            app.logger.info(f"✅ Lote de cita {id_cita_cabecera}: {len(creados)} de {len(resultados)} detalles creados")
+            return resultados
+        except Exception as e:
+            app.logger.error(f"❌ Error al guardar lote de detalles: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     def updateCitaDetalle(self, id_cita_detalle, id_agenda_detalle, fecha_cita,
                          hora_cita, motivo_consulta, id_estado_cita):
         """
@@ -573,11 +964,9 @@ class CitaDao:
         app.logger.info(f"   • id_agenda_detalle: {id_agenda_detalle}")
         app.logger.info(f"   • id_estado_cita: {id_estado_cita}")
         
-        estados_ocupan = self.getEstadosQueOcupanCupo()
-        
         # Determinar si los estados ocupan cupo
-        estado_anterior_ocupa = estado_anterior in estados_ocupan
-        estado_nuevo_ocupa = id_estado_cita in estados_ocupan
+        estado_anterior_ocupa = self.ocupaCupo(estado_anterior)
+        estado_nuevo_ocupa = self.ocupaCupo(id_estado_cita)
         
         app.logger.info(f"🔍 Estado anterior ocupa cupo?: {estado_anterior_ocupa}")
         app.logger.info(f"🔍 Estado nuevo ocupa cupo?: {estado_nuevo_ocupa}")
@@ -613,30 +1002,39 @@ class CitaDao:
             
             # ========== LÓGICA DE CUPOS ==========
             
+            filas = cur.rowcount
+
             if cambio_agenda:
                 app.logger.info(f"🔄 CAMBIO DE AGENDA DETECTADO")
                 # Cambió de agenda_detalle
-                if estado_anterior_ocupa:
-                    app.logger.info(f"➕ Sumando cupo a agenda anterior {id_agenda_anterior}")
-                    self.sumarCupoAgendaDetalle(id_agenda_anterior)
                 if estado_nuevo_ocupa:
                     app.logger.info(f"➖ Restando cupo de agenda nueva {id_agenda_detalle}")
-                    self.restarCupoAgendaDetalle(id_agenda_detalle)
+                    if not self.restarCupoAgendaDetalle(id_agenda_detalle):
+                        con.rollback()
+                        return "SIN_CUPOS"
+                if estado_anterior_ocupa:
+                    app.logger.info(f"➕ Sumando cupo a agenda anterior {id_agenda_anterior}")
+                    if not self.sumarCupoAgendaDetalle(id_agenda_anterior):
+                        con.rollback()
+                        return False
             else:
                 app.logger.info(f"🔄 MISMA AGENDA - EVALUANDO CAMBIO DE ESTADO")
                 # Misma agenda, cambió estado
                 if estado_anterior_ocupa and not estado_nuevo_ocupa:
                     # Ocupado → Libre (ej: Confirmado → Cancelado)
                     app.logger.info(f"➕ Ocupado → Libre: Sumando cupo a agenda {id_agenda_anterior}")
-                    self.sumarCupoAgendaDetalle(id_agenda_anterior)
+                    if not self.sumarCupoAgendaDetalle(id_agenda_anterior):
+                        con.rollback()
+                        return False
                 elif not estado_anterior_ocupa and estado_nuevo_ocupa:
                     # Libre → Ocupado (ej: Cancelado → Confirmado)
                     app.logger.info(f"➖ Libre → Ocupado: Restando cupo de agenda {id_agenda_detalle}")
-                    self.restarCupoAgendaDetalle(id_agenda_detalle)
+                    if not self.restarCupoAgendaDetalle(id_agenda_detalle):
+                        con.rollback()
+                        return "SIN_CUPOS"
                 else:
                     app.logger.info(f"⚪ Sin cambios en cupos (ambos ocupan o ambos no ocupan)")
-            
-            filas = cur.rowcount
+
             con.commit()
             app.logger.info(f"✅ COMMIT EXITOSO - Cita actualizada")
             app.logger.info(f"=" * 60)
@@ -670,14 +1068,16 @@ class CitaDao:
         cur = con.cursor()
         try:
             # Si ocupaba cupo, devolverlo
-            estados_ocupan = self.getEstadosQueOcupanCupo()
+            ocupaba_cupo = self.ocupaCupo(detalle['id_estado_cita'])
             
             app.logger.info(f"🔍 Estado de la cita: {detalle['id_estado_cita']}")
-            app.logger.info(f"🔍 ¿Ocupaba cupo?: {detalle['id_estado_cita'] in estados_ocupan}")
+            app.logger.info(f"🔍 ¿Ocupaba cupo?: {ocupaba_cupo}")
             
-            if detalle['id_estado_cita'] in estados_ocupan:
+            if ocupaba_cupo:
                 app.logger.info(f"➕ Devolviendo cupo a agenda {detalle['id_agenda_detalle']}")
-                self.sumarCupoAgendaDetalle(detalle['id_agenda_detalle'])
+                if not self.sumarCupoAgendaDetalle(detalle['id_agenda_detalle']):
+                    con.rollback()
+                    return False
             
             cur.execute( sql, (id_cita_detalle,))
             filas = cur.rowcount
@@ -0,0 +1,258 @@
+import uuid
+from flask import current_app as app
+from app.conexion.Conexion import Conexion
+from app.dao.referenciales_agendamiento.cita.CitaDao import CitaDao
+
+
+class ReservaCupoDao:
+    """
+    Reservas temporales de cupo (holds) con vencimiento.
+    Mientras la reserva está activa el cupo ya está descontado de agenda_detalle.
+    """
+
+    # Clave de pg_try_advisory_xact_lock: un solo barrido de vencidas a la vez
+    LOCK_BARREDOR_RESERVAS = 7015
+
+    # Marca vencidas las reservas activas (en lotes, sin esperar filas tomadas por
+    # otro barrido) y retorna la cantidad por agenda_detalle
+    SQL_MARCAR_VENCIDAS = """
+    WITH vencidas AS (
+        SELECT id_reserva
+        FROM reserva_cupo
+        WHERE estado = 'Activa'
+          AND expira_en <= NOW()
+          AND (%(id_agenda_detalle)s::int IS NULL OR id_agenda_detalle = %(id_agenda_detalle)s::int)
+        ORDER BY expira_en
+        LIMIT %(limite)s
+        FOR UPDATE SKIP LOCKED
+    ),
+    marcadas AS (
+        UPDATE reserva_cupo r
+        SET estado = 'Vencida', cerrada_en = NOW()
+        FROM vencidas v
+        WHERE r.id_reserva = v.id_reserva
+        RETURNING r.id_agenda_detalle
+    )
+    SELECT id_agenda_detalle, COUNT(*)
+    FROM marcadas
+    GROUP BY id_agenda_detalle
+    ORDER BY id_agenda_detalle
+    """
+
+    # Bloquea los turnos en orden de ID, igual que la carga de citas en lote y la
+    # reconciliación, para que dos sentencias no se esperen en orden cruzado
+    SQL_BLOQUEAR_TURNOS = """
+    SELECT id_agenda_detalle
+    FROM agenda_detalle
+    WHERE id_agenda_detalle = ANY(%s)
+    ORDER BY id_agenda_detalle
+    FOR UPDATE
+    """
+
+    # Devuelve los cupos de las reservas vencidas (ya bloqueados los turnos)
+    SQL_DEVOLVER_CUPOS = """
+    UPDATE agenda_detalle ad
+    SET cupos_disponibles = LEAST(ad.cupos_disponibles + l.cantidad, COALESCE(ad.cupos_maximos, ad.cupos_disponibles + l.cantidad)),
+        estado_detalle = CASE WHEN ad.estado_detalle = 'Agotado' THEN 'Disponible' ELSE ad.estado_detalle END
+    FROM unnest(%s::int[], %s::int[]) AS l(id_agenda_detalle, cantidad)
+    WHERE ad.id_agenda_detalle = l.id_agenda_detalle
+    """
+
+    # Devuelve un cupo a agenda_detalle (reserva liberada o confirmada con un estado que no ocupa cupo)
+    SQL_DEVOLVER_CUPO = """
+    UPDATE agenda_detalle
+    SET cupos_disponibles = LEAST(cupos_disponibles + 1, COALESCE(cupos_maximos, cupos_disponibles + 1)),
+        estado_detalle = CASE WHEN estado_detalle = 'Agotado' THEN 'Disponible' ELSE estado_detalle END
+    WHERE id_agenda_detalle = %s
+    """
+
+    def crearReserva(self, id_agenda_detalle, segundos):
+        """
+        Descuenta un cupo y crea la reserva en una sola sentencia.
+        Antes libera las reservas vencidas de ese mismo detalle (sin esperar al barrido),
+        en una transacción aparte que se confirma aunque no se consiga el cupo.
+        Retorna {'token', 'id_agenda_detalle', 'expira_en'}, "SIN_CUPOS" o None si hubo error.
+        """
+        sql = """
+        WITH cupo AS (
+            UPDATE agenda_detalle
+            SET cupos_disponibles = cupos_disponibles - 1,
+                estado_detalle = CASE
+                    WHEN cupos_disponibles - 1 = 0 THEN 'Agotado'
+                    ELSE estado_detalle
+                END
+            WHERE id_agenda_detalle = %(id_agenda_detalle)s
+              AND cupos_disponibles > 0
+            RETURNING id_agenda_detalle
+        )
+        INSERT INTO reserva_cupo(token, id_agenda_detalle, expira_en)
+        SELECT %(token)s::uuid, cupo.id_agenda_detalle, NOW() + make_interval(secs => %(segundos)s)
+        FROM cupo
+        RETURNING expira_en
+        """
+        token = str(uuid.uuid4())
+        self._liberarVencidasAparte(id_agenda_detalle, 100)
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {'id_agenda_detalle': id_agenda_detalle, 'token': token, 'segundos': segundos})
+            row = cur.fetchone()
+            if not row:
+                con.rollback()
+                app.logger.warning(f"⚠️ Sin cupos para reservar en agenda_detalle {id_agenda_detalle}")
+                return "SIN_CUPOS"
+            con.commit()
+            app.logger.info(f"🔒 Reserva de cupo {token} en agenda_detalle {id_agenda_detalle} hasta {row[0]}")
+            return {'token': token, 'id_agenda_detalle': id_agenda_detalle, 'expira_en': row[0]}
+        except Exception as e:
+            app.logger.error(f"❌ Error al crear reserva de cupo: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def confirmarReserva(self, token, id_cita_cabecera, fecha_cita, hora_cita, motivo_consulta, id_estado_cita):
+        """
+        Convierte una reserva activa y no vencida en cita_detalle (el cupo ya estaba descontado).
+        Si el estado de la cita no ocupa cupo, el cupo se devuelve en la misma transacción.
+        Retorna el id_cita_detalle, "VENCIDA" si la reserva no existe, venció o ya se cerró,
+        o None si hubo error.
+        """
+        sql = """
+        WITH reserva AS (
+            UPDATE reserva_cupo
+            SET estado = 'Confirmada', cerrada_en = NOW()
+            WHERE token = %(token)s::uuid
+              AND estado = 'Activa'
+              AND expira_en > NOW()
+            RETURNING id_agenda_detalle
+        )
+        INSERT INTO cita_detalle(
+            id_cita_cabecera, id_agenda_detalle, fecha_cita, hora_cita,
+            motivo_consulta, id_estado_cita
+        )
+        SELECT %(id_cita_cabecera)s, reserva.id_agenda_detalle, %(fecha_cita)s, %(hora_cita)s,
+               %(motivo_consulta)s, %(id_estado_cita)s
+        FROM reserva
+        RETURNING id_cita_detalle, id_agenda_detalle
+        """
+        ocupa_cupo = CitaDao().ocupaCupo(id_estado_cita)
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, {
+                'token': str(token),
+                'id_cita_cabecera': id_cita_cabecera,
+                'fecha_cita': fecha_cita,
+                'hora_cita': hora_cita,
+                'motivo_consulta': motivo_consulta,
+                'id_estado_cita': int(id_estado_cita)
+            })
+            row = cur.fetchone()
+            if not row:
+                con.rollback()
+                app.logger.warning(f"⚠️ Reserva {token} vencida, inexistente o ya cerrada")
+                return "VENCIDA"
+
+            id_cita_detalle, id_agenda_detalle = row
+            if not ocupa_cupo:
+                cur.execute(self.SQL_DEVOLVER_CUPO, (id_agenda_detalle,))
+            con.commit()
+            app.logger.info(f"✅ Reserva {token} confirmada como cita_detalle {id_cita_detalle}")
+            return id_cita_detalle
+        except Exception as e:
+            app.logger.error(f"❌ Error al confirmar reserva de cupo: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def liberarReserva(self, token):
+        """Libera una reserva activa y devuelve su cupo. Retorna True si había una reserva activa."""
+        sql = """
+        UPDATE reserva_cupo
+        SET estado = 'Liberada', cerrada_en = NOW()
+        WHERE token = %s::uuid AND estado = 'Activa'
+        RETURNING id_agenda_detalle
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (str(token),))
+            row = cur.fetchone()
+            if not row:
+                con.rollback()
+                return False
+            cur.execute(self.SQL_DEVOLVER_CUPO, (row[0],))
+            con.commit()
+            app.logger.info(f"🔓 Reserva {token} liberada")
+            return True
+        except Exception as e:
+            app.logger.error(f"❌ Error al liberar reserva de cupo: {str(e)}")
+            con.rollback()
+            return False
+        finally:
+            cur.close()
+            con.close()
+
+    def _liberarVencidas(self, cur, id_agenda_detalle, limite):
+        """Marca vencidas las reservas de un lote y devuelve sus cupos. Retorna la cantidad liberada."""
+        cur.execute(self.SQL_MARCAR_VENCIDAS, {'id_agenda_detalle': id_agenda_detalle, 'limite': limite})
+        liberar = cur.fetchall()
+        if not liberar:
+            return 0
+        ids = [r[0] for r in liberar]
+        cur.execute(self.SQL_BLOQUEAR_TURNOS, (ids,))
+        cur.execute(self.SQL_DEVOLVER_CUPOS, (ids, [int(r[1]) for r in liberar]))
+        return sum(int(r[1]) for r in liberar)
+
+    def _liberarVencidasAparte(self, id_agenda_detalle, limite):
+        """
+        Libera las reservas vencidas de un turno en una conexión propia del pool, fuera
+        de la unidad de trabajo del request: queda confirmada aunque el request se
+        deshaga (ej. la respuesta 409 por falta de cupos). Retorna la cantidad liberada.
+        """
+        con = Conexion.getPool().getconn()
+        cur = con.cursor()
+        try:
+            liberadas = self._liberarVencidas(cur, id_agenda_detalle, limite)
+            con.commit()
+            return liberadas
+        except Exception as e:
+            app.logger.error(f"❌ Error al liberar reservas vencidas de agenda_detalle {id_agenda_detalle}: {str(e)}")
+            con.rollback()
+            return 0
+        finally:
+            cur.close()
+            con.close()
+
+    def barrerReservasVencidas(self, limite=500):
+        """
+        Libera un lote de reservas vencidas. Retorna la cantidad liberada (0 si hubo
+        error o si otro proceso está barriendo en este momento).
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (self.LOCK_BARREDOR_RESERVAS,))
+            if not cur.fetchone()[0]:
+                con.rollback()
+                return 0
+            liberadas = self._liberarVencidas(cur, None, limite)
+            con.commit()
+            if liberadas:
+                app.logger.info(f"🧹 Reservas de cupo vencidas liberadas: {liberadas}")
+            return liberadas
+        except Exception as e:
+            app.logger.error(f"❌ Error al barrer reservas vencidas: {str(e)}")
+            con.rollback()
+            return 0
+        finally:
+            cur.close()
+            con.close()
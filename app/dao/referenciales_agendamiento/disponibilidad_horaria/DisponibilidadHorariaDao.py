@@ -1,4 +1,6 @@
+import json
 from flask import current_app as app
+from psycopg2 import errors
 from app.conexion.Conexion import Conexion
 
 class DisponibilidadDao:
@@ -86,14 +88,14 @@ class DisponibilidadDao:
             con.close()
 
     def existeDisponibilidad(self, id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin, excluir_id=None):
+        """Indica si el médico ya tiene una disponibilidad que se solapa con ese horario"""
         sql = """
         SELECT id_disponibilidad
         FROM disponibilidad_horaria
         WHERE id_medico = %s
-          AND dispo_fecha = %s
-          AND NOT (dispo_hora_fin <= %s OR dispo_hora_inicio >= %s)
+          AND rango && tsrange(%s::date + %s::time, %s::date + %s::time, '[)')
         """
-        params = [id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin]
+        params = [id_medico, dispo_fecha, dispo_hora_inicio, dispo_fecha, dispo_hora_fin]
         if excluir_id:
             sql += " AND id_disponibilidad != %s"
             params.append(excluir_id)
@@ -112,10 +114,10 @@ class DisponibilidadDao:
             con.close()
 
     def guardarDisponibilidad(self, id_medico, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos):
-        if self.existeDisponibilidad(id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin):
-            app.logger.warning("Disponibilidad duplicada detectada")
-            return False
-
+        """
+        Inserta una disponibilidad. El solapamiento lo rechaza la restricción
+        excl_disponibilidad_solapada en la misma sentencia (retorna False).
+        """
         sql = """
         INSERT INTO disponibilidad_horaria(
             id_medico, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos
@@ -130,6 +132,10 @@ class DisponibilidadDao:
             new_id = cur.fetchone()[0]
             con.commit()
             return new_id
+        except errors.ExclusionViolation:
+            app.logger.warning("Disponibilidad duplicada detectada")
+            con.rollback()
+            return False
         except Exception as e:
             app.logger.error(f"Error al insertar disponibilidad: {str(e)}")
             con.rollback()
@@ -139,10 +145,7 @@ class DisponibilidadDao:
             con.close()
 
     def updateDisponibilidad(self, id_disponibilidad, id_medico, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos):
-        if self.existeDisponibilidad(id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin, excluir_id=id_disponibilidad):
-            app.logger.warning("Disponibilidad duplicada detectada en update")
-            return False
-
+        """Actualiza una disponibilidad; retorna False si se solaparía con otra del médico"""
         sql = """
         UPDATE disponibilidad_horaria
         SET id_medico=%s, id_dia=%s, id_turno=%s,
@@ -157,6 +160,10 @@ class DisponibilidadDao:
             filas = cur.rowcount
             con.commit()
             return filas > 0
+        except errors.ExclusionViolation:
+            app.logger.warning("Disponibilidad duplicada detectada en update")
+            con.rollback()
+            return False
         except Exception as e:
             app.logger.error(f"Error al actualizar disponibilidad: {str(e)}")
             con.rollback()
@@ -165,6 +172,146 @@ class DisponibilidadDao:
             cur.close()
             con.close()
 
+    # Solapamientos de un lote propuesto contra la base y dentro del mismo lote, en una consulta
+    SQL_VALIDAR_LOTE = """
+    WITH propuestas AS (
+        SELECT p.indice, p.id_disponibilidad, p.id_medico,
+               tsrange(p.dispo_fecha + p.dispo_hora_inicio, p.dispo_fecha + p.dispo_hora_fin, '[)') AS rango
+        FROM json_to_recordset(%s::json) AS p(
+            indice INT, id_disponibilidad INT, id_medico INT,
+            dispo_fecha DATE, dispo_hora_inicio TIME, dispo_hora_fin TIME
+        )
+    )
+    SELECT
+        p.indice,
+        COALESCE((
+            SELECT array_agg(dh.id_disponibilidad ORDER BY dh.id_disponibilidad)
+            FROM disponibilidad_horaria dh
+            WHERE dh.id_medico = p.id_medico
+              AND dh.rango && p.rango
+              AND dh.id_disponibilidad IS DISTINCT FROM p.id_disponibilidad
+        ), '{}'),
+        COALESCE((
+            SELECT array_agg(o.indice ORDER BY o.indice)
+            FROM propuestas o
+            WHERE o.indice <> p.indice
+              AND o.id_medico = p.id_medico
+              AND o.rango && p.rango
+        ), '{}')
+    FROM propuestas p
+    ORDER BY p.indice
+    """
+
+    def _propuestas_json(self, propuestas):
+        return json.dumps([
+            {
+                'indice': i,
+                'id_disponibilidad': p.get('id_disponibilidad'),
+                'id_medico': p['id_medico'],
+                'dispo_fecha': str(p['dispo_fecha']),
+                'dispo_hora_inicio': str(p['dispo_hora_inicio']),
+                'dispo_hora_fin': str(p['dispo_hora_fin'])
+            } for i, p in enumerate(propuestas)
+        ])
+
+    def _leer_conflictos(self, rows):
+        return [
+            {
+                'indice': indice,
+                'valida': not existentes and not en_lote,
+                'solapa_con_existentes': list(existentes),
+                'solapa_con_lote': list(en_lote)
+            } for indice, existentes, en_lote in rows
+        ]
+
+    def validarDisponibilidades(self, propuestas):
+        """
+        Valida un lote de disponibilidades propuestas en una sola consulta.
+        propuestas: lista de dicts {id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin,
+                    id_disponibilidad (opcional, para ignorar el propio registro al editar)}
+        Retorna una lista por propuesta (en el mismo orden) con los IDs existentes y
+        los índices del lote con los que se solapa, o None si hubo error.
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(self.SQL_VALIDAR_LOTE, (self._propuestas_json(propuestas),))
+            return self._leer_conflictos(cur.fetchall())
+        except Exception as e:
+            app.logger.error(f"Error al validar disponibilidades: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def guardarDisponibilidadesLote(self, propuestas):
+        """
+        Valida e inserta un lote completo en una transacción (todo o nada).
+        propuestas: dicts con id_medico, id_dia, id_turno, dispo_fecha,
+                    dispo_hora_inicio, dispo_hora_fin, dispo_cupos
+        Retorna {'ids': [...], 'conflictos': []} si se insertó todo (ids en el orden
+        del lote), {'ids': [], 'conflictos': [...]} si hubo solapamientos, o None si hubo error.
+        """
+        sql_insertar = """
+        INSERT INTO disponibilidad_horaria(
+            id_medico, id_dia, id_turno, dispo_hora_inicio, dispo_hora_fin, dispo_fecha, dispo_cupos
+        )
+        SELECT p.id_medico, p.id_dia, p.id_turno, p.dispo_hora_inicio, p.dispo_hora_fin, p.dispo_fecha, p.dispo_cupos
+        FROM json_to_recordset(%s::json) AS p(
+            indice INT, id_medico INT, id_dia INT, id_turno INT,
+            dispo_fecha DATE, dispo_hora_inicio TIME, dispo_hora_fin TIME, dispo_cupos INT
+        )
+        ORDER BY p.indice
+        RETURNING id_disponibilidad, id_medico, dispo_fecha, dispo_hora_inicio
+        """
+        filas = json.dumps([
+            {
+                'indice': i,
+                'id_medico': p['id_medico'],
+                'id_dia': p['id_dia'],
+                'id_turno': p['id_turno'],
+                'dispo_fecha': str(p['dispo_fecha']),
+                'dispo_hora_inicio': str(p['dispo_hora_inicio']),
+                'dispo_hora_fin': str(p['dispo_hora_fin']),
+                'dispo_cupos': p['dispo_cupos']
+            } for i, p in enumerate(propuestas)
+        ])
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(self.SQL_VALIDAR_LOTE, (self._propuestas_json(propuestas),))
+            reporte = self._leer_conflictos(cur.fetchall())
+            conflictos = [r for r in reporte if not r['valida']]
+            if conflictos:
+                con.rollback()
+                return {'ids': [], 'conflictos': conflictos}
+
+            cur.execute(sql_insertar, (filas,))
+            # Sin solapamientos, (médico, fecha, hora_inicio) identifica cada fila del lote
+            creados = {(r[1], str(r[2]), str(r[3])): r[0] for r in cur.fetchall()}
+            con.commit()
+            ids = [
+                creados[(int(p['id_medico']), str(p['dispo_fecha']), str(p['dispo_hora_inicio']))]
+                for p in propuestas
+            ]
+            app.logger.info(f"Lote de disponibilidades insertado: {len(ids)} filas")
+            return {'ids': ids, 'conflictos': []}
+        except errors.ExclusionViolation:
+            # Otra transacción insertó un horario solapado entre la validación y el INSERT
+            app.logger.warning("Solapamiento concurrente al insertar lote de disponibilidades")
+            con.rollback()
+            return {'ids': [], 'conflictos': [{'indice': None, 'valida': False,
+                                               'solapa_con_existentes': [], 'solapa_con_lote': []}]}
+        except Exception as e:
+            app.logger.error(f"Error al insertar lote de disponibilidades: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
     def deleteDisponibilidad(self, id_disponibilidad):
         sql = "DELETE FROM disponibilidad_horaria WHERE id_disponibilidad=%s"
         conexion = Conexion()
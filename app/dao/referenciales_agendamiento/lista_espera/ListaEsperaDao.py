@@ -0,0 +1,271 @@
+from flask import current_app as app
+from psycopg2 import errors
+from app.conexion.Conexion import Conexion
+
+
+class ListaEsperaDao:
+    """
+    Lista de espera de pacientes por turno (agenda_detalle) o por especialidad + fecha.
+    La promoción es automática: el trigger trg_promover_lista_espera (sql/009) ofrece
+    cada cupo liberado al siguiente en espera reteniéndolo con una reserva_cupo.
+    Este DAO registra las entradas y resuelve las ofertas (aceptar / rechazar).
+    """
+
+    # Cierra una entrada y, si tenía una oferta activa, libera su reserva y devuelve
+    # el cupo (el trigger lo ofrece al siguiente en la misma transacción)
+    SQL_CERRAR = """
+    WITH entrada AS (
+        UPDATE lista_espera
+        SET estado = %(estado)s
+        WHERE id_lista_espera = %(id_lista_espera)s
+          AND estado = ANY(%(desde)s)
+        RETURNING token_reserva
+    ),
+    reserva AS (
+        UPDATE reserva_cupo r
+        SET estado = 'Liberada', cerrada_en = NOW()
+        FROM entrada e
+        WHERE r.token = e.token_reserva
+          AND r.estado = 'Activa'
+        RETURNING r.id_agenda_detalle
+    ),
+    devuelto AS (
+        UPDATE agenda_detalle ad
+        SET cupos_disponibles = LEAST(ad.cupos_disponibles + 1, COALESCE(ad.cupos_maximos, ad.cupos_disponibles + 1)),
+            estado_detalle = CASE WHEN ad.estado_detalle = 'Agotado' THEN 'Disponible' ELSE ad.estado_detalle END
+        FROM reserva r
+        WHERE ad.id_agenda_detalle = r.id_agenda_detalle
+        RETURNING ad.id_agenda_detalle
+    )
+    SELECT COUNT(*) FROM entrada
+    """
+
+    def agregarEspera(self, id_paciente, id_agenda_detalle=None, id_especialidad=None,
+                      fecha=None, id_medico=None, motivo_consulta=None):
+        """
+        Anota al paciente en la lista de espera. Si ya hay cupos libres que le sirven,
+        se ofrecen en el acto (por orden de llegada, así que puede tocarle a otro antes).
+        Retorna {'id_lista_espera', 'estado'}, "DUPLICADA" si ya espera ese turno,
+        o None si hubo error.
+        """
+        sql_insertar = """
+        INSERT INTO lista_espera(
+            id_paciente, id_agenda_detalle, id_especialidad, id_medico, fecha, motivo_consulta
+        ) VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING id_lista_espera
+        """
+        sql_ofrecer = """
+        SELECT ofrecer_cupos_lista_espera(ARRAY(
+            SELECT ad.id_agenda_detalle
+            FROM agenda_detalle ad
+            JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+            WHERE ad.cupos_disponibles > 0
+              AND (
+                  ad.id_agenda_detalle = %(id_agenda_detalle)s
+                  OR (%(id_agenda_detalle)s IS NULL
+                      AND ac.id_especialidad = %(id_especialidad)s
+                      AND ac.fecha_agenda = %(fecha)s
+                      AND (%(id_medico)s::int IS NULL OR ac.id_medico = %(id_medico)s::int))
+              )
+        ))
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql_insertar, (id_paciente, id_agenda_detalle, id_especialidad,
+                                       id_medico, fecha, motivo_consulta))
+            id_lista_espera = cur.fetchone()[0]
+            cur.execute(sql_ofrecer, {
+                'id_agenda_detalle': id_agenda_detalle,
+                'id_especialidad': id_especialidad,
+                'fecha': fecha,
+                'id_medico': id_medico
+            })
+            cur.execute("SELECT estado FROM lista_espera WHERE id_lista_espera = %s", (id_lista_espera,))
+            estado = cur.fetchone()[0]
+            con.commit()
+            app.logger.info(f"⏳ Paciente {id_paciente} en lista de espera (ID {id_lista_espera}, {estado})")
+            return {'id_lista_espera': id_lista_espera, 'estado': estado}
+        except errors.UniqueViolation:
+            con.rollback()
+            app.logger.warning(f"⚠️ El paciente {id_paciente} ya espera el turno {id_agenda_detalle}")
+            return "DUPLICADA"
+        except Exception as e:
+            app.logger.error(f"❌ Error al agregar a la lista de espera: {str(e)}")
+            con.rollback()
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def getListaEspera(self, estado=None, fecha=None, id_especialidad=None):
+        """
+        Entradas de la lista de espera con el turno ofrecido (si lo hay).
+        Los filtros usan las mismas columnas que los índices parciales de sql/009.
+        """
+        condiciones = []
+        params = []
+        if estado is not None:
+            condiciones.append("le.estado = %s")
+            params.append(estado)
+        if fecha is not None:
+            condiciones.append("COALESCE(le.fecha, ac.fecha_agenda) = %s")
+            params.append(fecha)
+        if id_especialidad is not None:
+            condiciones.append("COALESCE(le.id_especialidad, ac.id_especialidad) = %s")
+            params.append(id_especialidad)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        sql = f"""
+        SELECT
+            le.id_lista_espera,
+            le.id_paciente,
+            p.nombre || ' ' || p.apellido AS paciente,
+            le.id_agenda_detalle,
+            COALESCE(le.id_especialidad, ac.id_especialidad) AS id_especialidad,
+            le.id_medico,
+            COALESCE(le.fecha, ac.fecha_agenda) AS fecha,
+            le.motivo_consulta,
+            le.estado,
+            le.creada_en,
+            le.ofrecida_en,
+            r.id_agenda_detalle AS id_agenda_detalle_ofrecido,
+            r.expira_en AS oferta_expira_en,
+            le.id_cita_detalle
+        FROM lista_espera le
+        JOIN paciente p ON p.id_paciente = le.id_paciente
+        LEFT JOIN agenda_detalle ad ON ad.id_agenda_detalle = le.id_agenda_detalle
+        LEFT JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+        LEFT JOIN reserva_cupo r ON r.token = le.token_reserva
+        {where}
+        ORDER BY le.creada_en, le.id_lista_espera
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params))
+            return [
+                {
+                    'id_lista_espera': r[0],
+                    'id_paciente': r[1],
+                    'paciente': r[2],
+                    'id_agenda_detalle': r[3],
+                    'id_especialidad': r[4],
+                    'id_medico': r[5],
+                    'fecha': r[6].isoformat() if r[6] else None,
+                    'motivo_consulta': r[7],
+                    'estado': r[8],
+                    'creada_en': r[9].isoformat() if r[9] else None,
+                    'ofrecida_en': r[10].isoformat() if r[10] else None,
+                    'id_agenda_detalle_ofrecido': r[11],
+                    'oferta_expira_en': r[12].isoformat() if r[12] else None,
+                    'id_cita_detalle': r[13]
+                }
+                for r in cur.fetchall()
+            ]
+        except Exception as e:
+            app.logger.error(f"❌ Error al obtener la lista de espera: {str(e)}")
+            return []
+        finally:
+            cur.close()
+            con.close()
+
+    def getOferta(self, id_lista_espera):
+        """Datos de la oferta activa de una entrada (para convertirla en cita), o None"""
+        sql = """
+        SELECT
+            le.id_paciente,
+            le.token_reserva,
+            r.id_agenda_detalle,
+            ad.id_agenda_cabecera,
+            ac.fecha_agenda,
+            ad.hora_inicio,
+            le.motivo_consulta,
+            r.expira_en
+        FROM lista_espera le
+        JOIN reserva_cupo r ON r.token = le.token_reserva
+        JOIN agenda_detalle ad ON ad.id_agenda_detalle = r.id_agenda_detalle
+        JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+        WHERE le.id_lista_espera = %s
+          AND le.estado = 'Ofrecida'
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (id_lista_espera,))
+            r = cur.fetchone()
+            if not r:
+                return None
+            return {
+                'id_paciente': r[0],
+                'token': str(r[1]),
+                'id_agenda_detalle': r[2],
+                'id_agenda_cabecera': r[3],
+                'fecha_cita': r[4],
+                'hora_cita': r[5],
+                'motivo_consulta': r[6],
+                'expira_en': r[7]
+            }
+        except Exception as e:
+            app.logger.error(f"❌ Error al obtener la oferta {id_lista_espera}: {str(e)}")
+            return None
+        finally:
+            cur.close()
+            con.close()
+
+    def marcarAceptada(self, id_lista_espera, id_cita_detalle):
+        """Registra que la oferta se convirtió en cita"""
+        sql = """
+        UPDATE lista_espera
+        SET estado = 'Aceptada', id_cita_detalle = %s
+        WHERE id_lista_espera = %s AND estado = 'Ofrecida'
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, (id_cita_detalle, id_lista_espera))
+            filas = cur.rowcount
+            con.commit()
+            return filas > 0
+        except Exception as e:
+            app.logger.error(f"❌ Error al marcar aceptada la oferta {id_lista_espera}: {str(e)}")
+            con.rollback()
+            return False
+        finally:
+            cur.close()
+            con.close()
+
+    def _cerrar(self, id_lista_espera, estado, desde):
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(self.SQL_CERRAR, {
+                'id_lista_espera': id_lista_espera,
+                'estado': estado,
+                'desde': list(desde)
+            })
+            filas = cur.fetchone()[0]
+            con.commit()
+            if filas:
+                app.logger.info(f"⏳ Entrada {id_lista_espera} de la lista de espera: {estado}")
+            return filas > 0
+        except Exception as e:
+            app.logger.error(f"❌ Error al cerrar la entrada {id_lista_espera} de la lista de espera: {str(e)}")
+            con.rollback()
+            return False
+        finally:
+            cur.close()
+            con.close()
+
+    def rechazarOferta(self, id_lista_espera):
+        """El paciente no toma el cupo ofrecido: se libera y pasa al siguiente en espera"""
+        return self._cerrar(id_lista_espera, 'Rechazada', ('Ofrecida',))
+
+    def cancelarEspera(self, id_lista_espera):
+        """Saca al paciente de la lista (si tenía una oferta, el cupo pasa al siguiente)"""
+        return self._cerrar(id_lista_espera, 'Cancelada', ('Esperando', 'Ofrecida'))
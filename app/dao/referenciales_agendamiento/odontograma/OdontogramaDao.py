@@ -1,5 +1,6 @@
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.paginacion import normalizar_limite, clausulas_keyset, armar_pagina
 
 class OdontogramaDao:
     """
@@ -141,6 +142,76 @@ class OdontogramaDao:
             cur.close()
             con.close()
 
+    def getOdontogramasPagina(self, cursor=None, limite=None):
+        """
+        Página de odontogramas por cursor, mismo orden que getOdontogramas
+        (fecha_registro DESC, id_odontograma DESC)
+        """
+        limite = normalizar_limite(limite)
+        condicion, order_by, params, retrocede = clausulas_keyset(
+            ['o.fecha_registro', 'o.id_odontograma'], True, cursor
+        )
+        where = f"WHERE {condicion}" if condicion else ""
+
+        sql = f"""
+        SELECT 
+            o.id_odontograma,
+            o.id_paciente,
+            (p.nombre || ' ' || p.apellido) AS paciente_nombre,
+            p.cedula_entidad AS paciente_cedula,
+            EXTRACT(YEAR FROM AGE(p.fecha_nacimiento)) AS paciente_edad,
+            o.id_medico,
+            (m.nombre || ' ' || m.apellido) AS medico_nombre,
+            o.fecha_registro,
+            o.observaciones,
+            o.estado,
+            o.id_funcionario,
+            o.created_at,
+            o.updated_at
+        FROM odontograma o
+        JOIN paciente p ON o.id_paciente = p.id_paciente
+        JOIN medico m ON o.id_medico = m.id_medico
+        {where}
+        ORDER BY {order_by}
+        LIMIT %s
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params) + (limite + 1,))
+            rows, siguiente, anterior = armar_pagina(
+                cur.fetchall(), lambda r: (r[7], r[0]), limite, cursor, retrocede
+            )
+            return {
+                'data': [
+                    {
+                        'id_odontograma': r[0],
+                        'id_paciente': r[1],
+                        'paciente': r[2],
+                        'cedula': r[3],
+                        'edad': int(r[4]) if r[4] else 0,
+                        'id_medico': r[5],
+                        'medico': r[6],
+                        'fecha_registro': str(r[7]) if r[7] else None,
+                        'observaciones': r[8],
+                        'estado': r[9],
+                        'id_funcionario': r[10],
+                        'created_at': str(r[11]) if r[11] else None,
+                        'updated_at': str(r[12]) if r[12] else None
+                    } for r in rows
+                ],
+                'siguiente': siguiente,
+                'anterior': anterior,
+                'limite': limite
+            }
+        except Exception as e:
+            app.logger.error(f"Error al obtener página de odontogramas: {str(e)}")
+            return {'data': [], 'siguiente': None, 'anterior': None, 'limite': limite}
+        finally:
+            cur.close()
+            con.close()
+
     def getOdontogramaById(self, id_odontograma):
         """
         Obtiene un odontograma específico por ID
@@ -1,5 +1,6 @@
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.paginacion import normalizar_limite, clausulas_keyset, armar_pagina
 
 class PacienteDao:
 
@@ -45,6 +46,65 @@ class PacienteDao:
             cur.close()
             con.close()
 
+    # ==============================
+    #   Página de pacientes (keyset)
+    # ==============================
+    def getPacientesPagina(self, cursor=None, limite=None):
+        """
+        Página de pacientes ordenada por id_paciente (mismo orden que getPacientes).
+        Retorna {'data', 'siguiente', 'anterior', 'limite'}
+        """
+        limite = normalizar_limite(limite)
+        condicion, order_by, params, retrocede = clausulas_keyset(['p.id_paciente'], False, cursor)
+        where = f"WHERE {condicion}" if condicion else ""
+
+        sql = f"""
+            SELECT p.id_paciente, p.nombre, p.apellido,
+                   p.cedula_entidad, p.fecha_nacimiento, p.fecha_registro,
+                   p.telefono, p.direccion, p.correo,
+                   p.id_ciudad, c.descripcion AS ciudades
+            FROM paciente p
+            LEFT JOIN ciudades c ON p.id_ciudad = c.id_ciudad
+            {where}
+            ORDER BY {order_by}
+            LIMIT %s
+        """
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        try:
+            cur.execute(sql, tuple(params) + (limite + 1,))
+            rows, siguiente, anterior = armar_pagina(
+                cur.fetchall(), lambda p: (p[0],), limite, cursor, retrocede
+            )
+            return {
+                'data': [
+                    {
+                        "id_paciente": p[0],
+                        "nombre": p[1],
+                        "apellido": p[2],
+                        "cedula_entidad": p[3],
+                        "fecha_nacimiento": str(p[4]) if p[4] else None,
+                        "fecha_registro": str(p[5]) if p[5] else None,
+                        "telefono": p[6],
+                        "direccion": p[7],
+                        "correo": p[8],
+                        "id_ciudad": p[9],
+                        "ciudades": p[10]
+                    }
+                    for p in rows
+                ],
+                'siguiente': siguiente,
+                'anterior': anterior,
+                'limite': limite
+            }
+        except Exception as e:
+            app.logger.error(f"Error al obtener página de pacientes: {str(e)}")
+            return {'data': [], 'siguiente': None, 'anterior': None, 'limite': limite}
+        finally:
+            cur.close()
+            con.close()
+
     # ==============================
     #   Obtener paciente por ID
     # ==============================
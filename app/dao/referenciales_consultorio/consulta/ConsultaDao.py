@@ -7,6 +7,7 @@ Descripción: Manejo de consultas_cab (cabecera de consultas)
 
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.paginacion import normalizar_limite, clausulas_keyset, armar_pagina
 
 class ConsultaDao:
 
@@ -70,6 +71,82 @@ class ConsultaDao:
             cur.close()
             con.close()
 
+    def getConsultasPagina(self, cursor=None, limite=None):
+        """
+        Página de consultas activas por cursor, mismo orden que getConsultas
+        (fecha_cita DESC, hora_cita DESC) con id_consulta_cab como desempate
+        """
+        limite = normalizar_limite(limite)
+        condicion, order_by, params, retrocede = clausulas_keyset(
+            ['cc.fecha_cita', 'cc.hora_cita', 'cc.id_consulta_cab'], True, cursor
+        )
+        filtro = f"AND {condicion}" if condicion else ""
+
+        consultaSQL = f"""
+        SELECT 
+            cc.id_consulta_cab,
+            cc.id_paciente,
+            CONCAT(p.nombre, ' ', p.apellido) as nombre_paciente,
+            cc.id_medico,
+            CONCAT(m.nombre, ' ', m.apellido) as nombre_medico,
+            cc.id_consultorio,
+            co.nombre_consultorio,
+            cc.fecha_cita,
+            cc.hora_cita,
+            cc.duracion_minutos,
+            cc.estado,
+            cc.activo,
+            CASE WHEN fm.id_ficha_medica IS NOT NULL THEN true ELSE false END as tiene_ficha
+        FROM consultas_cab cc
+        LEFT JOIN paciente p ON cc.id_paciente = p.id_paciente
+        LEFT JOIN medico m ON cc.id_medico = m.id_medico
+        LEFT JOIN consultorio co ON cc.id_consultorio = co.codigo
+        LEFT JOIN ficha_medica_consulta fm ON cc.id_consulta_cab = fm.id_consulta_cab
+        WHERE cc.activo = true
+        {filtro}
+        ORDER BY {order_by}
+        LIMIT %s
+        """
+        
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        
+        try:
+            cur.execute(consultaSQL, tuple(params) + (limite + 1,))
+            consultas, siguiente, anterior = armar_pagina(
+                cur.fetchall(), lambda c: (c[7], c[8], c[0]), limite, cursor, retrocede
+            )
+            
+            return {
+                'data': [{
+                    'id_consulta_cab': c[0],
+                    'id_paciente': c[1],
+                    'nombre_paciente': c[2],
+                    'id_medico': c[3],
+                    'nombre_medico': c[4],
+                    'id_consultorio': c[5],
+                    'nombre_consultorio': c[6],
+                    'fecha_cita': c[7].isoformat() if c[7] else None,
+                    'hora_cita': str(c[8]) if c[8] else None,
+                    'duracion_minutos': c[9],
+                    'estado': c[10],
+                    'activo': c[11],
+                    'tiene_ficha': c[12]
+                } for c in consultas],
+                'siguiente': siguiente,
+                'anterior': anterior,
+                'limite': limite
+            }
+            
+        except Exception as e:
+            app.logger.error(f"Error al obtener página de consultas: {str(e)}")
+            return {'data': [], 'siguiente': None, 'anterior': None, 'limite': limite}
+            
+        finally:
+            cur.close()
+            con.close()
+
     def getConsultaById(self, id_consulta_cab):
         """
         Obtiene UNA consulta específica por ID
@@ -7,6 +7,7 @@ Descripción: Manejo de diagnósticos médicos
 
 from flask import current_app as app
 from app.conexion.Conexion import Conexion
+from app.dao.paginacion import normalizar_limite, clausulas_keyset, armar_pagina
 
 class DiagnosticoDao:
 
@@ -72,6 +73,84 @@ class DiagnosticoDao:
             cur.close()
             con.close()
 
+    def getDiagnosticosPagina(self, cursor=None, limite=None):
+        """
+        Página de diagnósticos por cursor, mismo orden que getDiagnosticos
+        (fecha_diagnostico DESC, fecha_registro DESC) con id_diagnostico como desempate
+        """
+        limite = normalizar_limite(limite)
+        condicion, order_by, params, retrocede = clausulas_keyset(
+            ['d.fecha_diagnostico', 'd.fecha_registro', 'd.id_diagnostico'], True, cursor
+        )
+        where = f"WHERE {condicion}" if condicion else ""
+
+        diagnosticoSQL = f"""
+        SELECT 
+            d.id_diagnostico,
+            d.codigo,
+            d.id_consulta_detalle,
+            d.id_paciente,
+            CONCAT(p.nombre, ' ', p.apellido) as nombre_paciente,
+            d.id_medico,
+            CONCAT(m.nombre, ' ', m.apellido) as nombre_medico,
+            d.id_tipo_diagnostico,
+            td.descripcion_diagnostico as tipo_diagnostico,
+            d.descripcion_diagnostico,
+            d.pieza_dental,
+            d.fecha_diagnostico,
+            d.sintomas,
+            d.observaciones,
+            d.fecha_registro
+        FROM diagnosticos d
+        INNER JOIN paciente p ON d.id_paciente = p.id_paciente
+        INNER JOIN medico m ON d.id_medico = m.id_medico
+        INNER JOIN tipo_diagnostico td ON d.id_tipo_diagnostico = td.id_tipo_diagnostico
+        {where}
+        ORDER BY {order_by}
+        LIMIT %s
+        """
+        
+        conexion = Conexion()
+        con = conexion.getConexion()
+        cur = con.cursor()
+        
+        try:
+            cur.execute(diagnosticoSQL, tuple(params) + (limite + 1,))
+            diagnosticos, siguiente, anterior = armar_pagina(
+                cur.fetchall(), lambda d: (d[11], d[14], d[0]), limite, cursor, retrocede
+            )
+            
+            return {
+                'data': [{
+                    'id_diagnostico': d[0],
+                    'codigo': d[1],
+                    'id_consulta_detalle': d[2],
+                    'id_paciente': d[3],
+                    'nombre_paciente': d[4],
+                    'id_medico': d[5],
+                    'nombre_medico': d[6],
+                    'id_tipo_diagnostico': d[7],
+                    'tipo_diagnostico': d[8],
+                    'descripcion_diagnostico': d[9],
+                    'pieza_dental': d[10],
+                    'fecha_diagnostico': d[11].isoformat() if d[11] else None,
+                    'sintomas': d[12],
+                    'observaciones': d[13],
+                    'fecha_registro': d[14].isoformat() if d[14] else None
+                } for d in diagnosticos],
+                'siguiente': siguiente,
+                'anterior': anterior,
+                'limite': limite
+            }
+            
+        except Exception as e:
+            app.logger.error(f"Error al obtener página de diagnósticos: {str(e)}")
+            return {'data': [], 'siguiente': None, 'anterior': None, 'limite': limite}
+            
+        finally:
+            cur.close()
+            con.close()
+
     def getDiagnosticoById(self, id_diagnostico):
         """
         Obtiene un diagnóstico específico por ID
@@ -0,0 +1,76 @@
+"""
+Lectura de las versiones por tabla (versiones_tablas + cambios_tablas, sql/019).
+Se usan para calcular ETags sin ejecutar la consulta del listado.
+"""
+
+from flask import current_app as app
+from app.conexion.Conexion import Conexion
+
+# Cambios sin compactar a partir de los cuales una lectura compacta el registro
+UMBRAL_COMPACTACION = 1000
+
+LOCK_COMPACTAR_VERSIONES = 7010
+
+
+def obtener_versiones(tablas):
+    """
+    Retorna {tabla: version} para las tablas pedidas (0 si la tabla todavía no
+    tiene cambios registrados), o None si no se pudo consultar.
+    Las versiones son transaccionales: se ven recién con el commit del cambio.
+    """
+    sql = """
+    SELECT t.tabla,
+           COALESCE((SELECT v.version FROM versiones_tablas v WHERE v.tabla = t.tabla), 0),
+           (SELECT COUNT(*) FROM cambios_tablas c WHERE c.tabla = t.tabla)
+    FROM unnest(%s::text[]) AS t(tabla)
+    """
+    conexion = Conexion()
+    con = conexion.getConexion()
+    cur = con.cursor()
+    try:
+        cur.execute(sql, (list(tablas),))
+        filas = cur.fetchall()
+    except Exception as e:
+        app.logger.error(f"Error al obtener versiones de tablas: {str(e)}")
+        return None
+    finally:
+        cur.close()
+        con.close()
+
+    if sum(pendientes for _, _, pendientes in filas) >= UMBRAL_COMPACTACION:
+        compactar_cambios()
+    return {tabla: version + pendientes for tabla, version, pendientes in filas}
+
+
+def compactar_cambios():
+    """
+    Pasa los cambios confirmados de cambios_tablas al contador de versiones_tablas.
+    Borrado y suma van en la misma sentencia, así que la versión que se lee no
+    cambia. Si otro proceso ya está compactando, no hace nada.
+    """
+    sql = """
+    WITH borrados AS (
+        DELETE FROM cambios_tablas
+        RETURNING tabla
+    )
+    INSERT INTO versiones_tablas (tabla, version)
+    SELECT tabla, COUNT(*) FROM borrados GROUP BY tabla
+    ON CONFLICT (tabla) DO UPDATE
+        SET version = versiones_tablas.version + EXCLUDED.version
+    """
+    conexion = Conexion()
+    con = conexion.getConexion()
+    cur = con.cursor()
+    try:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (LOCK_COMPACTAR_VERSIONES,))
+        if not cur.fetchone()[0]:
+            con.rollback()
+            return
+        cur.execute(sql)
+        con.commit()
+    except Exception as e:
+        app.logger.error(f"Error al compactar cambios de tablas: {str(e)}")
+        con.rollback()
+    finally:
+        cur.close()
+        con.close()
@@ -0,0 +1,66 @@
+"""
+GET condicional (ETag / If-None-Match) para los endpoints de /api/v1.
+
+El ETag se calcula con las versiones de las tablas que lee el endpoint
+(ver app/dao/versiones_tablas.py) y la URL pedida, antes de ejecutar la
+vista. Si el cliente ya tiene esa versión se responde 304 sin consultar
+los datos.
+
+Las versiones cambian recién con el commit de la escritura (sql/019) y no
+bajan nunca. Si son iguales antes y después de la vista, ninguna escritura
+de esas tablas se confirmó en el medio y la respuesta es de esa versión.
+"""
+
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from app.dao.versiones_tablas import obtener_versiones
+
+# Parámetros que no cambian el contenido (anti-cache de jQuery)
+PARAMETROS_IGNORADOS = ('_',)
+
+
+def _calcular_etag(versiones):
+    parametros = sorted(
+        (clave, valor) for clave, valor in request.args.items(multi=True)
+        if clave not in PARAMETROS_IGNORADOS
+    )
+    base = f"{request.path}|{parametros}|{sorted(versiones.items())}"
+    return hashlib.sha1(base.encode()).hexdigest()
+
+
+def con_etag(*tablas):
+    """
+    Decorador para endpoints GET de lectura.
+    tablas: todas las tablas que consulta la vista (incluidos los JOIN).
+    No aplica al modo server-side de DataTables: cada respuesta lleva su
+    propio 'draw' y no se puede reutilizar.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != 'GET' or 'draw' in request.args:
+                return vista(*args, **kwargs)
+
+            versiones = obtener_versiones(tablas)
+            if versiones is None:
+                return vista(*args, **kwargs)
+
+            etag = _calcular_etag(versiones)
+            if request.if_none_match.contains_weak(etag):
+                respuesta = make_response('', 304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+                # Si una escritura se confirmó mientras se armaba la respuesta, los
+                # datos pueden ser de antes o de después: no se asocian a ningún ETag
+                if obtener_versiones(tablas) != versiones:
+                    return respuesta
+
+            respuesta.set_etag(etag)
+            # El navegador guarda la respuesta pero siempre revalida con el servidor
+            respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
+from app.conexion.UnidadTrabajo import unidad_de_trabajo
 from app.dao.referenciales_agendamiento.agenda.AgendaCabeceraDao import AgendaCabeceraDao
 from app.dao.referenciales_agendamiento.agenda.AgendaDetalleDao import AgendaDetalleDao
-from app.dao.referenciales_agendamiento.disponibilidad_horaria.DisponibilidadHorariaDao import DisponibilidadDao
-from datetime import datetime
+from app.Services.generador_agenda_service import GeneradorAgendaService
+from app.Services.reconciliador_cupos import ReconciliadorCuposService
+from app.dao.indice_turnos import indice_turnos
+from datetime import datetime, date, timedelta
 
 agendaapi = Blueprint('agendaapi', __name__)
 
@@ -12,6 +16,7 @@ agendaapi = Blueprint('agendaapi', __name__)
 
 # 🔹 Obtener todas las cabeceras
 @agendaapi.route('/agenda/cabeceras', methods=['GET'])
+@con_etag('agenda_cabecera', 'medico', 'especialidades')
 def getCabeceras():
     dao = AgendaCabeceraDao()
     try:
@@ -22,8 +27,47 @@ def getCabeceras():
         return jsonify({'success': False, 'error': 'Error interno'}), 500
 
 
+# 🔹 Calendario mensual: totales por día (turnos, cupos, citas por estado)
+# Parámetros: anio, mes (por defecto, el mes actual), id_medico, id_especialidad
+@agendaapi.route('/agenda/calendario', methods=['GET'])
+@con_etag('agenda_cabecera', 'agenda_detalle', 'cita_detalle', 'estado_cita')
+def getCalendarioMensual():
+    args = request.args
+    try:
+        hoy = date.today()
+        anio = int(args.get('anio') or hoy.year)
+        mes = int(args.get('mes') or hoy.month)
+        fecha_desde = date(anio, mes, 1)
+        fecha_hasta = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+        id_medico = int(args['id_medico']) if args.get('id_medico') else None
+        id_especialidad = int(args['id_especialidad']) if args.get('id_especialidad') else None
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+
+    try:
+        dias = AgendaCabeceraDao().getCalendarioMensual(
+            fecha_desde, fecha_hasta, id_medico=id_medico, id_especialidad=id_especialidad
+        )
+        if dias is None:
+            return jsonify({'success': False, 'error': 'No se pudo obtener el calendario'}), 500
+
+        totales = {
+            clave: sum(d[clave] for d in dias)
+            for clave in ('turnos', 'turnos_libres', 'cupos_maximos', 'cupos_disponibles', 'reservadas')
+        }
+        return jsonify({
+            'success': True,
+            'data': {'anio': anio, 'mes': mes, 'dias': dias, 'totales': totales},
+            'error': None
+        }), 200
+    except Exception as e:
+        app.logger.error(f"Error al obtener calendario mensual: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
 # 🔹 Obtener cabecera por ID
 @agendaapi.route('/agenda/cabeceras/<int:id_cabecera>', methods=['GET'])
+@con_etag('agenda_cabecera', 'medico', 'especialidades')
 def getCabecera(id_cabecera):
     dao = AgendaCabeceraDao()
     try:
@@ -86,6 +130,32 @@ def addCabecera():
         return jsonify({'success': False, 'error': 'Error interno'}), 500
 
 
+# 🔹 Generar agenda recurrente de un médico (disponibilidades + cabeceras + detalles)
+# Body: {id_medico, id_especialidad, id_funcionario, fecha_desde, fecha_hasta, observaciones?,
+#        patron: [{id_dia, id_turno, hora_inicio, hora_fin, cupos}, ...]}
+# También acepta {"pedidos": [...]} para generar varios médicos en una llamada.
+@agendaapi.route('/agenda/generar', methods=['POST'])
+def generarAgenda():
+    data = request.get_json() or {}
+    servicio = GeneradorAgendaService()
+
+    try:
+        if isinstance(data.get('pedidos'), list):
+            resultados = servicio.generar_lote(data['pedidos'])
+            return jsonify({'success': True, 'data': resultados, 'error': None}), 200
+
+        resultado = servicio.generar(data)
+        if resultado is None:
+            return jsonify({'success': False, 'error': 'No se pudo generar la agenda'}), 500
+        return jsonify({'success': True, 'data': resultado, 'error': None}), 201
+
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en los datos: {str(ve)}'}), 400
+    except Exception as e:
+        app.logger.error(f"Error al generar agenda: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
 # 🔹 Actualizar cabecera
 @agendaapi.route('/agenda/cabeceras/<int:id_cabecera>', methods=['PUT'])
 def updateCabecera(id_cabecera):
@@ -168,6 +238,7 @@ def cambiarEstadoCabecera(id_cabecera):
 
 # 🔹 Obtener detalles de una cabecera
 @agendaapi.route('/agenda/cabeceras/<int:id_cabecera>/detalles', methods=['GET'])
+@con_etag('agenda_detalle', 'dias', 'turnos')
 def getDetalles(id_cabecera):
     dao = AgendaDetalleDao()
     try:
@@ -180,6 +251,7 @@ def getDetalles(id_cabecera):
 
 # 🔹 Obtener un detalle específico
 @agendaapi.route('/agenda/detalles/<int:id_detalle>', methods=['GET'])
+@con_etag('agenda_detalle', 'dias', 'turnos')
 def getDetalle(id_detalle):
     dao = AgendaDetalleDao()
     try:
@@ -193,11 +265,21 @@ def getDetalle(id_detalle):
 
 
 # 🔹 Agregar detalles (uno o varios) a una cabecera
+# Se publican todas las disponibilidades en una sola sentencia y una sola transacción;
+# 'resultados' informa qué pasó con cada ID pedido.
+MENSAJES_PUBLICACION = {
+    'ya_publicada': 'ya está publicada en esta agenda',
+    'no_existe': 'no existe',
+    'medico_distinto': 'pertenece a otro médico',
+    'fecha_distinta': 'es de otra fecha',
+    'repetida': 'está repetida en el pedido',
+    'invalida': 'no es un ID válido'
+}
+
 @agendaapi.route('/agenda/cabeceras/<int:id_cabecera>/detalles', methods=['POST'])
 def addDetalles(id_cabecera):
     data = request.get_json()
     detalle_dao = AgendaDetalleDao()
-    disp_dao = DisponibilidadDao()
 
     # Espera un array de IDs de disponibilidades
     if 'ids_disponibilidades' not in data or not isinstance(data['ids_disponibilidades'], list):
@@ -213,23 +295,15 @@ def addDetalles(id_cabecera):
         if not cabecera:
             return jsonify({'success': False, 'error': f'No existe la cabecera {id_cabecera}'}), 404
 
-        # Obtener las disponibilidades y crear detalles
-        ids_creados = []
-        errores = []
-
-        for id_disp in data['ids_disponibilidades']:
-            # Obtener disponibilidad
-            disponibilidad = disp_dao.getDisponibilidadById(id_disp)
-            if not disponibilidad:
-                errores.append(f"Disponibilidad {id_disp} no existe")
-                continue
+        resultados = detalle_dao.publicarDisponibilidades(id_cabecera, data['ids_disponibilidades'])
+        if resultados is None:
+            return jsonify({'success': False, 'error': 'No se pudieron publicar las disponibilidades'}), 500
 
-            # Intentar crear detalle
-            detalle_id = detalle_dao.guardarDetalle(id_cabecera, disponibilidad)
-            if detalle_id:
-                ids_creados.append(detalle_id)
-            else:
-                errores.append(f"Disponibilidad {id_disp} ya está publicada o hubo un error")
+        ids_creados = [r['id_agenda_detalle'] for r in resultados if r['resultado'] == 'publicada']
+        errores = [
+            f"Disponibilidad {r['id_disponibilidad']} {MENSAJES_PUBLICACION[r['resultado']]}"
+            for r in resultados if r['resultado'] != 'publicada'
+        ]
 
         # Retornar resultado
         if ids_creados:
@@ -238,13 +312,15 @@ def addDetalles(id_cabecera):
                 'data': {
                     'ids_creados': ids_creados,
                     'cantidad': len(ids_creados),
-                    'errores': errores if errores else None
+                    'errores': errores if errores else None,
+                    'resultados': resultados
                 },
                 'error': None
             }), 201
         else:
             return jsonify({
                 'success': False,
+                'data': {'resultados': resultados},
                 'error': f"No se pudo crear ningún detalle. Errores: {', '.join(errores)}"
             }), 400
 
@@ -253,8 +329,112 @@ def addDetalles(id_cabecera):
         return jsonify({'success': False, 'error': 'Error interno'}), 500
 
 
+# 🔹 Buscar los próximos turnos libres de una especialidad
+# Parámetros: id_especialidad (obligatorio), fecha_desde, fecha_hasta (AAAA-MM-DD),
+#             hora_desde, hora_hasta (HH:MM), id_medico, cantidad
+MAX_TURNOS_BUSQUEDA = 100
+DIAS_BUSQUEDA_POR_DEFECTO = 60
+
+@agendaapi.route('/agenda/turnos-libres', methods=['GET'])
+def buscarTurnosLibres():
+    args = request.args
+    try:
+        if not args.get('id_especialidad'):
+            return jsonify({'success': False, 'error': 'El parámetro id_especialidad es obligatorio'}), 400
+        id_especialidad = int(args['id_especialidad'])
+        id_medico = int(args['id_medico']) if args.get('id_medico') else None
+
+        fecha_desde = (datetime.strptime(args['fecha_desde'], "%Y-%m-%d").date()
+                       if args.get('fecha_desde') else date.today())
+        fecha_hasta = (datetime.strptime(args['fecha_hasta'], "%Y-%m-%d").date()
+                       if args.get('fecha_hasta') else fecha_desde + timedelta(days=DIAS_BUSQUEDA_POR_DEFECTO))
+        if fecha_hasta < fecha_desde:
+            return jsonify({'success': False, 'error': 'fecha_hasta no puede ser anterior a fecha_desde'}), 400
+
+        hora_desde = datetime.strptime(args['hora_desde'], "%H:%M").time() if args.get('hora_desde') else None
+        hora_hasta = datetime.strptime(args['hora_hasta'], "%H:%M").time() if args.get('hora_hasta') else None
+
+        cantidad = int(args.get('cantidad', 10))
+        cantidad = max(1, min(cantidad, MAX_TURNOS_BUSQUEDA))
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+
+    try:
+        turnos = indice_turnos.buscar(
+            id_especialidad, fecha_desde, fecha_hasta,
+            hora_desde=hora_desde, hora_hasta=hora_hasta,
+            id_medico=id_medico, cantidad=cantidad
+        )
+        data = [
+            {
+                **t,
+                'fecha': t['fecha'].strftime("%Y-%m-%d"),
+                'hora_inicio': str(t['hora_inicio']),
+                'hora_fin': str(t['hora_fin'])
+            } for t in turnos
+        ]
+        return jsonify({'success': True, 'data': data, 'error': None}), 200
+    except Exception as e:
+        app.logger.error(f"Error al buscar turnos libres: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
+# 🔹 Reporte de desvíos de cupos (cupos_disponibles vs. citas y reservas reales)
+# Parámetros: fecha_desde, fecha_hasta (AAAA-MM-DD; por defecto, hoy)
+@agendaapi.route('/agenda/cupos/desvios', methods=['GET'])
+def reportarDesviosCupos():
+    servicio = ReconciliadorCuposService()
+    hoy = date.today().strftime("%Y-%m-%d")
+    try:
+        fecha_desde, fecha_hasta = servicio.validar_rango(
+            request.args.get('fecha_desde') or hoy,
+            request.args.get('fecha_hasta') or request.args.get('fecha_desde') or hoy
+        )
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+
+    try:
+        desvios = servicio.reportar(fecha_desde, fecha_hasta)
+        if desvios is None:
+            return jsonify({'success': False, 'error': 'No se pudo calcular el reporte'}), 500
+        return jsonify({'success': True, 'data': desvios, 'error': None}), 200
+    except Exception as e:
+        app.logger.error(f"Error al reportar desvíos de cupos: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
+# 🔹 Corregir desvíos de cupos
+# Con {"fecha_desde", "fecha_hasta"}: corrige todo el rango.
+# Sin fechas: modo incremental, solo los turnos que cambiaron desde la última corrida.
+@agendaapi.route('/agenda/cupos/reconciliar', methods=['POST'])
+def reconciliarCupos():
+    data = request.get_json(silent=True) or {}
+    servicio = ReconciliadorCuposService()
+    try:
+        if data.get('fecha_desde') or data.get('fecha_hasta'):
+            try:
+                fecha_desde, fecha_hasta = servicio.validar_rango(
+                    data.get('fecha_desde') or data.get('fecha_hasta'),
+                    data.get('fecha_hasta') or data.get('fecha_desde')
+                )
+            except ValueError as ve:
+                return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+            correcciones = servicio.corregir(fecha_desde, fecha_hasta)
+            resultado = None if correcciones is None else {'correcciones': correcciones}
+        else:
+            resultado = servicio.reconciliar_pendientes()
+
+        if resultado is None:
+            return jsonify({'success': False, 'error': 'No se pudo reconciliar los cupos'}), 500
+        return jsonify({'success': True, 'data': resultado, 'error': None}), 200
+    except Exception as e:
+        app.logger.error(f"Error al reconciliar cupos: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
 # 🔹 Eliminar un detalle específico
 @agendaapi.route('/agenda/detalles/<int:id_detalle>', methods=['DELETE'])
+@unidad_de_trabajo
 def deleteDetalle(id_detalle):
     dao = AgendaDetalleDao()
     try:
@@ -269,6 +449,7 @@ def deleteDetalle(id_detalle):
 
 # 🔹 Actualizar cupos disponibles de un detalle
 @agendaapi.route('/agenda/detalles/<int:id_detalle>/cupos', methods=['PATCH'])
+@unidad_de_trabajo
 def actualizarCupos(id_detalle):
     data = request.get_json()
     dao = AgendaDetalleDao()
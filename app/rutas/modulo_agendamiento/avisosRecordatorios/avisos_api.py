@@ -1,11 +1,13 @@
 from flask import Blueprint, jsonify, request, current_app as app
 from app.dao.referenciales_agendamiento.avisosRecordatorios.AvisosRecordatorioDao import AvisoRecordatorioDao
-from app.Services.whatsapp_service import AvisoRecordatorioService, WhatsAppService
-import threading
+from app.dao.referenciales_agendamiento.avisosRecordatorios.EnvioWhatsappDao import EnvioWhatsappDao
+from app.Services.whatsapp_service import AvisoRecordatorioService
+from app.rutas.respuestas import respuesta_json_stream
 
 avisoapi = Blueprint('avisoapi', __name__, url_prefix='/api/v1')
 
 dao = AvisoRecordatorioDao()
+envio_dao = EnvioWhatsappDao()
 
 # ==========================================
 #  ENDPOINTS CRUD BÁSICOS
@@ -14,6 +16,26 @@ dao = AvisoRecordatorioDao()
 @avisoapi.route('/avisos', methods=['GET'])
 def listar_avisos():
     """Lista todos los avisos y recordatorios"""
+    # Con ?stream=1 se escribe el arreglo de a trozos desde un cursor del servidor
+    if request.args.get('stream') == '1':
+        return respuesta_json_stream(dao.iterarAvisos(), 'Ocurrió un error al consultar los avisos.')
+
+    # Con ?cursor= o ?limite= se responde paginado por cursor (keyset)
+    if 'cursor' in request.args or 'limite' in request.args:
+        try:
+            pagina = dao.getAvisosPagina(request.args.get('cursor'), request.args.get('limite'))
+        except ValueError as ve:
+            return jsonify(success=False, error=str(ve)), 400
+        return jsonify(
+            success=True,
+            data=pagina['data'],
+            paginacion={
+                'limite': pagina['limite'],
+                'siguiente': pagina['siguiente'],
+                'anterior': pagina['anterior']
+            }
+        )
+
     try:
         avisos = dao.getAvisos()
         return jsonify(success=True, data=avisos)
@@ -78,13 +100,26 @@ def eliminar_aviso(id_aviso):
 #  ENDPOINTS PARA WHATSAPP
 # ==========================================
 
+def _respuesta_encolado(id_envio, mensaje):
+    if id_envio is None:
+        return jsonify(success=False, error="No se pudo encolar el envío"), 500
+    activo = envio_dao.despachadorActivo()
+    if not activo:
+        mensaje += " El despachador de WhatsApp no está corriendo (flask despachador-whatsapp)."
+    return jsonify(
+        success=True,
+        id_envio=id_envio,
+        despachador_activo=activo,
+        mensaje=mensaje
+    ), 202
+
+
 @avisoapi.route('/avisos/enviar-whatsapp', methods=['POST'])
 def enviar_avisos_whatsapp():
-    """Envía todos los avisos pendientes de WhatsApp"""
+    """Encola el envío de todos los avisos pendientes de WhatsApp"""
     try:
-        servicio = AvisoRecordatorioService()
-        servicio.procesar_avisos_pendientes()
-        return jsonify(success=True, mensaje="Proceso de envío completado")
+        id_envio = envio_dao.encolarEnvio('pendientes')
+        return _respuesta_encolado(id_envio, "Envío de avisos pendientes en cola.")
     except Exception as e:
         app.logger.error(f"Error en enviar_avisos_whatsapp: {e}")
         return jsonify(success=False, error=str(e)), 500
@@ -92,7 +127,7 @@ def enviar_avisos_whatsapp():
 
 @avisoapi.route('/avisos/<int:id_aviso>/enviar-whatsapp', methods=['POST'])
 def enviar_aviso_individual(id_aviso):
-    """Envía un aviso individual por WhatsApp de forma asíncrona"""
+    """Encola el envío de un aviso individual por WhatsApp"""
     try:
         aviso = dao.getAvisoById(id_aviso)
         if not aviso:
@@ -107,110 +142,28 @@ def enviar_aviso_individual(id_aviso):
         if not telefono:
             return jsonify(success=False, error="Paciente sin teléfono registrado"), 400
         
-        # Función para ejecutar en segundo plano
-        def enviar_en_segundo_plano():
-            ws = None
-            try:
-                ws = WhatsAppService()
-                print(f"\n{'='*60}")
-                print(f"Iniciando envío de aviso #{id_aviso}")
-                print(f"{'='*60}\n")
-                
-                if ws.inicializar_navegador():
-                    if ws.esperar_carga(timeout=240):
-                        # ✅ PASO 1: Generar el mensaje automático
-                        print(f"📝 Generando mensaje automático...")
-                        mensaje_generado = servicio.formatear_mensaje(aviso)
-                        print(f"✅ Mensaje generado ({len(mensaje_generado)} caracteres)")
-                        print(f"Primeros 150 chars: {mensaje_generado[:150]}...")
-                        
-                        # ✅ PASO 2: Enviar por WhatsApp
-                        if ws.enviar_mensaje(telefono, mensaje_generado):
-                            print(f"✅ Mensaje enviado por WhatsApp")
-                            
-                            # ✅ PASO 3: GUARDAR el mensaje generado en la BD
-                            print(f"💾 Guardando mensaje generado en BD...")
-                            datos_actualizacion = {
-                                'id_paciente': aviso['id_paciente'],
-                                'id_funcionario': aviso['id_funcionario'],  # ✅ CAMBIO
-                                'id_medico': aviso.get('id_medico'),
-                                'codigo': aviso.get('codigo'),
-                                'fecha_cita': aviso['fecha_cita'],
-                                'hora_cita': aviso['hora_cita'],
-                                'forma_envio': aviso['forma_envio'],
-                                'mensaje': mensaje_generado,  # ✅ GUARDAR EL MENSAJE GENERADO
-                                'estado_envio': 'Enviado',
-                                'estado_confirmacion': aviso.get('estado_confirmacion', 'Pendiente')
-                            }
-                            
-                            resultado = dao.updateAviso(id_aviso, datos_actualizacion)
-                            
-                            if resultado:
-                                print(f"✅ Mensaje guardado en BD correctamente")
-                                print(f"   Longitud guardada: {len(mensaje_generado)} caracteres")
-                            else:
-                                print(f"❌ Error al guardar en BD")
-                            
-                            print(f"\n{'='*60}")
-                            print(f"✅ Proceso completado:")
-                            print(f"   - Mensaje enviado por WhatsApp")
-                            print(f"   - Mensaje guardado en BD")
-                            print(f"   - Ventana mantenida abierta")
-                            print(f"{'='*60}\n")
-                            
-                        else:
-                            print(f"❌ Error al enviar mensaje")
-                            dao.updateAviso(id_aviso, {
-                                **aviso,
-                                'estado_envio': 'Error'
-                            })
-                            if ws:
-                                ws.cerrar()
-                    else:
-                        print(f"❌ No se pudo conectar a WhatsApp Web")
-                        dao.updateAviso(id_aviso, {
-                            **aviso,
-                            'estado_envio': 'Error'
-                        })
-                        if ws:
-                            ws.cerrar()
-                else:
-                    print(f"❌ No se pudo inicializar el navegador")
-                    dao.updateAviso(id_aviso, {
-                        **aviso,
-                        'estado_envio': 'Error'
-                    })
-                    
-            except Exception as e:
-                print(f"\n❌ Error en proceso de segundo plano: {e}")
-                import traceback
-                traceback.print_exc()
-                try:
-                    dao.updateAviso(id_aviso, {
-                        **aviso,
-                        'estado_envio': 'Error'
-                    })
-                except:
-                    pass
-                if ws:
-                    ws.cerrar()
-        
-        # Iniciar el thread en segundo plano
-        thread = threading.Thread(target=enviar_en_segundo_plano)
-        thread.daemon = False
-        thread.start()
-        
-        # Responder inmediatamente al frontend
-        return jsonify(
-            success=True, 
-            mensaje="Proceso iniciado. WhatsApp Web se abrirá en una ventana nueva."
-        )
+        # El despachador mantiene la sesión de WhatsApp Web abierta y envía en orden
+        id_envio = envio_dao.encolarEnvio('aviso', id_aviso)
+        return _respuesta_encolado(id_envio, "Aviso en cola de envío.")
             
     except Exception as e:
         app.logger.error(f"Error en enviar_aviso_individual: {e}")
         return jsonify(success=False, error=str(e)), 500
 
 
+@avisoapi.route('/avisos/envios/<int:id_envio>', methods=['GET'])
+def get_envio_whatsapp(id_envio):
+    """Estado de un envío encolado"""
+    try:
+        envio = envio_dao.getEnvioById(id_envio)
+        if not envio:
+            return jsonify(success=False, error="Envío no encontrado"), 404
+        return jsonify(success=True, data=envio)
+    except Exception as e:
+        app.logger.error(f"Error en get_envio_whatsapp: {e}")
+        return jsonify(success=False, error=str(e)), 500
+
+
 @avisoapi.route('/avisos/estadisticas', methods=['GET'])
 def estadisticas_avisos():
     """Obtiene estadísticas de los avisos"""
@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app as app
 from app.dao.referenciales_agendamiento.cita.CitaDao import CitaDao
+from app.dao.referenciales_agendamiento.cita.ReservaCupoDao import ReservaCupoDao
+from app.dao.referenciales_agendamiento.lista_espera.ListaEsperaDao import ListaEsperaDao
+from app.conexion.UnidadTrabajo import unidad_de_trabajo
+from app.rutas.respuestas import respuesta_json_stream
+from app.rutas.etag import con_etag
 from datetime import time
+import uuid
 
 # Crear Blueprint para la API de Citas
 citaapi = Blueprint('citaapi', __name__)
@@ -19,11 +25,25 @@ def obtener_id_funcionario_actual():
     """Obtiene el ID del funcionario logueado"""
     return 2
 
+def token_valido(token):
+    """Verifica que el token de una reserva de cupo sea un UUID"""
+    try:
+        uuid.UUID(token)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+# Duración de las reservas de cupo (segundos)
+RESERVA_SEGUNDOS_POR_DEFECTO = 120
+RESERVA_SEGUNDOS_MINIMO = 10
+RESERVA_SEGUNDOS_MAXIMO = 900
+
 # ========================================
 # API - ESTADOS DE CITA
 # ========================================
 
 @citaapi.route('/estados-cita', methods=['GET'])
+@con_etag('estado_cita')
 def getEstadosCita():
     citadao = CitaDao()
     try:
@@ -44,10 +64,48 @@ def getEstadosCita():
 # API - CITA CABECERA
 # ========================================
 
+# Tamaño máximo de página aceptado en modo server-side
+MAX_LONGITUD_PAGINA = 100
+
+def leer_parametros_datatables(args):
+    """Lee draw/start/length/search/order del protocolo server-side de DataTables"""
+    draw = args.get('draw', type=int) or 0
+    inicio = max(args.get('start', type=int) or 0, 0)
+    cantidad = args.get('length', type=int) or 10
+    if cantidad < 0 or cantidad > MAX_LONGITUD_PAGINA:
+        # length = -1 ("Todos") también se limita
+        cantidad = MAX_LONGITUD_PAGINA
+    busqueda = (args.get('search[value]') or '').strip() or None
+
+    orden_columna = None
+    indice = args.get('order[0][column]', type=int)
+    if indice is not None:
+        orden_columna = args.get(f'columns[{indice}][data]')
+    orden_dir = args.get('order[0][dir]', 'desc')
+
+    return draw, inicio, cantidad, busqueda, orden_columna, orden_dir
+
 @citaapi.route('/citas-cabecera', methods=['GET'])
+@con_etag('cita_cabecera', 'paciente', 'agenda_cabecera', 'medico', 'especialidades')
 def getCitasCabecera():
     citadao = CitaDao()
+    if request.args.get('stream') == '1':
+        # Exportación completa: cursor del servidor + JSON incremental
+        return respuesta_json_stream(citadao.iterarCitasCabecera(), 'Ocurrió un error al consultar las citas.')
     try:
+        if 'draw' in request.args:
+            # Modo server-side de DataTables: filtro, orden y paginación en SQL
+            draw, inicio, cantidad, busqueda, orden_columna, orden_dir = leer_parametros_datatables(request.args)
+            pagina = citadao.getCitasCabeceraPaginado(inicio, cantidad, busqueda, orden_columna, orden_dir)
+            return jsonify({
+                'draw': draw,
+                'recordsTotal': pagina['total'],
+                'recordsFiltered': pagina['filtrados'],
+                'success': True,
+                'data': pagina['data'],
+                'error': None
+            }), 200
+
         cabeceras = citadao.getCitasCabecera()
         return jsonify({
             'success': True,
@@ -62,6 +120,7 @@ def getCitasCabecera():
         }), 500
 
 @citaapi.route('/citas-cabecera/<int:id_cita_cabecera>', methods=['GET'])
+@con_etag('cita_cabecera', 'paciente', 'agenda_cabecera', 'medico', 'especialidades')
 def getCitaCabeceraById(id_cita_cabecera):
     citadao = CitaDao()
     try:
@@ -176,6 +235,7 @@ def updateCitaCabecera(id_cita_cabecera):
         }), 500
 
 @citaapi.route('/citas-cabecera/<int:id_cita_cabecera>', methods=['DELETE'])
+@unidad_de_trabajo
 def deleteCitaCabecera(id_cita_cabecera):
     citadao = CitaDao()
     try:
@@ -232,6 +292,7 @@ def cambiarEstadoCabecera(id_cita_cabecera):
 # ========================================
 
 @citaapi.route('/citas-detalle/cabecera/<int:id_cita_cabecera>', methods=['GET'])
+@con_etag('cita_detalle', 'estado_cita', 'agenda_detalle')
 def getDetallesPorCabecera(id_cita_cabecera):
     citadao = CitaDao()
     try:
@@ -258,6 +319,7 @@ def getDetallesPorCabecera(id_cita_cabecera):
         }), 500
 
 @citaapi.route('/citas-detalle/<int:id_cita_detalle>', methods=['GET'])
+@con_etag('cita_detalle', 'estado_cita')
 def getDetalleById(id_cita_detalle):
     citadao = CitaDao()
     try:
@@ -284,6 +346,7 @@ def getDetalleById(id_cita_detalle):
         }), 500
 
 @citaapi.route('/citas-detalle', methods=['POST'])
+@unidad_de_trabajo
 def addCitaDetalle():
     data = request.get_json()
     citadao = CitaDao()
@@ -340,7 +403,105 @@ def addCitaDetalle():
             'error': 'Ocurrió un error al guardar el detalle.'
         }), 500
 
+# Lote de detalles para una cabecera (ej. sesiones de un plan de tratamiento).
+# Se crean en una sola sentencia; 'resultados' informa qué pasó con cada detalle.
+MENSAJES_LOTE_DETALLES = {
+    'sin_cupos': 'no tiene cupos disponibles',
+    'no_existe': 'tiene un turno (id_agenda_detalle) que no existe',
+    'invalida': 'tiene datos incompletos o inválidos',
+    'no_procesada': 'no se creó porque otro detalle del lote falló'
+}
+MAX_DETALLES_LOTE = 50
+MODOS_LOTE = ('todo_o_nada', 'por_item')
+
+@citaapi.route('/citas-detalle/lote', methods=['POST'])
+@unidad_de_trabajo
+def addCitaDetallesLote():
+    data = request.get_json() or {}
+    citadao = CitaDao()
+
+    if data.get('id_cita_cabecera') in (None, "", "null"):
+        return jsonify({
+            'success': False,
+            'error': 'El campo id_cita_cabecera es obligatorio.'
+        }), 400
+    detalles = data.get('detalles')
+    if not isinstance(detalles, list) or not detalles:
+        return jsonify({
+            'success': False,
+            'error': 'Debe enviar detalles como un array no vacío.'
+        }), 400
+    if len(detalles) > MAX_DETALLES_LOTE:
+        return jsonify({
+            'success': False,
+            'error': f'Se permiten como máximo {MAX_DETALLES_LOTE} detalles por lote.'
+        }), 400
+    modo = data.get('modo') or 'todo_o_nada'
+    if modo not in MODOS_LOTE:
+        return jsonify({
+            'success': False,
+            'error': f'Modo inválido. Valores posibles: {", ".join(MODOS_LOTE)}.'
+        }), 400
+
+    # Mismos campos obligatorios que /citas-detalle
+    campos_requeridos = ['id_agenda_detalle', 'fecha_cita', 'hora_cita',
+                         'motivo_consulta', 'id_estado_cita']
+    detalles = [
+        d if isinstance(d, dict) and all(d.get(c) not in (None, "", "null") for c in campos_requeridos) else {}
+        for d in detalles
+    ]
+
+    try:
+        if not citadao.getCitaCabeceraById(data['id_cita_cabecera']):
+            return jsonify({
+                'success': False,
+                'error': f'No se encontró la cita con ID {data["id_cita_cabecera"]}.'
+            }), 404
+
+        resultados = citadao.guardarCitaDetallesLote(
+            data['id_cita_cabecera'], detalles, todo_o_nada=(modo == 'todo_o_nada')
+        )
+        if resultados is None:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudieron guardar los detalles.'
+            }), 500
+
+        ids_creados = [r['id_cita_detalle'] for r in resultados if r['resultado'] == 'creada']
+        errores = [
+            f"Detalle {r['indice'] + 1} {MENSAJES_LOTE_DETALLES[r['resultado']]}"
+            for r in resultados if r['resultado'] != 'creada'
+        ]
+
+        if ids_creados:
+            return jsonify({
+                'success': True,
+                'data': {
+                    'id_cita_cabecera': data['id_cita_cabecera'],
+                    'modo': modo,
+                    'ids_creados': ids_creados,
+                    'cantidad': len(ids_creados),
+                    'errores': errores if errores else None,
+                    'resultados': resultados
+                },
+                'error': None
+            }), 201
+        else:
+            return jsonify({
+                'success': False,
+                'data': {'modo': modo, 'resultados': resultados},
+                'error': f"No se creó ningún detalle. Errores: {', '.join(errores)}"
+            }), 409
+
+    except Exception as e:
+        app.logger.error(f"Error al crear lote de detalles: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al guardar los detalles.'
+        }), 500
+
 @citaapi.route('/citas-detalle/<int:id_cita_detalle>', methods=['PUT'])
+@unidad_de_trabajo
 def updateCitaDetalle(id_cita_detalle):
     data = request.get_json()
     citadao = CitaDao()
@@ -397,6 +558,7 @@ def updateCitaDetalle(id_cita_detalle):
         }), 500
 
 @citaapi.route('/citas-detalle/<int:id_cita_detalle>', methods=['DELETE'])
+@unidad_de_trabajo
 def deleteCitaDetalle(id_cita_detalle):
     citadao = CitaDao()
     try:
@@ -418,11 +580,378 @@ def deleteCitaDetalle(id_cita_detalle):
             'error': 'Ocurrió un error al eliminar el detalle.'
         }), 500
 
+# ========================================
+# API - RESERVAS TEMPORALES DE CUPO
+# ========================================
+
+@citaapi.route('/reservas-cupo', methods=['POST'])
+@unidad_de_trabajo
+def crearReservaCupo():
+    """Retiene un cupo durante unos segundos mientras se completa la cita"""
+    data = request.get_json() or {}
+
+    if data.get('id_agenda_detalle') in (None, "", "null"):
+        return jsonify({
+            'success': False,
+            'error': 'El campo id_agenda_detalle es obligatorio.'
+        }), 400
+
+    try:
+        segundos = int(data.get('segundos') or RESERVA_SEGUNDOS_POR_DEFECTO)
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'El campo segundos debe ser un número.'
+        }), 400
+    if not RESERVA_SEGUNDOS_MINIMO <= segundos <= RESERVA_SEGUNDOS_MAXIMO:
+        return jsonify({
+            'success': False,
+            'error': f'El campo segundos debe estar entre {RESERVA_SEGUNDOS_MINIMO} y {RESERVA_SEGUNDOS_MAXIMO}.'
+        }), 400
+
+    try:
+        reserva = ReservaCupoDao().crearReserva(int(data['id_agenda_detalle']), segundos)
+
+        if reserva == "SIN_CUPOS":
+            return jsonify({
+                'success': False,
+                'error': 'No hay cupos disponibles en este horario.'
+            }), 409
+
+        if reserva:
+            return jsonify({
+                'success': True,
+                'data': {
+                    'token': reserva['token'],
+                    'id_agenda_detalle': reserva['id_agenda_detalle'],
+                    'expira_en': reserva['expira_en'].isoformat(),
+                    'segundos': segundos
+                },
+                'error': None
+            }), 201
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo reservar el cupo.'
+            }), 500
+
+    except Exception as e:
+        app.logger.error(f"Error al crear reserva de cupo: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al reservar el cupo.'
+        }), 500
+
+@citaapi.route('/reservas-cupo/<token>/confirmar', methods=['POST'])
+@unidad_de_trabajo
+def confirmarReservaCupo(token):
+    """Convierte la reserva en un detalle de cita usando el cupo ya retenido"""
+    if not token_valido(token):
+        return jsonify({
+            'success': False,
+            'error': 'Token de reserva inválido.'
+        }), 404
+
+    data = request.get_json() or {}
+    campos_requeridos = ['id_cita_cabecera', 'fecha_cita', 'hora_cita',
+                         'motivo_consulta', 'id_estado_cita']
+    for campo in campos_requeridos:
+        if campo not in data or data[campo] in (None, "", "null"):
+            return jsonify({
+                'success': False,
+                'error': f'El campo {campo} es obligatorio.'
+            }), 400
+
+    try:
+        detalle_id = ReservaCupoDao().confirmarReserva(
+            token,
+            data['id_cita_cabecera'],
+            data['fecha_cita'],
+            data['hora_cita'],
+            data['motivo_consulta'],
+            data['id_estado_cita']
+        )
+
+        if detalle_id == "VENCIDA":
+            return jsonify({
+                'success': False,
+                'error': 'La reserva venció o ya no está activa.'
+            }), 410
+
+        if detalle_id:
+            return jsonify({
+                'success': True,
+                'data': {
+                    'id_cita_detalle': detalle_id,
+                    'id_cita_cabecera': data['id_cita_cabecera'],
+                    'fecha_cita': data['fecha_cita'],
+                    'hora_cita': data['hora_cita'],
+                    'motivo_consulta': data['motivo_consulta'],
+                    'id_estado_cita': data['id_estado_cita']
+                },
+                'error': None
+            }), 201
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo confirmar la reserva.'
+            }), 500
+
+    except Exception as e:
+        app.logger.error(f"Error al confirmar reserva {token}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al confirmar la reserva.'
+        }), 500
+
+@citaapi.route('/reservas-cupo/<token>', methods=['DELETE'])
+@unidad_de_trabajo
+def liberarReservaCupo(token):
+    """Libera la reserva antes de que venza y devuelve el cupo"""
+    if not token_valido(token):
+        return jsonify({
+            'success': False,
+            'error': 'Token de reserva inválido.'
+        }), 404
+
+    try:
+        if ReservaCupoDao().liberarReserva(token):
+            return jsonify({
+                'success': True,
+                'mensaje': 'Reserva liberada correctamente.',
+                'error': None
+            }), 200
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'La reserva no existe o ya no está activa.'
+            }), 404
+    except Exception as e:
+        app.logger.error(f"Error al liberar reserva {token}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al liberar la reserva.'
+        }), 500
+
+# ========================================
+# API - LISTA DE ESPERA
+# ========================================
+
+ESTADOS_LISTA_ESPERA = ('Esperando', 'Ofrecida', 'Aceptada', 'Rechazada', 'Vencida', 'Cancelada')
+
+@citaapi.route('/lista-espera', methods=['GET'])
+def getListaEspera():
+    estado = request.args.get('estado') or None
+    if estado is not None and estado not in ESTADOS_LISTA_ESPERA:
+        return jsonify({
+            'success': False,
+            'error': f'Estado inválido. Valores posibles: {", ".join(ESTADOS_LISTA_ESPERA)}.'
+        }), 400
+
+    try:
+        entradas = ListaEsperaDao().getListaEspera(
+            estado=estado,
+            fecha=request.args.get('fecha') or None,
+            id_especialidad=request.args.get('id_especialidad', type=int)
+        )
+        return jsonify({
+            'success': True,
+            'data': entradas,
+            'error': None
+        }), 200
+    except Exception as e:
+        app.logger.error(f"Error al obtener la lista de espera: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al obtener la lista de espera.'
+        }), 500
+
+@citaapi.route('/lista-espera', methods=['POST'])
+@unidad_de_trabajo
+def addListaEspera():
+    """
+    Anota a un paciente en espera de un turno (id_agenda_detalle)
+    o de cualquier turno de una especialidad en una fecha (id_especialidad + fecha).
+    """
+    data = request.get_json() or {}
+
+    if data.get('id_paciente') in (None, "", "null"):
+        return jsonify({
+            'success': False,
+            'error': 'El campo id_paciente es obligatorio.'
+        }), 400
+    if data.get('id_agenda_detalle') in (None, "", "null") and (
+            data.get('id_especialidad') in (None, "", "null") or not data.get('fecha')):
+        return jsonify({
+            'success': False,
+            'error': 'Indique id_agenda_detalle, o bien id_especialidad y fecha.'
+        }), 400
+
+    try:
+        entrada = ListaEsperaDao().agregarEspera(
+            data['id_paciente'],
+            id_agenda_detalle=data.get('id_agenda_detalle') or None,
+            id_especialidad=data.get('id_especialidad') or None,
+            fecha=data.get('fecha') or None,
+            id_medico=data.get('id_medico') or None,
+            motivo_consulta=data.get('motivo_consulta')
+        )
+
+        if entrada == "DUPLICADA":
+            return jsonify({
+                'success': False,
+                'error': 'El paciente ya está en espera de este turno.'
+            }), 409
+
+        if entrada:
+            return jsonify({
+                'success': True,
+                'data': entrada,
+                'error': None
+            }), 201
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo agregar a la lista de espera.'
+            }), 500
+
+    except Exception as e:
+        app.logger.error(f"Error al agregar a la lista de espera: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al agregar a la lista de espera.'
+        }), 500
+
+@citaapi.route('/lista-espera/<int:id_lista_espera>/aceptar', methods=['POST'])
+@unidad_de_trabajo
+def aceptarOfertaListaEspera(id_lista_espera):
+    """
+    Convierte el cupo ofrecido en cita. Si no se indica id_cita_cabecera se crea
+    una cabecera para el paciente en la agenda del turno ofrecido.
+    """
+    data = request.get_json() or {}
+    if data.get('id_estado_cita') in (None, "", "null"):
+        return jsonify({
+            'success': False,
+            'error': 'El campo id_estado_cita es obligatorio.'
+        }), 400
+
+    listadao = ListaEsperaDao()
+    try:
+        oferta = listadao.getOferta(id_lista_espera)
+        if not oferta:
+            return jsonify({
+                'success': False,
+                'error': f'No hay una oferta activa para la entrada {id_lista_espera}.'
+            }), 404
+
+        id_cita_cabecera = data.get('id_cita_cabecera') or CitaDao().guardarCitaCabecera(
+            oferta['id_paciente'],
+            oferta['id_agenda_cabecera'],
+            obtener_id_funcionario_actual(),
+            data.get('observaciones')
+        )
+        if not id_cita_cabecera:
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo crear la cabecera de la cita.'
+            }), 500
+
+        motivo = data.get('motivo_consulta') or oferta['motivo_consulta'] or 'Lista de espera'
+        detalle_id = ReservaCupoDao().confirmarReserva(
+            oferta['token'],
+            id_cita_cabecera,
+            oferta['fecha_cita'],
+            oferta['hora_cita'],
+            motivo,
+            data['id_estado_cita']
+        )
+
+        if detalle_id == "VENCIDA":
+            return jsonify({
+                'success': False,
+                'error': 'La oferta venció.'
+            }), 410
+
+        if not detalle_id or not listadao.marcarAceptada(id_lista_espera, detalle_id):
+            return jsonify({
+                'success': False,
+                'error': 'No se pudo confirmar la oferta.'
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'id_lista_espera': id_lista_espera,
+                'id_cita_cabecera': id_cita_cabecera,
+                'id_cita_detalle': detalle_id,
+                'id_agenda_detalle': oferta['id_agenda_detalle'],
+                'fecha_cita': oferta['fecha_cita'].isoformat(),
+                'hora_cita': serialize_time(oferta['hora_cita']),
+                'motivo_consulta': motivo,
+                'id_estado_cita': data['id_estado_cita']
+            },
+            'error': None
+        }), 201
+
+    except Exception as e:
+        app.logger.error(f"Error al aceptar la oferta {id_lista_espera}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al aceptar la oferta.'
+        }), 500
+
+@citaapi.route('/lista-espera/<int:id_lista_espera>/rechazar', methods=['POST'])
+@unidad_de_trabajo
+def rechazarOfertaListaEspera(id_lista_espera):
+    """Libera el cupo ofrecido; se ofrece automáticamente al siguiente en espera"""
+    try:
+        if ListaEsperaDao().rechazarOferta(id_lista_espera):
+            return jsonify({
+                'success': True,
+                'mensaje': 'Oferta rechazada. El cupo pasó al siguiente en espera.',
+                'error': None
+            }), 200
+        else:
+            return jsonify({
+                'success': False,
+                'error': f'No hay una oferta activa para la entrada {id_lista_espera}.'
+            }), 404
+    except Exception as e:
+        app.logger.error(f"Error al rechazar la oferta {id_lista_espera}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al rechazar la oferta.'
+        }), 500
+
+@citaapi.route('/lista-espera/<int:id_lista_espera>', methods=['DELETE'])
+@unidad_de_trabajo
+def deleteListaEspera(id_lista_espera):
+    try:
+        if ListaEsperaDao().cancelarEspera(id_lista_espera):
+            return jsonify({
+                'success': True,
+                'mensaje': f'Entrada {id_lista_espera} quitada de la lista de espera.',
+                'error': None
+            }), 200
+        else:
+            return jsonify({
+                'success': False,
+                'error': f'No se encontró una entrada en espera con ID {id_lista_espera}.'
+            }), 404
+    except Exception as e:
+        app.logger.error(f"Error al cancelar la entrada {id_lista_espera}: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Ocurrió un error al quitar la entrada de la lista de espera.'
+        }), 500
+
 # ========================================
 # API - UTILIDADES
 # ========================================
 
 @citaapi.route('/agenda-detalle/cupos/<int:id_agenda_detalle>', methods=['GET'])
+@con_etag('agenda_detalle')
 def verificarCupos(id_agenda_detalle):
     citadao = CitaDao()
     try:
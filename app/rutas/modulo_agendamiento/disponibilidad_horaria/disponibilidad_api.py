@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales_agendamiento.disponibilidad_horaria.DisponibilidadHorariaDao import DisponibilidadDao
 from datetime import datetime
 
@@ -6,6 +7,7 @@ disponibilidadapi = Blueprint('disponibilidadapi', __name__)
 
 # 🔹 Obtener todas las disponibilidades
 @disponibilidadapi.route('/disponibilidades', methods=['GET'])
+@con_etag('disponibilidad_horaria', 'medico', 'dias', 'turnos')
 def getDisponibilidades():
     dao = DisponibilidadDao()
     try:
@@ -19,6 +21,7 @@ def getDisponibilidades():
 
 # 🔹 Obtener disponibilidades por médico y fecha (para agenda)
 @disponibilidadapi.route('/disponibilidades/medico-fecha', methods=['GET'])
+@con_etag('disponibilidad_horaria', 'medico', 'dias', 'turnos')
 def getDisponibilidadesPorMedicoFecha():
     id_medico = request.args.get('id_medico')
     fecha = request.args.get('fecha')  # formato YYYY-MM-DD
@@ -40,6 +43,7 @@ def getDisponibilidadesPorMedicoFecha():
 
 # 🔹 Obtener disponibilidad por ID
 @disponibilidadapi.route('/disponibilidades/<int:id_disponibilidad>', methods=['GET'])
+@con_etag('disponibilidad_horaria', 'medico', 'dias', 'turnos')
 def getDisponibilidadById(id_disponibilidad):
     dao = DisponibilidadDao()
     try:
@@ -165,4 +169,122 @@ def deleteDisponibilidad(id_disponibilidad):
         return jsonify({'success': False, 'error': 'No se encontró la disponibilidad o no se pudo eliminar'}), 404
     except Exception as e:
         app.logger.error(f"Error al eliminar disponibilidad: {str(e)}")
-        return jsonify({'success': False, 'error': 'Error interno'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+# ================================================================
+# VALIDACIÓN E IMPORTACIÓN EN LOTE
+# ================================================================
+
+MAX_DISPONIBILIDADES_LOTE = 2000
+
+
+def leer_hora(valor):
+    """Acepta HH:MM o HH:MM:SS"""
+    texto = str(valor)
+    if len(texto) == 5:  # formato HH:MM
+        texto += ':00'
+    return datetime.strptime(texto, "%H:%M:%S").time()
+
+
+def leer_disponibilidad(item, campos_requeridos):
+    """Normaliza una disponibilidad del lote; lanza ValueError o TypeError si es inválida."""
+    if not isinstance(item, dict):
+        raise ValueError('debe ser un objeto')
+    for campo in campos_requeridos:
+        if campo not in item or item[campo] in (None, ''):
+            raise ValueError(f'el campo {campo} es obligatorio')
+    propuesta = {
+        'id_disponibilidad': int(item['id_disponibilidad']) if item.get('id_disponibilidad') else None,
+        'id_medico': int(item['id_medico']),
+        'dispo_fecha': datetime.strptime(item['dispo_fecha'], "%Y-%m-%d").date(),
+        'dispo_hora_inicio': leer_hora(item['dispo_hora_inicio']),
+        'dispo_hora_fin': leer_hora(item['dispo_hora_fin'])
+    }
+    if propuesta['dispo_hora_fin'] <= propuesta['dispo_hora_inicio']:
+        raise ValueError('la hora de fin debe ser posterior a la de inicio')
+    for campo in ('id_dia', 'id_turno', 'dispo_cupos'):
+        if campo in item:
+            propuesta[campo] = int(item[campo])
+    return propuesta
+
+
+def leer_lote_disponibilidades(data, campos_requeridos):
+    """
+    Normaliza {"disponibilidades": [...]}; lanza ValueError indicando la posición del error.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('disponibilidades'), list) or not data['disponibilidades']:
+        raise ValueError('Debe enviar disponibilidades como array no vacío')
+    if len(data['disponibilidades']) > MAX_DISPONIBILIDADES_LOTE:
+        raise ValueError(f'El lote no puede superar {MAX_DISPONIBILIDADES_LOTE} disponibilidades')
+
+    propuestas = []
+    for i, item in enumerate(data['disponibilidades']):
+        try:
+            propuestas.append(leer_disponibilidad(item, campos_requeridos))
+        except (TypeError, ValueError) as e:
+            # Tipos inválidos (ej. una fecha numérica) también son un error del lote, no un 500
+            raise ValueError(f'Disponibilidad {i}: {str(e)}')
+    return propuestas
+
+
+# 🔹 Validar un lote de disponibilidades contra las existentes (sin guardar)
+# Body: {"disponibilidades": [{id_medico, dispo_fecha, dispo_hora_inicio, dispo_hora_fin, id_disponibilidad?}, ...]}
+@disponibilidadapi.route('/disponibilidades/validar', methods=['POST'])
+def validarDisponibilidades():
+    dao = DisponibilidadDao()
+    try:
+        propuestas = leer_lote_disponibilidades(
+            request.get_json(),
+            ['id_medico', 'dispo_fecha', 'dispo_hora_inicio', 'dispo_hora_fin']
+        )
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+
+    try:
+        reporte = dao.validarDisponibilidades(propuestas)
+        if reporte is None:
+            return jsonify({'success': False, 'error': 'No se pudo validar el lote'}), 500
+        return jsonify({
+            'success': True,
+            'data': {
+                'validas': sum(1 for r in reporte if r['valida']),
+                'con_solapamiento': sum(1 for r in reporte if not r['valida']),
+                'resultados': reporte
+            },
+            'error': None
+        }), 200
+    except Exception as e:
+        app.logger.error(f"Error al validar disponibilidades: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
+
+
+# 🔹 Importar un lote de disponibilidades (todo o nada)
+@disponibilidadapi.route('/disponibilidades/lote', methods=['POST'])
+def addDisponibilidadesLote():
+    dao = DisponibilidadDao()
+    try:
+        propuestas = leer_lote_disponibilidades(
+            request.get_json(),
+            ['id_medico', 'id_dia', 'id_turno', 'dispo_fecha', 'dispo_hora_inicio', 'dispo_hora_fin', 'dispo_cupos']
+        )
+    except ValueError as ve:
+        return jsonify({'success': False, 'error': f'Error en formato de datos: {str(ve)}'}), 400
+
+    try:
+        resultado = dao.guardarDisponibilidadesLote(propuestas)
+        if resultado is None:
+            return jsonify({'success': False, 'error': 'No se pudo guardar el lote'}), 500
+        if resultado['conflictos']:
+            return jsonify({
+                'success': False,
+                'data': {'conflictos': resultado['conflictos']},
+                'error': 'El lote tiene horarios solapados; no se guardó ninguna disponibilidad'
+            }), 409
+        return jsonify({
+            'success': True,
+            'data': {'ids_creados': resultado['ids'], 'cantidad': len(resultado['ids'])},
+            'error': None
+        }), 201
+    except Exception as e:
+        app.logger.error(f"Error al importar disponibilidades: {str(e)}")
+        return jsonify({'success': False, 'error': 'Error interno'}), 500
@@ -49,8 +49,26 @@ def getOdontogramas():
     """
     Obtiene todos los odontogramas
     Endpoint: GET /api/v1/odontogramas
+    Paginado: GET /api/v1/odontogramas?limite=50&cursor=<siguiente>
     """
     odontograma_dao = OdontogramaDao()
+    # Con ?cursor= o ?limite= se responde paginado por cursor (keyset)
+    if 'cursor' in request.args or 'limite' in request.args:
+        try:
+            pagina = odontograma_dao.getOdontogramasPagina(request.args.get('cursor'), request.args.get('limite'))
+        except ValueError as ve:
+            return jsonify({'success': False, 'error': str(ve)}), 400
+        return jsonify({
+            'success': True,
+            'data': pagina['data'],
+            'paginacion': {
+                'limite': pagina['limite'],
+                'siguiente': pagina['siguiente'],
+                'anterior': pagina['anterior']
+            },
+            'error': None
+        }), 200
+
     try:
         odontogramas = odontograma_dao.getOdontogramas()
         return jsonify({
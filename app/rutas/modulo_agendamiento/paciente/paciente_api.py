@@ -9,6 +9,23 @@ pacienteapi = Blueprint('pacienteapi', __name__)
 @pacienteapi.route('/pacientes', methods=['GET'])
 def getPacientes():
     pacientedao = PacienteDao()
+    # Con ?cursor= o ?limite= se responde paginado por cursor (keyset)
+    if 'cursor' in request.args or 'limite' in request.args:
+        try:
+            pagina = pacientedao.getPacientesPagina(request.args.get('cursor'), request.args.get('limite'))
+        except ValueError as ve:
+            return jsonify({'success': False, 'error': str(ve)}), 400
+        return jsonify({
+            'success': True,
+            'data': pagina['data'],
+            'paginacion': {
+                'limite': pagina['limite'],
+                'siguiente': pagina['siguiente'],
+                'anterior': pagina['anterior']
+            },
+            'error': None
+        }), 200
+
     try:
         pacientes = pacientedao.getPacientes()
         return jsonify({'success': True, 'data': pacientes, 'error': None}), 200
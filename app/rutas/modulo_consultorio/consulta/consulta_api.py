@@ -20,9 +20,27 @@ def getConsultas():
     Obtiene todas las consultas médicas
     
     URL: GET /api/v1/consultas
+    Paginado: GET /api/v1/consultas?limite=50&cursor=<siguiente>
     """
     consultaDao = ConsultaDao()
 
+    # Con ?cursor= o ?limite= se responde paginado por cursor (keyset)
+    if 'cursor' in request.args or 'limite' in request.args:
+        try:
+            pagina = consultaDao.getConsultasPagina(request.args.get('cursor'), request.args.get('limite'))
+        except ValueError as ve:
+            return jsonify({'success': False, 'error': str(ve)}), 400
+        return jsonify({
+            'success': True,
+            'data': pagina['data'],
+            'paginacion': {
+                'limite': pagina['limite'],
+                'siguiente': pagina['siguiente'],
+                'anterior': pagina['anterior']
+            },
+            'error': None
+        }), 200
+
     try:
         consultas = consultaDao.getConsultas()
 
@@ -20,9 +20,27 @@ def getDiagnosticosMedicos():
     Obtiene todos los diagnósticos médicos
     
     URL: GET /api/v1/diagnosticos-medicos
+    Paginado: GET /api/v1/diagnosticos-medicos?limite=50&cursor=<siguiente>
     """
     diagnosticoDao = DiagnosticoDao()
 
+    # Con ?cursor= o ?limite= se responde paginado por cursor (keyset)
+    if 'cursor' in request.args or 'limite' in request.args:
+        try:
+            pagina = diagnosticoDao.getDiagnosticosPagina(request.args.get('cursor'), request.args.get('limite'))
+        except ValueError as ve:
+            return jsonify({'success': False, 'error': str(ve)}), 400
+        return jsonify({
+            'success': True,
+            'data': pagina['data'],
+            'paginacion': {
+                'limite': pagina['limite'],
+                'siguiente': pagina['siguiente'],
+                'anterior': pagina['anterior']
+            },
+            'error': None
+        }), 200
+
     try:
         diagnosticos = diagnosticoDao.getDiagnosticos()
 
@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 import re
 from app.dao.referenciales.cargo.CargoDao import CargoDao
 
@@ -17,6 +18,7 @@ def validar_ciudad(nombre):
 # Trae todos los cargos
 # -------------------------
 @cargoapi.route('/cargos', methods=['GET'])
+@con_etag('cargo')
 def getCargos():
     cargodao = CargoDao()
     try:
@@ -38,6 +40,7 @@ def getCargos():
 # Trae un cargo por ID
 # -------------------------
 @cargoapi.route('/cargos/<int:cargo_id>', methods=['GET'])
+@con_etag('cargo')
 def getCargo(cargo_id):
     cargodao = CargoDao()
     try:
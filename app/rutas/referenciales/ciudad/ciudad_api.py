@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.ciudad.CiudadDao import CiudadDao
 
 ciuapi = Blueprint('ciuapi', __name__)
 
 # Trae todas las ciudades
 @ciuapi.route('/ciudades', methods=['GET'])
+@con_etag('ciudades')
 def getCiudades():
     ciudao = CiudadDao()
 
@@ -25,6 +27,7 @@ def getCiudades():
         }), 500
 
 @ciuapi.route('/ciudades/<int:ciudad_id>', methods=['GET'])
+@con_etag('ciudades')
 def getCiudad(ciudad_id):
     ciudao = CiudadDao()
 
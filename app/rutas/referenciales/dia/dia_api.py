@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.dia.DiaDao import DiaDao
 
 diaapi = Blueprint('diaapi', __name__)
@@ -8,6 +9,7 @@ DIAS_VALIDOS = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES']
 
 # Trae todos los días
 @diaapi.route('/dias', methods=['GET'])
+@con_etag('dias')
 def getDias():
     diadao = DiaDao()
 
@@ -28,6 +30,7 @@ def getDias():
         }), 500
 
 @diaapi.route('/dias/<int:dia_id>', methods=['GET'])
+@con_etag('dias')
 def getDia(dia_id):
     diadao = DiaDao()
 
@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.especialidad.EspecialidadDao import EspecialidadDao
 
 especiapi = Blueprint('especiapi', __name__)
 
 # Trae todas las especialidades
 @especiapi.route('/especialidades', methods=['GET'])
+@con_etag('especialidades')
 def getEspecialidades():
     especialidaddao = EspecialidadDao()
     try:
@@ -22,6 +24,7 @@ def getEspecialidades():
         }), 500
 
 @especiapi.route('/especialidades/<int:id_especialidad>', methods=['GET'])
+@con_etag('especialidades')
 def getEspecialidad(id_especialidad):
     especialidaddao = EspecialidadDao()
     try:
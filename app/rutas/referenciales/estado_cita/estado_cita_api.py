@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.estado_cita.EstadoCitaDao import EstadoCitaDao
 
 estacitapi = Blueprint('estacitapi', __name__)
@@ -9,6 +10,7 @@ ESTADOCITA_VALIDOS= ['RESERVADO', 'CONFIRMADO', 'REALIZADO', 'CANCELADO']
 
 # Trae todos los Estados de la Cita
 @estacitapi.route('/estadocita', methods=['GET'])
+@con_etag('estado_cita')
 def getEstadosCita():
     estacitdao = EstadoCitaDao()
 
@@ -29,6 +31,7 @@ def getEstadosCita():
         }), 500
 
 @estacitapi.route('/estadoscitas/<int:estado_id>', methods=['GET'])
+@con_etag('estado_cita')
 def getEstadoCita(estado_id):
     estacitdao = EstadoCitaDao()
 
@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.paises.PaisDao import PaisDao
 
 paisapi = Blueprint('paisapi', __name__)
 
 # Trae todos los paises
 @paisapi.route('/paises', methods=['GET'])
+@con_etag('paises')
 def getPaises():
     paisdao = PaisDao()
 
@@ -25,6 +27,7 @@ def getPaises():
         }), 500
 
 @paisapi.route('/paises/<int:pais_id>', methods=['GET'])
+@con_etag('paises')
 def getPais(pais_id):
     paisdao = PaisDao()
 
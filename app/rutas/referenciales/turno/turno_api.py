@@ -1,4 +1,5 @@
 from flask import Blueprint, request, jsonify, current_app as app
+from app.rutas.etag import con_etag
 from app.dao.referenciales.turno.TurnoDao import TurnoDao
 
 turnoapi = Blueprint('turnoapi', __name__)
@@ -8,6 +9,7 @@ TURNOS_VALIDOS= ['MAÑANA', 'TARDE', 'NOCHE']
 
 # Trae todos los turnos
 @turnoapi.route('/turnos', methods=['GET'])
+@con_etag('turnos')
 def getTurnos():
     turnodao = TurnoDao()
 
@@ -28,6 +30,7 @@ def getTurnos():
         }), 500
 
 @turnoapi.route('/turnos/<int:id_turno>', methods=['GET'])
+@con_etag('turnos')
 def getTurno(id_turno):
     turnodao = TurnoDao()
 
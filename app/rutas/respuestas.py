@@ -0,0 +1,45 @@
+"""
+Respuestas JSON en streaming para listados grandes.
+
+En lugar de armar la lista completa y llamar a jsonify (resultado de la
+base + lista de dicts + string JSON en memoria a la vez), se escribe el
+arreglo JSON de a trozos a medida que llegan las filas.
+"""
+
+import json
+from flask import Response, stream_with_context, current_app as app
+
+# Cantidad de elementos que se serializan juntos en cada trozo enviado
+ELEMENTOS_POR_TROZO = 200
+
+
+def respuesta_json_stream(filas, mensaje_error='Ocurrió un error al consultar los datos.'):
+    """
+    Devuelve un Response que escribe {"data": [...], "success": ..., "error": ...}
+    consumiendo el iterable `filas` (dicts) de forma incremental.
+    Si falla a mitad de camino el arreglo se cierra y success queda en false.
+    """
+    def generar():
+        yield '{"data": ['
+        trozo = []
+        primero = True
+        error = None
+        try:
+            for fila in filas:
+                trozo.append(json.dumps(fila, default=str, ensure_ascii=False))
+                if len(trozo) >= ELEMENTOS_POR_TROZO:
+                    yield ('' if primero else ',') + ','.join(trozo)
+                    primero = False
+                    trozo = []
+            if trozo:
+                yield ('' if primero else ',') + ','.join(trozo)
+        except Exception as e:
+            app.logger.error(f"Error durante la respuesta en streaming: {str(e)}")
+            error = mensaje_error
+
+        if error:
+            yield '], "success": false, "error": ' + json.dumps(error, ensure_ascii=False) + '}'
+        else:
+            yield '], "success": true, "error": null}'
+
+    return Response(stream_with_context(generar()), mimetype='application/json')
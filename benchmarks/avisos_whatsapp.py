@@ -0,0 +1,100 @@
+"""
+Benchmark del envío de avisos: avisos/segundo de punta a punta a través de
+AvisoRecordatorioService.procesar_avisos_pendientes, con TransporteSimulado
+en lugar del navegador.
+
+Crea N avisos de WhatsApp pendientes para un paciente con teléfono y los
+procesa dentro de una sola transacción que al final se deshace: la base
+queda como estaba (los avisos pendientes que ya existían también se
+procesan, y se cuentan en el resultado).
+
+Uso (desde la raíz del proyecto, con la base configurada en Conexion):
+    python -m benchmarks.avisos_whatsapp --avisos 500 --latencia 0.005 --fallos 0.02
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from flask import g
+
+from app import app
+from app.conexion.Conexion import Conexion
+from app.conexion.UnidadTrabajo import ConexionCompartida
+from app.Services.transporte_avisos import TransporteSimulado
+from app.Services.whatsapp_service import AvisoRecordatorioService
+
+
+def crear_avisos(con, cantidad):
+    """Inserta `cantidad` avisos pendientes de prueba. Retorna False si faltan datos base."""
+    cur = con.cursor()
+    try:
+        cur.execute("""
+            SELECT p.id_paciente, f.id_funcionario
+            FROM paciente p, funcionario f
+            WHERE COALESCE(p.telefono, '') <> ''
+            ORDER BY p.id_paciente, f.id_funcionario
+            LIMIT 1
+        """)
+        fila = cur.fetchone()
+        if fila is None:
+            return False
+        cur.execute("""
+            INSERT INTO avisos_recordatorios (
+                id_paciente, id_funcionario, fecha_cita, hora_cita,
+                forma_envio, mensaje, estado_envio, estado_confirmacion
+            )
+            SELECT %s, %s, CURRENT_DATE + 1, TIME '08:00' + (n %% 600) * INTERVAL '1 minute',
+                   'WhatsApp', NULL, 'Pendiente', 'Pendiente'
+            FROM generate_series(1, %s) AS n
+        """, (fila[0], fila[1], cantidad))
+        return True
+    finally:
+        cur.close()
+
+
+def ejecutar(cantidad, latencia, tasa_fallos, semilla, verbose):
+    transporte = TransporteSimulado(latencia=latencia, tasa_fallos=tasa_fallos, semilla=semilla)
+    servicio = AvisoRecordatorioService(transporte)
+
+    con = Conexion.getPool().getconn()
+    try:
+        with app.test_request_context():
+            # Todas las conexiones del servicio comparten esta transacción
+            g._unidad_trabajo = ConexionCompartida(con)
+            if not crear_avisos(con, cantidad):
+                print("Se necesita al menos un paciente con teléfono y un funcionario")
+                return
+
+            salida = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            inicio = time.perf_counter()
+            with salida:
+                resumen = servicio.procesar_avisos_pendientes()
+            duracion = time.perf_counter() - inicio
+    finally:
+        con.rollback()
+        con.close()
+
+    print(f"Avisos procesados: {resumen['procesados']} "
+          f"(exitosos {resumen['exitosos']}, reprogramados {resumen['reprogramados']}, "
+          f"fallidos {resumen['fallidos']})")
+    print(f"Mensajes en el transporte: {len(transporte.enviados)} enviados, {len(transporte.fallidos)} fallidos")
+    print(f"Duración: {duracion:.3f} s")
+    if duracion > 0:
+        print(f"Rendimiento: {resumen['procesados'] / duracion:.1f} avisos/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--avisos', type=int, default=200, help='Avisos pendientes a crear')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos por envío simulado')
+    parser.add_argument('--fallos', type=float, default=0.0, help='Probabilidad de fallo por envío (0 a 1)')
+    parser.add_argument('--semilla', type=int, default=1, help='Semilla de los fallos simulados')
+    parser.add_argument('--verbose', action='store_true', help='Muestra la salida del servicio')
+    args = parser.parse_args()
+    ejecutar(args.avisos, args.latencia, args.fallos, args.semilla, args.verbose)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+-- Índices para la paginación server-side de /api/v1/citas-cabecera
+-- (orden por defecto: fecha_registro DESC con desempate por id)
+CREATE INDEX IF NOT EXISTS idx_cita_cabecera_fecha_registro
+    ON cita_cabecera (fecha_registro DESC, id_cita_cabecera DESC);
+
+CREATE INDEX IF NOT EXISTS idx_cita_cabecera_agenda
+    ON cita_cabecera (id_agenda_cabecera);
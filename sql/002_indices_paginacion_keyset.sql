@@ -0,0 +1,19 @@
+-- Índices que cubren la clave de orden de la paginación por cursor (keyset).
+-- Con ellos cada página es un index scan de "limite + 1" filas.
+
+CREATE INDEX IF NOT EXISTS idx_odontograma_keyset
+    ON odontograma (fecha_registro DESC, id_odontograma DESC);
+
+CREATE INDEX IF NOT EXISTS idx_consultas_cab_keyset
+    ON consultas_cab (fecha_cita DESC, hora_cita DESC, id_consulta_cab DESC)
+    WHERE activo = true;
+
+CREATE INDEX IF NOT EXISTS idx_diagnosticos_keyset
+    ON diagnosticos (fecha_diagnostico DESC, fecha_registro DESC, id_diagnostico DESC);
+
+CREATE INDEX IF NOT EXISTS idx_avisos_keyset
+    ON avisos_recordatorios (
+        (COALESCE(fecha_cita, DATE '0001-01-01')) DESC,
+        (COALESCE(hora_cita, TIME '00:00')) DESC,
+        id_aviso DESC
+    );
@@ -0,0 +1,71 @@
+-- Bus de invalidación del cache de catálogos entre procesos (workers).
+-- Cada INSERT/UPDATE/DELETE en una tabla de catálogo emite un NOTIFY en el
+-- canal 'cache_catalogos' con la tabla y el ID afectado. El hilo de escucha
+-- de cada worker (app/dao/bus_invalidacion.py) desaloja las entradas.
+-- El NOTIFY se entrega recién al confirmar la transacción.
+--
+-- Payload: {"tabla": "ciudades", "id": 5}
+-- El argumento del trigger es el nombre de la columna ID de la tabla; si no
+-- existe, "id" llega null y el worker vacía el catálogo completo.
+
+CREATE OR REPLACE FUNCTION notificar_cambio_catalogo() RETURNS trigger AS $$
+DECLARE
+    fila jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        fila := to_jsonb(OLD);
+    ELSE
+        fila := to_jsonb(NEW);
+    END IF;
+
+    PERFORM pg_notify('cache_catalogos', json_build_object(
+        'tabla', TG_TABLE_NAME,
+        'id', fila -> TG_ARGV[0]
+    )::text);
+
+    -- Si un UPDATE cambió el ID, también se avisa el ID anterior
+    IF TG_OP = 'UPDATE' AND (to_jsonb(OLD) -> TG_ARGV[0]) IS DISTINCT FROM (fila -> TG_ARGV[0]) THEN
+        PERFORM pg_notify('cache_catalogos', json_build_object(
+            'tabla', TG_TABLE_NAME,
+            'id', to_jsonb(OLD) -> TG_ARGV[0]
+        )::text);
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON ciudades;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON ciudades
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_ciudad');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON paises;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON paises
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_pais');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON dias;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON dias
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_dia');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON turnos;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON turnos
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_turno');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON especialidades;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON especialidades
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_especialidad');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON cargo;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON cargo
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_cargo');
+
+DROP TRIGGER IF EXISTS trg_notificar_cache ON estado_cita;
+CREATE TRIGGER trg_notificar_cache
+    AFTER INSERT OR UPDATE OR DELETE ON estado_cita
+    FOR EACH ROW EXECUTE FUNCTION notificar_cambio_catalogo('id_estado_cita');
@@ -0,0 +1,47 @@
+-- Contadores de cambios por tabla para las respuestas condicionales (ETag / 304).
+-- Un trigger por sentencia incrementa la versión de la tabla en cada
+-- INSERT/UPDATE/DELETE/TRUNCATE. La API arma el ETag con las versiones de
+-- las tablas que lee un endpoint (una lectura por PK en una tabla chica),
+-- así un listado sin cambios responde 304 sin ejecutar el join.
+--
+-- El incremento es transaccional: la versión nueva se ve recién cuando se
+-- confirma el cambio, nunca antes que los datos.
+
+CREATE TABLE IF NOT EXISTS versiones_tablas (
+    tabla          VARCHAR(63) PRIMARY KEY,
+    version        BIGINT NOT NULL DEFAULT 0,
+    actualizado_en TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION incrementar_version_tabla() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO versiones_tablas (tabla, version, actualizado_en)
+    VALUES (TG_TABLE_NAME, 1, NOW())
+    ON CONFLICT (tabla) DO UPDATE
+        SET version = versiones_tablas.version + 1,
+            actualizado_en = NOW();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'agenda_cabecera', 'agenda_detalle', 'cita_cabecera', 'cita_detalle',
+        'disponibilidad_horaria', 'estado_cita', 'paciente', 'medico',
+        'ciudades', 'paises', 'dias', 'turnos', 'especialidades', 'cargo'
+    ]
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_tabla ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_version_tabla
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_tabla()',
+            t
+        );
+        INSERT INTO versiones_tablas (tabla) VALUES (t) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
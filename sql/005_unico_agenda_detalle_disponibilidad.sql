@@ -0,0 +1,12 @@
+-- Una disponibilidad se publica una sola vez por cabecera.
+-- La publicación masiva (AgendaDetalleDao.publicarDisponibilidades) usa
+-- ON CONFLICT DO NOTHING sobre este índice para que dos publicaciones
+-- simultáneas no dupliquen detalles.
+--
+-- Si ya hay duplicados, listarlos antes de crear el índice:
+--   SELECT id_agenda_cabecera, id_disponibilidad_horaria, COUNT(*)
+--   FROM agenda_detalle
+--   GROUP BY 1, 2 HAVING COUNT(*) > 1;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_agenda_detalle_cabecera_disponibilidad
+    ON agenda_detalle (id_agenda_cabecera, id_disponibilidad_horaria);
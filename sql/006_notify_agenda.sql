@@ -0,0 +1,73 @@
+-- Avisos de cambios en agenda_detalle y agenda_cabecera por el canal del bus
+-- de invalidación (ver sql/003_notify_cache_catalogos.sql). Los usa el índice
+-- en memoria de turnos libres (app/dao/indice_turnos.py) de cada worker.
+--
+-- Triggers por sentencia con tablas de transición: un aviso por ID afectado,
+-- o uno solo con "id": null si la sentencia tocó muchas filas (publicación o
+-- generación masiva), en cuyo caso el worker recarga el índice completo.
+
+CREATE OR REPLACE FUNCTION notificar_cambio_filas() RETURNS trigger AS $$
+DECLARE
+    cantidad INT;
+BEGIN
+    SELECT COUNT(*) INTO cantidad FROM filas;
+
+    IF cantidad > 100 THEN
+        PERFORM pg_notify('cache_catalogos', json_build_object(
+            'tabla', TG_TABLE_NAME,
+            'id', NULL
+        )::text);
+    ELSE
+        PERFORM pg_notify('cache_catalogos', json_build_object(
+            'tabla', TG_TABLE_NAME,
+            'id', c.id
+        )::text)
+        FROM (SELECT DISTINCT to_jsonb(f) -> TG_ARGV[0] AS id FROM filas f) c;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- agenda_detalle
+DROP TRIGGER IF EXISTS trg_notificar_insert ON agenda_detalle;
+CREATE TRIGGER trg_notificar_insert
+    AFTER INSERT ON agenda_detalle
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_detalle');
+
+DROP TRIGGER IF EXISTS trg_notificar_update ON agenda_detalle;
+CREATE TRIGGER trg_notificar_update
+    AFTER UPDATE ON agenda_detalle
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_detalle');
+
+DROP TRIGGER IF EXISTS trg_notificar_delete ON agenda_detalle;
+CREATE TRIGGER trg_notificar_delete
+    AFTER DELETE ON agenda_detalle
+    REFERENCING OLD TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_detalle');
+
+-- agenda_cabecera
+DROP TRIGGER IF EXISTS trg_notificar_insert ON agenda_cabecera;
+CREATE TRIGGER trg_notificar_insert
+    AFTER INSERT ON agenda_cabecera
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_cabecera');
+
+DROP TRIGGER IF EXISTS trg_notificar_update ON agenda_cabecera;
+CREATE TRIGGER trg_notificar_update
+    AFTER UPDATE ON agenda_cabecera
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_cabecera');
+
+DROP TRIGGER IF EXISTS trg_notificar_delete ON agenda_cabecera;
+CREATE TRIGGER trg_notificar_delete
+    AFTER DELETE ON agenda_cabecera
+    REFERENCING OLD TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION notificar_cambio_filas('id_agenda_cabecera');
+
+-- Índice para buscar turnos por fecha de agenda (carga y búsqueda directa)
+CREATE INDEX IF NOT EXISTS idx_agenda_cabecera_fecha_activa
+    ON agenda_cabecera (fecha_agenda, id_especialidad)
+    WHERE estado = 'Activo';
@@ -0,0 +1,30 @@
+-- Rango horario (tsrange) de cada disponibilidad y restricción de exclusión:
+-- un médico no puede tener dos disponibilidades que se solapen.
+-- La base rechaza el solapamiento de forma atómica (también entre dos
+-- inserciones simultáneas), sin depender del "consultar y luego insertar".
+--
+-- Antes de agregar la restricción hay que resolver los solapamientos existentes:
+--   SELECT a.id_disponibilidad, b.id_disponibilidad
+--   FROM disponibilidad_horaria a
+--   JOIN disponibilidad_horaria b
+--     ON a.id_medico = b.id_medico
+--    AND a.id_disponibilidad < b.id_disponibilidad
+--    AND a.dispo_fecha = b.dispo_fecha
+--    AND a.dispo_hora_inicio < b.dispo_hora_fin
+--    AND a.dispo_hora_fin > b.dispo_hora_inicio;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE disponibilidad_horaria
+    ADD COLUMN IF NOT EXISTS rango TSRANGE
+    GENERATED ALWAYS AS (
+        tsrange(dispo_fecha + dispo_hora_inicio, dispo_fecha + dispo_hora_fin, '[)')
+    ) STORED;
+
+ALTER TABLE disponibilidad_horaria
+    DROP CONSTRAINT IF EXISTS excl_disponibilidad_solapada;
+
+-- El índice GiST de la restricción también sirve para las consultas de solapamiento (&&)
+ALTER TABLE disponibilidad_horaria
+    ADD CONSTRAINT excl_disponibilidad_solapada
+    EXCLUDE USING gist (id_medico WITH =, rango WITH &&);
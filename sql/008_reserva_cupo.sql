@@ -0,0 +1,25 @@
+-- Reservas temporales de cupo (holds) mientras se completa el formulario de la cita.
+-- Crear una reserva descuenta el cupo de agenda_detalle; confirmarla la convierte
+-- en cita_detalle; liberarla o dejarla vencer devuelve el cupo.
+-- El barrido de vencidas toma lotes con FOR UPDATE SKIP LOCKED sobre el índice
+-- parcial, así varios workers pueden barrer a la vez sin bloquear la tabla.
+
+CREATE TABLE IF NOT EXISTS reserva_cupo (
+    id_reserva        BIGSERIAL PRIMARY KEY,
+    token             UUID NOT NULL UNIQUE,
+    id_agenda_detalle INT NOT NULL REFERENCES agenda_detalle(id_agenda_detalle) ON DELETE CASCADE,
+    estado            VARCHAR(20) NOT NULL DEFAULT 'Activa'
+                      CHECK (estado IN ('Activa', 'Confirmada', 'Liberada', 'Vencida')),
+    creada_en         TIMESTAMP NOT NULL DEFAULT NOW(),
+    expira_en         TIMESTAMP NOT NULL,
+    cerrada_en        TIMESTAMP
+);
+
+-- Solo las reservas activas: el índice queda chico aunque la tabla crezca
+CREATE INDEX IF NOT EXISTS idx_reserva_cupo_activas_expira
+    ON reserva_cupo (expira_en)
+    WHERE estado = 'Activa';
+
+CREATE INDEX IF NOT EXISTS idx_reserva_cupo_activas_detalle
+    ON reserva_cupo (id_agenda_detalle, expira_en)
+    WHERE estado = 'Activa';
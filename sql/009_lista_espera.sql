@@ -0,0 +1,187 @@
+-- Lista de espera por turno (agenda_detalle) o por especialidad + fecha,
+-- con promoción automática cuando se libera un cupo.
+--
+-- Cada vez que una sentencia aumenta cupos_disponibles en agenda_detalle
+-- (cancelación, eliminación de detalle o cabecera, reserva liberada o vencida,
+-- reconciliación) un trigger por sentencia ofrece esos cupos, en la misma
+-- transacción, a los primeros pacientes en espera: el cupo queda retenido con
+-- una reserva_cupo (sql/008) y la entrada pasa a 'Ofrecida'. Si la oferta vence
+-- o se rechaza, el cupo vuelve y el mismo trigger lo ofrece al siguiente.
+--
+-- Solo se leen las entradas en espera de los turnos liberados (índices
+-- parciales), nunca la lista completa. Requiere PostgreSQL 13+ (gen_random_uuid).
+
+CREATE TABLE IF NOT EXISTS lista_espera (
+    id_lista_espera   BIGSERIAL PRIMARY KEY,
+    id_paciente       INT NOT NULL REFERENCES paciente(id_paciente),
+    -- Turno puntual, o bien especialidad + fecha (y opcionalmente médico)
+    id_agenda_detalle INT REFERENCES agenda_detalle(id_agenda_detalle) ON DELETE CASCADE,
+    id_especialidad   INT,
+    id_medico         INT,
+    fecha             DATE,
+    motivo_consulta   TEXT,
+    estado            VARCHAR(20) NOT NULL DEFAULT 'Esperando'
+                      CHECK (estado IN ('Esperando', 'Ofrecida', 'Aceptada', 'Rechazada', 'Vencida', 'Cancelada')),
+    token_reserva     UUID,
+    id_cita_detalle   INT,
+    creada_en         TIMESTAMP NOT NULL DEFAULT NOW(),
+    ofrecida_en       TIMESTAMP,
+    CHECK (id_agenda_detalle IS NOT NULL OR (id_especialidad IS NOT NULL AND fecha IS NOT NULL))
+);
+
+CREATE INDEX IF NOT EXISTS idx_lista_espera_detalle
+    ON lista_espera (id_agenda_detalle, creada_en)
+    WHERE estado = 'Esperando' AND id_agenda_detalle IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_lista_espera_especialidad_fecha
+    ON lista_espera (id_especialidad, fecha, creada_en)
+    WHERE estado = 'Esperando' AND id_agenda_detalle IS NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lista_espera_ofertas
+    ON lista_espera (token_reserva)
+    WHERE estado = 'Ofrecida';
+
+-- Un paciente no puede esperar dos veces el mismo turno
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lista_espera_unica_detalle
+    ON lista_espera (id_paciente, id_agenda_detalle)
+    WHERE estado IN ('Esperando', 'Ofrecida') AND id_agenda_detalle IS NOT NULL;
+
+
+-- Ofrece los cupos libres de los agenda_detalle indicados a la lista de espera.
+-- Retorna la cantidad de ofertas creadas.
+CREATE OR REPLACE FUNCTION ofrecer_cupos_lista_espera(
+    ids INT[],
+    duracion INTERVAL DEFAULT INTERVAL '30 minutes'
+) RETURNS INT AS $$
+DECLARE
+    ofertas INT;
+BEGIN
+    IF ids IS NULL OR cardinality(ids) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    -- Ofertas cuya reserva ya venció o se liberó: se cierran antes de ofrecer de nuevo
+    UPDATE lista_espera le
+    SET estado = CASE WHEN r.estado = 'Vencida' THEN 'Vencida' ELSE 'Rechazada' END
+    FROM reserva_cupo r
+    WHERE le.estado = 'Ofrecida'
+      AND r.token = le.token_reserva
+      AND r.estado IN ('Vencida', 'Liberada')
+      AND r.id_agenda_detalle = ANY(ids);
+
+    WITH libres AS (
+        SELECT ad.id_agenda_detalle, ad.cupos_disponibles,
+               ac.id_especialidad, ac.id_medico, ac.fecha_agenda
+        FROM agenda_detalle ad
+        JOIN agenda_cabecera ac ON ac.id_agenda_cabecera = ad.id_agenda_cabecera
+        WHERE ad.id_agenda_detalle = ANY(ids)
+          AND ad.cupos_disponibles > 0
+          AND ad.estado_detalle <> 'Cancelado'
+          AND ac.estado = 'Activo'
+          AND ac.fecha_agenda >= CURRENT_DATE
+    ),
+    -- Por turno, los primeros en espera (a lo sumo tantos como cupos libres);
+    -- las filas tomadas por otra promoción concurrente se saltan
+    por_turno AS (
+        SELECT l.id_agenda_detalle, l.cupos_disponibles, c.id_lista_espera, c.creada_en
+        FROM libres l
+        CROSS JOIN LATERAL (
+            SELECT le.id_lista_espera, le.creada_en
+            FROM lista_espera le
+            WHERE le.estado = 'Esperando'
+              AND le.id_agenda_detalle = l.id_agenda_detalle
+            ORDER BY le.creada_en
+            LIMIT l.cupos_disponibles
+            FOR UPDATE SKIP LOCKED
+        ) c
+    ),
+    por_fecha AS (
+        SELECT l.id_agenda_detalle, l.cupos_disponibles, c.id_lista_espera, c.creada_en
+        FROM libres l
+        CROSS JOIN LATERAL (
+            SELECT le.id_lista_espera, le.creada_en
+            FROM lista_espera le
+            WHERE le.estado = 'Esperando'
+              AND le.id_agenda_detalle IS NULL
+              AND le.id_especialidad = l.id_especialidad
+              AND le.fecha = l.fecha_agenda
+              AND (le.id_medico IS NULL OR le.id_medico = l.id_medico)
+            ORDER BY le.creada_en
+            LIMIT l.cupos_disponibles
+            FOR UPDATE SKIP LOCKED
+        ) c
+    ),
+    candidatos AS (
+        SELECT * FROM por_turno
+        UNION ALL
+        SELECT * FROM por_fecha
+    ),
+    unicos AS (
+        -- Un paciente en espera de varios turnos liberados recibe solo el primero
+        SELECT DISTINCT ON (id_lista_espera) *
+        FROM candidatos
+        ORDER BY id_lista_espera, id_agenda_detalle
+    ),
+    asignados AS (
+        SELECT id_lista_espera, id_agenda_detalle, gen_random_uuid() AS token
+        FROM (
+            SELECT u.*, ROW_NUMBER() OVER (PARTITION BY id_agenda_detalle ORDER BY creada_en) AS orden
+            FROM unicos u
+        ) x
+        WHERE orden <= cupos_disponibles
+    ),
+    ofrecidas AS (
+        UPDATE lista_espera le
+        SET estado = 'Ofrecida', token_reserva = a.token, ofrecida_en = NOW()
+        FROM asignados a
+        WHERE le.id_lista_espera = a.id_lista_espera
+        RETURNING a.token, a.id_agenda_detalle
+    ),
+    reservas AS (
+        INSERT INTO reserva_cupo (token, id_agenda_detalle, expira_en)
+        SELECT token, id_agenda_detalle, NOW() + duracion
+        FROM ofrecidas
+        RETURNING id_agenda_detalle
+    ),
+    por_detalle AS (
+        SELECT id_agenda_detalle, COUNT(*) AS cantidad
+        FROM reservas
+        GROUP BY id_agenda_detalle
+    ),
+    descontados AS (
+        UPDATE agenda_detalle ad
+        SET cupos_disponibles = ad.cupos_disponibles - p.cantidad,
+            estado_detalle = CASE
+                WHEN ad.cupos_disponibles - p.cantidad = 0 THEN 'Agotado'
+                ELSE ad.estado_detalle
+            END
+        FROM por_detalle p
+        WHERE ad.id_agenda_detalle = p.id_agenda_detalle
+        RETURNING p.cantidad
+    )
+    SELECT COALESCE(SUM(cantidad), 0) INTO ofertas FROM descontados;
+
+    RETURN ofertas;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Trigger: solo los detalles cuyo cupo aumentó en la sentencia. El descuento que
+-- hace la propia promoción disminuye cupos, así que no vuelve a disparar ofertas.
+CREATE OR REPLACE FUNCTION promover_lista_espera() RETURNS trigger AS $$
+BEGIN
+    PERFORM ofrecer_cupos_lista_espera(ARRAY(
+        SELECT n.id_agenda_detalle
+        FROM nuevas n
+        JOIN viejas v ON v.id_agenda_detalle = n.id_agenda_detalle
+        WHERE n.cupos_disponibles > v.cupos_disponibles
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_promover_lista_espera ON agenda_detalle;
+CREATE TRIGGER trg_promover_lista_espera
+    AFTER UPDATE ON agenda_detalle
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION promover_lista_espera();
@@ -0,0 +1,90 @@
+-- Reconciliación de cupos: agenda_detalle.cupos_disponibles se mantiene con
+-- sumas y restas incrementales y puede desviarse tras una falla parcial.
+-- El valor esperado es:
+--     cupos_maximos - detalles de cita en estados que ocupan cupo - reservas activas
+--
+-- Para reconciliar solo lo que cambió, los triggers anotan en
+-- cupos_por_reconciliar cada turno tocado por cita_detalle o reserva_cupo
+-- (o al que le cambian cupos_maximos). El job toma lotes de esa tabla con
+-- FOR UPDATE SKIP LOCKED, así que correrlo cada pocos minutos cuesta en
+-- proporción a los cambios, no al tamaño de la agenda.
+
+CREATE TABLE IF NOT EXISTS cupos_por_reconciliar (
+    id_agenda_detalle INT PRIMARY KEY,
+    marcado_en        TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_cupos_por_reconciliar_marcado
+    ON cupos_por_reconciliar (marcado_en);
+
+CREATE OR REPLACE FUNCTION marcar_cupos_por_reconciliar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cupos_por_reconciliar (id_agenda_detalle)
+    SELECT DISTINCT (to_jsonb(f) ->> 'id_agenda_detalle')::int
+    FROM filas f
+    WHERE to_jsonb(f) ->> 'id_agenda_detalle' IS NOT NULL
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- cita_detalle: altas, bajas y cambios (en un cambio de turno se marcan los dos)
+DROP TRIGGER IF EXISTS trg_reconciliar_insert ON cita_detalle;
+CREATE TRIGGER trg_reconciliar_insert
+    AFTER INSERT ON cita_detalle
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+DROP TRIGGER IF EXISTS trg_reconciliar_update_nuevas ON cita_detalle;
+CREATE TRIGGER trg_reconciliar_update_nuevas
+    AFTER UPDATE ON cita_detalle
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+DROP TRIGGER IF EXISTS trg_reconciliar_update_viejas ON cita_detalle;
+CREATE TRIGGER trg_reconciliar_update_viejas
+    AFTER UPDATE ON cita_detalle
+    REFERENCING OLD TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+DROP TRIGGER IF EXISTS trg_reconciliar_delete ON cita_detalle;
+CREATE TRIGGER trg_reconciliar_delete
+    AFTER DELETE ON cita_detalle
+    REFERENCING OLD TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+-- reserva_cupo (sql/008): altas y cierres
+DROP TRIGGER IF EXISTS trg_reconciliar_insert ON reserva_cupo;
+CREATE TRIGGER trg_reconciliar_insert
+    AFTER INSERT ON reserva_cupo
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+DROP TRIGGER IF EXISTS trg_reconciliar_update ON reserva_cupo;
+CREATE TRIGGER trg_reconciliar_update
+    AFTER UPDATE ON reserva_cupo
+    REFERENCING NEW TABLE AS filas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_por_reconciliar();
+
+-- agenda_detalle: solo cuando cambia cupos_maximos (la corrección misma no se re-marca)
+CREATE OR REPLACE FUNCTION marcar_cupos_maximos_por_reconciliar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cupos_por_reconciliar (id_agenda_detalle)
+    SELECT n.id_agenda_detalle
+    FROM nuevas n
+    JOIN viejas v ON v.id_agenda_detalle = n.id_agenda_detalle
+    WHERE n.cupos_maximos IS DISTINCT FROM v.cupos_maximos
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_reconciliar_cupos_maximos ON agenda_detalle;
+CREATE TRIGGER trg_reconciliar_cupos_maximos
+    AFTER UPDATE ON agenda_detalle
+    REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+    FOR EACH STATEMENT EXECUTE FUNCTION marcar_cupos_maximos_por_reconciliar();
+
+-- Conteo por turno de los detalles de cita (reporte por rango de fechas)
+CREATE INDEX IF NOT EXISTS idx_cita_detalle_agenda_estado
+    ON cita_detalle (id_agenda_detalle, id_estado_cita);
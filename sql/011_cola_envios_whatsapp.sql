@@ -0,0 +1,27 @@
+-- Cola de envíos de WhatsApp. Los endpoints solo encolan y responden con el
+-- id_envio; un único proceso despachador (flask despachador-whatsapp) mantiene
+-- abierta una sesión de WhatsApp Web y procesa la cola de a un envío por vez.
+-- Al encolar se emite NOTIFY en el canal 'envios_whatsapp' para despertarlo.
+
+CREATE TABLE IF NOT EXISTS envios_whatsapp (
+    id_envio     BIGSERIAL PRIMARY KEY,
+    tipo         VARCHAR(20) NOT NULL CHECK (tipo IN ('aviso', 'pendientes')),
+    id_aviso     INT REFERENCES avisos_recordatorios(id_aviso) ON DELETE CASCADE,
+    estado       VARCHAR(20) NOT NULL DEFAULT 'En cola'
+                 CHECK (estado IN ('En cola', 'Enviando', 'Completado', 'Error')),
+    resultado    TEXT,
+    creado_en    TIMESTAMP NOT NULL DEFAULT NOW(),
+    iniciado_en  TIMESTAMP,
+    terminado_en TIMESTAMP,
+    CHECK (tipo <> 'aviso' OR id_aviso IS NOT NULL)
+);
+
+-- Siguiente envío de la cola (índice chico: solo los que esperan)
+CREATE INDEX IF NOT EXISTS idx_envios_whatsapp_en_cola
+    ON envios_whatsapp (id_envio)
+    WHERE estado = 'En cola';
+
+-- Clics repetidos no encolan dos veces el mismo aviso (ni dos corridas de pendientes)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_envios_whatsapp_unico_activo
+    ON envios_whatsapp (tipo, COALESCE(id_aviso, 0))
+    WHERE estado IN ('En cola', 'Enviando');
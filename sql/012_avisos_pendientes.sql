@@ -0,0 +1,7 @@
+-- Selección de avisos pendientes de envío por canal (AvisoRecordatorioDao.tomarAvisosPendientes).
+-- El índice parcial solo contiene los avisos en 'Pendiente', así que el lote
+-- se lee en orden de cita sin recorrer el historial de avisos ya enviados.
+
+CREATE INDEX IF NOT EXISTS idx_avisos_pendientes
+    ON avisos_recordatorios (forma_envio, fecha_cita, hora_cita, id_aviso)
+    WHERE estado_envio = 'Pendiente';
@@ -0,0 +1,14 @@
+-- Toma de avisos por trabajador (outbox): varios procesos pueden enviar
+-- recordatorios en paralelo sin mandar dos veces el mismo aviso.
+--
+-- Cada trabajador toma un lote de avisos 'Pendiente' con FOR UPDATE SKIP LOCKED
+-- y anota tomado_por/tomado_en (e incrementa intentos). Los demás saltean esos
+-- avisos mientras la toma esté vigente; si el trabajador muere, la toma vence
+-- (AVISOS_TOMA_VENCIMIENTO) y otro la vuelve a tomar.
+-- El resultado solo se guarda si el trabajador sigue siendo el dueño de la
+-- toma, o si el aviso se envió y sigue pendiente, así que repetirlo no cambia nada.
+
+ALTER TABLE avisos_recordatorios
+    ADD COLUMN IF NOT EXISTS tomado_por VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS tomado_en  TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS intentos   INT NOT NULL DEFAULT 0;
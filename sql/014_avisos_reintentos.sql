@@ -0,0 +1,20 @@
+-- Reintentos de avisos con espera exponencial.
+--
+-- Un envío fallido ya no pasa directo a 'Error': el aviso sigue 'Pendiente'
+-- y proximo_intento_en se corre a NOW() + min(espera_maxima, espera_base * 2^(intentos-1)),
+-- con jitter (entre la mitad y el total de esa espera) para que los avisos que
+-- fallaron juntos no se reintenten todos en el mismo momento.
+-- Al agotar AVISOS_MAX_INTENTOS (o si el error no tiene arreglo, ej. paciente
+-- sin teléfono) el aviso queda en 'Error', que pasa a ser el estado terminal,
+-- con el motivo en ultimo_error.
+--
+-- La toma (tomarAvisosPendientes) solo considera avisos con proximo_intento_en
+-- vencido, a través de idx_avisos_proximo_intento.
+
+ALTER TABLE avisos_recordatorios
+    ADD COLUMN IF NOT EXISTS proximo_intento_en TIMESTAMP NOT NULL DEFAULT NOW(),
+    ADD COLUMN IF NOT EXISTS ultimo_error       TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_avisos_proximo_intento
+    ON avisos_recordatorios (forma_envio, proximo_intento_en)
+    WHERE estado_envio = 'Pendiente';
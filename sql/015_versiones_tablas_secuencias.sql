@@ -0,0 +1,63 @@
+-- Reemplaza los contadores de sql/004 por una secuencia por tabla.
+--
+-- La fila de versiones_tablas de cada tabla quedaba bloqueada hasta el commit
+-- de cada escritura: todas las reservas, cancelaciones y citas de cualquier
+-- turno se hacían de a una detrás de esa fila, y dos transacciones que
+-- escribían agenda_detalle y cita_detalle en distinto orden se trababan
+-- (deadlock). nextval() no toma locks transaccionales.
+--
+-- La secuencia avanza fuera de la transacción, así que el trigger es
+-- DEFERRABLE INITIALLY DEFERRED: se incrementa al confirmar, justo antes de
+-- que el cambio sea visible, y no durante todo el request. La API además
+-- vuelve a leer la versión después de armar la respuesta y no manda ETag si
+-- cambió (ver app/rutas/etag.py).
+
+CREATE OR REPLACE FUNCTION incrementar_version_tabla() RETURNS trigger AS $$
+BEGIN
+    PERFORM nextval(quote_ident('version_' || TG_TABLE_NAME));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+    v BIGINT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'agenda_cabecera', 'agenda_detalle', 'cita_cabecera', 'cita_detalle',
+        'disponibilidad_horaria', 'estado_cita', 'paciente', 'medico',
+        'ciudades', 'paises', 'dias', 'turnos', 'especialidades', 'cargo'
+    ]
+    LOOP
+        EXECUTE format('CREATE SEQUENCE IF NOT EXISTS %I', 'version_' || t);
+
+        -- Se continúa desde el contador anterior para no repetir ETags ya entregados
+        IF to_regclass('versiones_tablas') IS NOT NULL THEN
+            EXECUTE 'SELECT version FROM versiones_tablas WHERE tabla = $1' INTO v USING t;
+            IF v > 0 THEN
+                PERFORM setval(quote_ident('version_' || t), v);
+            END IF;
+        END IF;
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_tabla ON %I', t);
+        EXECUTE format(
+            'CREATE CONSTRAINT TRIGGER trg_version_tabla
+                AFTER INSERT OR UPDATE OR DELETE ON %I
+                DEFERRABLE INITIALLY DEFERRED
+                FOR EACH ROW EXECUTE FUNCTION incrementar_version_tabla()',
+            t
+        );
+        -- Los constraint triggers no admiten TRUNCATE
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_tabla_truncate ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_version_tabla_truncate
+                AFTER TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_tabla()',
+            t
+        );
+    END LOOP;
+END;
+$$;
+
+DROP TABLE IF EXISTS versiones_tablas;
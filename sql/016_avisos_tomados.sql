@@ -0,0 +1,7 @@
+-- Renovación de la toma de avisos (AvisoRecordatorioDao.registrarResultadosEnvio).
+-- Cada resultado guardado renueva tomado_en de los avisos que el trabajador
+-- sigue teniendo tomados; el índice parcial solo contiene avisos tomados.
+
+CREATE INDEX IF NOT EXISTS idx_avisos_tomado_por
+    ON avisos_recordatorios (tomado_por)
+    WHERE tomado_por IS NOT NULL;
@@ -0,0 +1,35 @@
+-- cupos_por_reconciliar pasa a ser un registro de solo inserción.
+--
+-- Con la PK por id_agenda_detalle y ON CONFLICT DO NOTHING (sql/010), la
+-- marca de un turno era una fila compartida: una reserva esperaba a otra que
+-- ya había marcado el mismo turno. Además, updateCitaDetalle tomaba la marca
+-- (por el trigger de cita_detalle) antes que agenda_detalle, y
+-- guardarCitaDetalle lo hacía al revés, así que dos cambios del mismo turno
+-- podían trabarse (deadlock).
+-- Ahora cada sentencia agrega sus propias filas, sin clave única que esperar,
+-- y el job deduplica al tomar el lote (ReconciliacionCuposDao).
+
+ALTER TABLE cupos_por_reconciliar DROP CONSTRAINT IF EXISTS cupos_por_reconciliar_pkey;
+ALTER TABLE cupos_por_reconciliar ADD COLUMN IF NOT EXISTS id_marca BIGSERIAL PRIMARY KEY;
+DROP INDEX IF EXISTS idx_cupos_por_reconciliar_marcado;
+
+CREATE OR REPLACE FUNCTION marcar_cupos_por_reconciliar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cupos_por_reconciliar (id_agenda_detalle)
+    SELECT DISTINCT (to_jsonb(f) ->> 'id_agenda_detalle')::int
+    FROM filas f
+    WHERE to_jsonb(f) ->> 'id_agenda_detalle' IS NOT NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION marcar_cupos_maximos_por_reconciliar() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cupos_por_reconciliar (id_agenda_detalle)
+    SELECT n.id_agenda_detalle
+    FROM nuevas n
+    JOIN viejas v ON v.id_agenda_detalle = n.id_agenda_detalle
+    WHERE n.cupos_maximos IS DISTINCT FROM v.cupos_maximos;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
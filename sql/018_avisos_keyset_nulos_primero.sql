@@ -0,0 +1,15 @@
+-- Clave de la paginación por cursor de avisos con los NULL primero, igual que
+-- getAvisos (ORDER BY fecha_cita DESC, hora_cita DESC: en DESC los NULL van
+-- primero). El índice de sql/002 los mandaba al final con fechas/horas mínimas.
+-- Se usan los máximos que Python puede representar y no 'infinity': el cursor
+-- guarda la clave como fecha/hora de Python (psycopg2 convierte 'infinity' en
+-- date.max, que al volver ya no es 'infinity').
+
+DROP INDEX IF EXISTS idx_avisos_keyset;
+
+CREATE INDEX IF NOT EXISTS idx_avisos_keyset
+    ON avisos_recordatorios (
+        (COALESCE(fecha_cita, DATE '9999-12-31')) DESC,
+        (COALESCE(hora_cita, TIME '23:59:59.999999')) DESC,
+        id_aviso DESC
+    );
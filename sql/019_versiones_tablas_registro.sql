@@ -0,0 +1,65 @@
+-- Versiones por tabla transaccionales y sin fila compartida (reemplaza sql/015).
+--
+-- Con las secuencias de sql/015 la versión nueva se veía antes que los datos:
+-- nextval() no es transaccional. Un lector podía leer la versión N+1, consultar
+-- en una foto sin el cambio y mandar ETag(N+1) con datos viejos.
+--
+-- Ahora un trigger por sentencia agrega una fila a cambios_tablas. Esa fila se
+-- ve recién con el commit, junto con los datos. La versión de una tabla es
+-- versiones_tablas.version (lo ya compactado) más la cantidad de filas de
+-- cambios_tablas de esa tabla, y se lee en una sola consulta. Nunca baja: cada
+-- commit que escribe la tabla la sube.
+-- Los escritores solo insertan, así que no esperan a nadie. versiones_tablas
+-- la escribe únicamente la compactación (app/dao/versiones_tablas.py), de a un
+-- proceso por vez.
+
+CREATE TABLE IF NOT EXISTS versiones_tablas (
+    tabla   VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS cambios_tablas (
+    id_cambio BIGSERIAL PRIMARY KEY,
+    tabla     VARCHAR(63) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_cambios_tablas_tabla ON cambios_tablas (tabla);
+
+CREATE OR REPLACE FUNCTION incrementar_version_tabla() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO cambios_tablas (tabla) VALUES (TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    t TEXT;
+    v BIGINT;
+BEGIN
+    FOREACH t IN ARRAY ARRAY[
+        'agenda_cabecera', 'agenda_detalle', 'cita_cabecera', 'cita_detalle',
+        'disponibilidad_horaria', 'estado_cita', 'paciente', 'medico',
+        'ciudades', 'paises', 'dias', 'turnos', 'especialidades', 'cargo'
+    ]
+    LOOP
+        -- Se continúa por encima de la secuencia para no repetir ETags ya entregados
+        v := 0;
+        IF to_regclass(quote_ident('version_' || t)) IS NOT NULL THEN
+            EXECUTE format('SELECT last_value FROM %I', 'version_' || t) INTO v;
+        END IF;
+        INSERT INTO versiones_tablas (tabla, version) VALUES (t, v + 1)
+        ON CONFLICT (tabla) DO UPDATE SET version = GREATEST(versiones_tablas.version, EXCLUDED.version);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_tabla ON %I', t);
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_version_tabla_truncate ON %I', t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_version_tabla
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I
+                FOR EACH STATEMENT EXECUTE FUNCTION incrementar_version_tabla()',
+            t
+        );
+        EXECUTE format('DROP SEQUENCE IF EXISTS %I', 'version_' || t);
+    END LOOP;
+END;
+$$;
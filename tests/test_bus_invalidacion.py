@@ -0,0 +1,96 @@
+"""
+Prueba de punta a punta del bus de invalidación del cache de catálogos.
+
+Necesita una base PostgreSQL: se ejecuta solo si TEST_DATABASE_DSN tiene un
+DSN de libpq (ej. "dbname=odontosisbd_test user=postgres host=127.0.0.1").
+No escribe en ninguna tabla: el aviso se emite con pg_notify directo.
+
+    TEST_DATABASE_DSN="dbname=... user=..." python -m unittest tests.test_bus_invalidacion
+"""
+
+import json
+import logging
+import os
+import time
+import unittest
+
+DSN = os.environ.get('TEST_DATABASE_DSN')
+
+
+def esperar(condicion, segundos=5):
+    """Espera hasta que condicion() sea verdadera. Retorna False si se agotó el tiempo."""
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if condicion():
+            return True
+        time.sleep(0.05)
+    return condicion()
+
+
+@unittest.skipUnless(DSN, 'TEST_DATABASE_DSN no está configurado')
+class TestBusInvalidacion(unittest.TestCase):
+
+    def setUp(self):
+        import psycopg2
+        from psycopg2.extensions import parse_dsn
+        from app.dao.bus_invalidacion import CANAL, EscuchaInvalidaciones
+        from app.dao.cache_catalogos import CacheCatalogos
+
+        self.canal = CANAL
+        self.cache = CacheCatalogos()
+        self.escucha = EscuchaInvalidaciones(
+            self.cache, logging.getLogger(__name__), parse_dsn(DSN), intervalo=0.1
+        )
+        self.escucha.start()
+        # Al conectarse la escucha vacía el cache: se llena recién después
+        self.assertTrue(esperar(lambda: self.cache.bus_conectado), 'La escucha no se conectó al canal')
+
+        self.con = psycopg2.connect(DSN)
+        self.con.set_session(autocommit=True)
+
+    def tearDown(self):
+        self.con.close()
+        self.escucha.detener()
+        self.escucha.join(timeout=5)
+
+    def notificar(self, datos):
+        cur = self.con.cursor()
+        try:
+            cur.execute("SELECT pg_notify(%s, %s)", (self.canal, json.dumps(datos)))
+        finally:
+            cur.close()
+
+    def test_notify_desaloja_la_entrada_del_registro(self):
+        from app.dao.cache_catalogos import _SIN_VALOR
+
+        self.cache.guardar('ciudades', ('getCiudades', ()), [{'id_ciudad': 1}, {'id_ciudad': 2}])
+        self.cache.guardar('ciudades', ('getCiudadById', (1,)), {'id_ciudad': 1})
+        self.cache.guardar('ciudades', ('getCiudadById', (2,)), {'id_ciudad': 2})
+
+        self.notificar({'tabla': 'ciudades', 'id': 1})
+
+        self.assertTrue(
+            esperar(lambda: self.cache.obtener('ciudades', ('getCiudadById', (1,))) is _SIN_VALOR),
+            'La entrada de la ciudad 1 sigue en el cache'
+        )
+        self.assertIs(self.cache.obtener('ciudades', ('getCiudades', ())), _SIN_VALOR)
+        # Las lecturas de otros registros no se tocan
+        self.assertEqual(self.cache.obtener('ciudades', ('getCiudadById', (2,))), {'id_ciudad': 2})
+
+    def test_notify_sin_id_vacia_el_catalogo(self):
+        from app.dao.cache_catalogos import _SIN_VALOR
+
+        self.cache.guardar('paises', ('getPaisById', (1,)), {'id_pais': 1})
+        self.cache.guardar('ciudades', ('getCiudadById', (1,)), {'id_ciudad': 1})
+
+        self.notificar({'tabla': 'paises'})
+
+        self.assertTrue(
+            esperar(lambda: self.cache.obtener('paises', ('getPaisById', (1,))) is _SIN_VALOR),
+            'El catálogo de países sigue en el cache'
+        )
+        self.assertEqual(self.cache.obtener('ciudades', ('getCiudadById', (1,))), {'id_ciudad': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()